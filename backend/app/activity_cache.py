@@ -0,0 +1,145 @@
+# backend/app/activity_cache.py
+#
+# In-process, write-through cache of each active user's most recent logs.
+#
+# Consistency across workers: every log write bumps the user's row in
+# cache_versions inside the same transaction. A worker serves a user from
+# memory only while its cached version equals the committed one (a
+# primary-key lookup); otherwise it reloads from the log tables.
+
+import os
+from collections import OrderedDict, deque
+
+from .models import SessionLocal
+from .cache import read_version, user_scope
+from .user_context import UserContext, MoodEntry, SymptomEntry, MealEntry, load_user_context
+
+ACTIVITY_CACHE_ENTRIES = int(os.getenv("ACTIVITY_CACHE_ENTRIES", "5"))     # ring size per log type
+ACTIVITY_CACHE_USERS = int(os.getenv("ACTIVITY_CACHE_USERS", "10000"))     # LRU bound
+
+
+class _UserActivity:
+    __slots__ = ("version", "moods", "symptoms", "meals", "chats")
+
+    def __init__(self, version: int, size: int):
+        self.version = version
+        self.moods = deque(maxlen=size)
+        self.symptoms = deque(maxlen=size)
+        self.meals = deque(maxlen=size)
+        self.chats = deque(maxlen=size)
+
+    def ring_for(self, entry):
+        if isinstance(entry, MoodEntry):
+            return self.moods
+        if isinstance(entry, SymptomEntry):
+            return self.symptoms
+        if isinstance(entry, MealEntry):
+            return self.meals
+        return self.chats
+
+
+class ActivityCache:
+    """
+    Per-user ring buffers of the newest entries of each log type, with LRU
+    eviction of inactive users. Each buffer holds newest-first entries.
+    """
+
+    def __init__(self, entries: int = ACTIVITY_CACHE_ENTRIES, max_users: int = ACTIVITY_CACHE_USERS):
+        self.entries = entries
+        self.max_users = max_users
+        self._users: OrderedDict[str, _UserActivity] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # ── reads ──────────────────────────────────────────────────────────────────
+    def get(self, user_email: str, version: int, limit: int, include_chats: bool = False) -> UserContext | None:
+        activity = self._users.get(user_email)
+        if activity is None or activity.version != version:
+            self.misses += 1
+            return None
+        self._users.move_to_end(user_email)
+        self.hits += 1
+        return self._view(activity, limit, include_chats)
+
+    @staticmethod
+    def _view(activity: _UserActivity, limit: int, include_chats: bool) -> UserContext:
+        return UserContext(
+            moods=list(activity.moods)[:limit],
+            symptoms=list(activity.symptoms)[:limit],
+            meals=list(activity.meals)[:limit],
+            chats=list(activity.chats)[:limit] if include_chats else [],
+        )
+
+    def fill(self, user_email: str, version: int, ctx: UserContext, limit: int, include_chats: bool = False) -> UserContext:
+        """Populate a user from a full DB load taken at `version`; returns the requested view."""
+        activity = _UserActivity(version, self.entries)
+        activity.moods.extend(ctx.moods)
+        activity.symptoms.extend(ctx.symptoms)
+        activity.meals.extend(ctx.meals)
+        activity.chats.extend(ctx.chats)
+        self._users[user_email] = activity
+        self._users.move_to_end(user_email)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return self._view(activity, limit, include_chats)
+
+    # ── writes ─────────────────────────────────────────────────────────────────
+    def record(self, user_email: str, version: int, *entries):
+        """
+        Write-through after a committed log write that bumped the user to
+        `version`. If this worker's copy was exactly one version behind it is
+        still complete and the entries are prepended; otherwise some other
+        worker wrote in between, so the copy is dropped and reloaded on the
+        next read. Users not in the cache are left out (no partial copies).
+        """
+        activity = self._users.get(user_email)
+        if activity is None:
+            return
+        if activity.version != version - 1:
+            del self._users[user_email]
+            return
+        for entry in entries:
+            activity.ring_for(entry).appendleft(entry)
+        activity.version = version
+
+    def invalidate(self, user_email: str):
+        self._users.pop(user_email, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._users),
+            "max_users": self.max_users,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+activity_cache = ActivityCache()
+
+
+async def get_user_context(user_email: str, limit: int = 5, include_chats: bool = False) -> UserContext:
+    """
+    Recent logs for the recommendation path: served from this worker's cache
+    when it is current, otherwise loaded from Postgres (one round trip) and
+    cached at the version read in the same snapshot as the load.
+    """
+    async with SessionLocal() as session:
+        # REPEATABLE READ: the version and the logs come from one snapshot. Under
+        # READ COMMITTED a write committing between the two reads would be in
+        # the loaded rows yet cached under the older version, and record()
+        # would then prepend its entries a second time.
+        await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        if limit > activity_cache.entries:
+            # Deeper than the ring buffers: not cacheable, go straight to the DB
+            return await load_user_context(session, user_email, limit=limit,
+                                           chat_limit=limit if include_chats else 0)
+        version = await read_version(session, user_scope(user_email))
+        ctx = activity_cache.get(user_email, version, limit, include_chats)
+        if ctx is not None:
+            return ctx
+        full = await load_user_context(
+            session, user_email, limit=activity_cache.entries, chat_limit=activity_cache.entries
+        )
+    return activity_cache.fill(user_email, version, full, limit, include_chats)
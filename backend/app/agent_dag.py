@@ -0,0 +1,190 @@
+# backend/app/agent_dag.py
+#
+# Dependency-graph executor for the specialist agents.
+#
+# The UserProxyAgent flow treats Dosha/MentalHealth/Climate/Deficiency as
+# independent specialists whose outputs feed MealPlanner and HerbalAdvisor,
+# followed by aggregation. Instead of taking turns in a GroupChat, every node
+# starts as soon as its own dependencies finish, so wall-clock time is the
+# longest path through the graph rather than the sum of all turns.
+
+import os
+import re
+import json
+import time
+import asyncio
+from dataclasses import dataclass, field
+
+DEFAULT_NODE_TIMEOUT = float(os.getenv("AGENT_NODE_TIMEOUT", "60"))
+
+DISCLAIMER = (
+    "This is Ayurvedic guidance only and not a substitute for professional "
+    "medical advice. Consult a qualified practitioner before changing your diet, "
+    "herbs or medication."
+)
+
+
+# ─── JSON helpers ────────────────────────────────────────────────────────────────
+_FENCED_JSON = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+
+
+def extract_json(text: str | None) -> dict | None:
+    """Best-effort parse of the JSON object an agent was asked to return."""
+    if not text:
+        return None
+    candidates = [text.strip()]
+    candidates += _FENCED_JSON.findall(text)
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        candidates.append(text[start:end + 1])
+    for candidate in candidates:
+        try:
+            value = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            return value
+    return None
+
+
+# ─── Graph definition ────────────────────────────────────────────────────────────
+@dataclass(frozen=True)
+class DagNode:
+    name: str                       # agent name in the registry / build_agents()
+    deps: tuple[str, ...] = ()
+    timeout: float = DEFAULT_NODE_TIMEOUT
+
+
+# Specialists first (no deps), then the planners, each depending only on the
+# specialists its system prompt actually consumes.
+SPECIALIST_DAG = (
+    DagNode("dosha_agent"),
+    DagNode("mental_health_agent"),
+    DagNode("climate_agent"),
+    DagNode("deficiency_agent"),
+    DagNode("meal_planner_agent", deps=("dosha_agent", "climate_agent", "deficiency_agent")),
+    DagNode("herbal_advisor_agent", deps=("dosha_agent", "mental_health_agent", "deficiency_agent")),
+)
+
+
+@dataclass
+class NodeResult:
+    name: str
+    status: str                     # "ok" | "timeout" | "error" | "skipped"
+    output: str | None = None
+    data: dict | None = None        # parsed JSON output, if any
+    elapsed: float = 0.0
+    error: str | None = None
+
+
+@dataclass
+class DagResult:
+    nodes: dict[str, NodeResult] = field(default_factory=dict)
+    plan: dict = field(default_factory=dict)
+    elapsed: float = 0.0
+
+
+# ─── Executor ────────────────────────────────────────────────────────────────────
+def _node_prompt(base_prompt: str, node: DagNode, results: dict[str, NodeResult]) -> str:
+    if not node.deps:
+        return base_prompt
+    parts = [base_prompt, "", "Inputs from other specialists:"]
+    for dep in node.deps:
+        result = results[dep]
+        if result.status == "ok":
+            parts.append(f"### {dep}\n{result.output}")
+        else:
+            parts.append(f"### {dep}\n(unavailable: {result.status}; proceed without it)")
+    return "\n".join(parts)
+
+
+async def run_dag(agents: dict, base_prompt: str, nodes: tuple[DagNode, ...] = SPECIALIST_DAG,
+                  on_event=None) -> DagResult:
+    """
+    Run `nodes` against `agents` (name → ConversableAgent). Each node runs
+    once all its deps have settled; a dep that timed out or failed is passed
+    on as "unavailable" instead of blocking its dependents. `on_event(event,
+    data)` is called as each node starts and finishes.
+    """
+    started = time.perf_counter()
+    results: dict[str, NodeResult] = {}
+    done: dict[str, asyncio.Event] = {node.name: asyncio.Event() for node in nodes}
+
+    def notify(event: str, data: dict):
+        if on_event is not None:
+            on_event(event, data)
+
+    async def run_node(node: DagNode):
+        for dep in node.deps:
+            await done[dep].wait()
+        agent = agents.get(node.name)
+        t0 = time.perf_counter()
+        try:
+            if agent is None:
+                results[node.name] = NodeResult(node.name, "skipped", error="agent not configured")
+                return
+            notify("node_started", {"agent": node.name})
+            messages = [{"role": "user", "content": _node_prompt(base_prompt, node, results)}]
+            reply = await asyncio.wait_for(agent.a_generate_reply(messages=messages), timeout=node.timeout)
+            output = reply if isinstance(reply, str) else (reply or {}).get("content")
+            results[node.name] = NodeResult(node.name, "ok", output, extract_json(output),
+                                            time.perf_counter() - t0)
+        except asyncio.TimeoutError:
+            results[node.name] = NodeResult(node.name, "timeout", elapsed=time.perf_counter() - t0)
+        except Exception as e:
+            results[node.name] = NodeResult(node.name, "error", elapsed=time.perf_counter() - t0, error=str(e))
+        finally:
+            done[node.name].set()
+            # No result means the node was cancelled mid-call (client gone,
+            # worker stopping); the cancellation propagates, with no agent_turn.
+            result = results.get(node.name)
+            if result is not None:
+                notify("agent_turn", {
+                    "agent": node.name,
+                    "status": result.status,
+                    "content": result.output,
+                    "elapsed": round(result.elapsed, 3),
+                })
+
+    await asyncio.gather(*(run_node(node) for node in nodes))
+    return DagResult(nodes=results, plan=aggregate(results), elapsed=time.perf_counter() - started)
+
+
+# ─── Aggregation ─────────────────────────────────────────────────────────────────
+def aggregate(results: dict[str, NodeResult]) -> dict:
+    """
+    Merge node outputs into the unified plan deterministically (no extra LLM
+    call). Outputs that are not valid JSON are kept as text.
+    """
+    def section(name: str):
+        result = results.get(name)
+        if result is None or result.status != "ok":
+            return None
+        return result.data if result.data is not None else result.output
+
+    return {
+        "dosha": section("dosha_agent"),
+        "mental_health": section("mental_health_agent"),
+        "climate": section("climate_agent"),
+        "deficiencies": section("deficiency_agent"),
+        "meal_plan": section("meal_planner_agent"),
+        "herbal": section("herbal_advisor_agent"),
+        "missing": sorted(name for name, r in results.items() if r.status != "ok"),
+        "disclaimer": DISCLAIMER,
+    }
+
+
+MEAL_KEYS = ("breakfast", "lunch", "dinner")
+
+
+def validate_plan(plan: dict) -> bool:
+    """
+    A plan is complete once the meal planner returned its JSON with every
+    meal filled in and the herbal advisor answered.
+    """
+    meal_plan = plan.get("meal_plan")
+    if not isinstance(meal_plan, dict):
+        return False
+    if not all(isinstance(meal_plan.get(key), str) and meal_plan[key].strip() for key in MEAL_KEYS):
+        return False
+    return bool(plan.get("herbal"))
@@ -0,0 +1,231 @@
+# backend/app/agent_registry.py
+#
+# One place that knows how to build every agent.
+#
+#   - the LLM config is parsed once per process (OAI_CONFIG_LIST file/JSON, or
+#     OPENAI_API_KEY + LLM_MODEL), not once per agent module at import time
+#   - each agent's system prompt comes from its module under app/agents/,
+#     imported the first time that agent is built
+#   - every OpenAI client shares one keep-alive, HTTP/2 httpx connection pool,
+#     so concurrent runs reuse warm connections instead of new TLS handshakes
+#
+# Agents keep per-conversation history, so create() still returns a fresh
+# instance per pipeline run; only the specs, config and connections are shared.
+#
+# LLM_BACKEND=fake swaps in fake_llm.FakeLLMClient; llm_cache and telemetry
+# wrap every LLM-backed agent either way.
+#
+# LLM_STREAM=1 (default) asks the client to stream completions; the chunks
+# reach the SSE endpoints through autogen's IOStream (orchestrator.py).
+
+import os
+import importlib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import httpx
+from autogen import AssistantAgent, UserProxyAgent, config_list_from_json
+
+from .fake_llm import LLM_BACKEND, fake_llm_config, use_fake_llm
+from .llm_cache import enable_llm_cache
+from .telemetry import instrument_agent
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4")
+LLM_TEMPERATURE = os.getenv("LLM_TEMPERATURE")
+LLM_STREAM = os.getenv("LLM_STREAM", "1") == "1"
+LLM_IO_WORKERS = int(os.getenv("LLM_IO_WORKERS", "64"))
+
+# Connection pool shared by every agent's OpenAI client. Autogen runs the
+# synchronous client on the loop's executor (LLM_IO_WORKERS threads), so the
+# pool is sized to match.
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "1") == "1"
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", str(LLM_IO_WORKERS)))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "32"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "60"))
+LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "10"))
+
+# Agent name → module under app/agents/ defining SYSTEM_MESSAGE
+AGENT_MODULES = {
+    "user_proxy": "user_proxy_agent",
+    "memory_manager": "memory_manager",
+    "dosha_agent": "dosha_assessment_agent",
+    "mental_health_agent": "mental_health_agent",
+    "climate_agent": "climate_agent",
+    "deficiency_agent": "deficiency_agent",
+    "meal_planner_agent": "meal_planner_agent",
+    "herbal_advisor_agent": "herbal_advisor_agent",
+}
+
+# The module prompts were written for an interactive chat; the pipeline runs
+# with human_input_mode="NEVER", so nobody would answer a follow-up question.
+NON_INTERACTIVE_NOTE = (
+    "\nThe user cannot answer follow-up questions in this session. If details are "
+    "missing, state your assumptions briefly and still return the JSON."
+)
+
+
+# ─── LLM I/O threads ─────────────────────────────────────────────────────────────
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor that runs each task in a copy of the submitter's
+    contextvars, as asyncio.to_thread does. Autogen hands the synchronous
+    client to loop.run_in_executor, which does not copy them; it re-installs
+    its IOStream in the thread itself, but nothing else (the current trace
+    span, anything set per request) would reach the thread making the call.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def llm_io_executor() -> ContextThreadPoolExecutor:
+    """Default executor for a process running agents (API lifespan, batch jobs, benchmark)."""
+    return ContextThreadPoolExecutor(max_workers=LLM_IO_WORKERS, thread_name_prefix="llm-io")
+
+
+# ─── Shared HTTP client ──────────────────────────────────────────────────────────
+class SharedHTTPClient(httpx.Client):
+    """
+    httpx.Client that survives autogen's deepcopy of llm_config: every copy
+    is the same client, so all OpenAI clients share its connection pool.
+    """
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def build_http_client() -> SharedHTTPClient:
+    return SharedHTTPClient(
+        http2=LLM_HTTP2,
+        limits=httpx.Limits(
+            max_connections=LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(LLM_HTTP_TIMEOUT, connect=LLM_HTTP_CONNECT_TIMEOUT),
+    )
+
+
+def enable_streaming(agent):
+    """
+    Make every completion of `agent` stream. autogen 0.9.1 validates
+    llm_config against a schema without "stream", so it is set on the
+    client's per-entry create() params, which are merged into each call.
+    """
+    if agent.client is not None:
+        for config in agent.client._config_list:
+            config["stream"] = True
+    return agent
+
+
+# ─── LLM config ──────────────────────────────────────────────────────────────────
+def load_config_list() -> list[dict]:
+    """
+    OAI_CONFIG_LIST (a JSON file path or inline JSON, autogen's format) if
+    set, otherwise one entry for LLM_MODEL with OPENAI_API_KEY and, when set,
+    OPENAI_BASE_URL. Empty when no key is configured.
+    """
+    if os.getenv("OAI_CONFIG_LIST"):
+        return config_list_from_json("OAI_CONFIG_LIST")
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return []
+    config = {"model": LLM_MODEL, "api_key": api_key}
+    if os.getenv("OPENAI_BASE_URL"):
+        config["base_url"] = os.environ["OPENAI_BASE_URL"]
+    return [config]
+
+
+@dataclass(frozen=True)
+class AgentSpec:
+    name: str
+    system_message: str
+
+
+class AgentRegistry:
+    """
+    Parses the LLM config and opens the HTTP pool on first use, loads each
+    agent's prompt module on first use, and builds fresh agents from them.
+    """
+
+    def __init__(self, modules: dict[str, str] = AGENT_MODULES, backend: str = LLM_BACKEND):
+        self.modules = modules
+        self.backend = backend
+        self._specs: dict[str, AgentSpec] = {}
+        self._llm_config: dict | None = None
+        self._http_client: SharedHTTPClient | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.modules)
+
+    def spec(self, name: str) -> AgentSpec:
+        spec = self._specs.get(name)
+        if spec is None:
+            if name not in self.modules:
+                raise KeyError(f"Unknown agent: {name!r}")
+            module = importlib.import_module(f".agents.{self.modules[name]}", __package__)
+            spec = self._specs[name] = AgentSpec(name, module.SYSTEM_MESSAGE.strip())
+        return spec
+
+    def llm_config(self) -> dict | None:
+        """The shared llm_config, or None when no LLM is configured."""
+        if self.backend == "fake":
+            return fake_llm_config()
+        with self._lock:
+            if self._llm_config is None:
+                config_list = load_config_list()
+                if not config_list:
+                    print("Agent registry: no LLM configured (set OPENAI_API_KEY or OAI_CONFIG_LIST)")
+                    self._llm_config = {}
+                    return None
+                self._http_client = build_http_client()
+                config = {
+                    # Responses are cached by llm_cache; autogen's own cache stays off
+                    "config_list": [{**entry, "http_client": self._http_client} for entry in config_list],
+                    "cache_seed": None,
+                }
+                if LLM_TEMPERATURE is not None:
+                    config["temperature"] = float(LLM_TEMPERATURE)
+                self._llm_config = config
+        return self._llm_config or None
+
+    def create(self, name: str):
+        """A fresh agent for one run, wired to the shared config and caches."""
+        spec = self.spec(name)
+        if name == "user_proxy":
+            return UserProxyAgent(
+                name=name,
+                system_message=spec.system_message,
+                human_input_mode="NEVER",        # never block the worker on input()
+                code_execution_config=False,
+            )
+        llm_config = self.llm_config()
+        agent = AssistantAgent(
+            name=name,
+            system_message=spec.system_message + NON_INTERACTIVE_NOTE,
+            llm_config=llm_config,
+        )
+        if self.backend == "fake":
+            use_fake_llm(agent)
+        if LLM_STREAM:
+            enable_streaming(agent)
+        enable_llm_cache(agent)
+        instrument_agent(agent)
+        return agent
+
+    def create_all(self, names: list[str] | None = None) -> list:
+        return [self.create(name) for name in (names or self.names)]
+
+    def close(self):
+        if self._http_client is not None:
+            self._http_client.close()
+            self._http_client = None
+            self._llm_config = None
+
+
+agent_registry = AgentRegistry()
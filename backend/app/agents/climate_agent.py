@@ -1,14 +1,8 @@
-import os
-from autogen import AssistantAgent
-from autogen import config_list_from_dotenv
+# Prompt only: agent_registry builds the agent (shared LLM config, lazily).
 
-# Load OpenAI config (make sure you have an .env file with OPENAI_API_KEY)
-config_list = config_list_from_dotenv(dotenv_file_path=".env")
+NAME = "climate_agent"
 
-# Define the assistant agent
-climate_agent = AssistantAgent(
-    name="ClimateAgent",
-    system_message="""
+SYSTEM_MESSAGE = """
 You are the ClimateAgent.
 Assess how local weather and season affect the user’s dosha balance.
 
@@ -18,11 +12,9 @@ If location or weather details are missing, ask:
 
 Once details are provided, return JSON like:
 {
-  "weather": {"temp": <°C>, "humidity": <%%>},
+  "weather": {"temp": <°C>, "humidity": <%>},
   "impact": ["<impact1>", ...]
 }
 
 Mention any extreme conditions and advise caution.
-""",
-    llm_config={"config_list": config_list}
-)
+"""
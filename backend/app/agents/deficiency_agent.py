@@ -1,12 +1,8 @@
-from autogen import AssistantAgent
-from autogen import config_list_from_dotenv
+# Prompt only: agent_registry builds the agent (shared LLM config, lazily).
 
-# Load OpenAI config (make sure you have an .env file with OPENAI_API_KEY)
-config_list = config_list_from_dotenv(dotenv_file_path=".env")
+NAME = "deficiency_agent"
 
-deficiency_agent = AssistantAgent(
-    name="DeficiencyAgent",
-    system_prompt="""
+SYSTEM_MESSAGE = """
 You are the DeficiencyAgent.
 Identify potential vitamin or mineral deficiencies based on symptoms and lab results.
 If lab values or symptom specifics are missing, ask:
@@ -15,6 +11,4 @@ If lab values or symptom specifics are missing, ask:
 After gathering necessary info, return JSON:
 {"deficiencies": ["<nutrient1>", ...], "recommendations": ["<food or supplement>", ...]}
 Always advise professional lab review.
-""",
-    llm_config={"config_list": config_list}
-)
+"""
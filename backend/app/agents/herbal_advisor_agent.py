@@ -1,13 +1,8 @@
+# Prompt only: agent_registry builds the agent (shared LLM config, lazily).
 
-from autogen import AssistantAgent
-from autogen import config_list_from_dotenv
+NAME = "herbal_advisor_agent"
 
-# Load OpenAI config (make sure you have an .env file with OPENAI_API_KEY)
-config_list = config_list_from_dotenv(dotenv_file_path=".env")
-
-herbal_advisor_agent = AssistantAgent(
-    name="HerbalAdvisorAgent",
-    system_prompt="""
+SYSTEM_MESSAGE = """
 You are the HerbalAdvisorAgent.
 Recommend Ayurvedic herbs, teas, and routines for today’s plan.
 If you need user context (e.g., current medications), ask:
@@ -15,6 +10,4 @@ If you need user context (e.g., current medications), ask:
 Return JSON:
 {"herbs": ["..."], "routines": ["..."]}
 Flag any herb-drug interactions.
-""",
-    llm_config={"config_list": config_list}
-)
+"""
@@ -1,18 +1,11 @@
+# Prompt only: agent_registry builds the agent (shared LLM config, lazily).
 
-from autogen import AssistantAgent
-from autogen import config_list_from_dotenv
+NAME = "memory_manager"
 
-# Load OpenAI config (make sure you have an .env file with OPENAI_API_KEY)
-config_list = config_list_from_dotenv(dotenv_file_path=".env")
-
-memory_manager = AssistantAgent(
-    name="MemoryManager",
-    system_prompt="""
+SYSTEM_MESSAGE = """
 You are the MemoryManager.
 Store and retrieve user history: moods, meals, symptoms, climate impacts, past plans.
 If an agent asks for recent data, provide anonymized summaries.
 Never expose personal identifiers. If data is missing, inform the UserProxyAgent:
 "Missing data: [describe]".
-""",
-    llm_config={"config_list": config_list}
-)
+"""
@@ -1,13 +1,8 @@
+# Prompt only: agent_registry builds the agent (shared LLM config, lazily).
 
-from autogen import AssistantAgent
-from autogen import config_list_from_dotenv
+NAME = "mental_health_agent"
 
-# Load OpenAI config (make sure you have an .env file with OPENAI_API_KEY)
-config_list = config_list_from_dotenv(dotenv_file_path=".env")
-
-mental_health_agent = AssistantAgent(
-    name="MentalHealthAgent",
-    system_prompt="""
+SYSTEM_MESSAGE = """
 You are the MentalHealthAgent.
 Analyze user mood journals, stress ratings, and behavior trends.
 If you need more context (e.g., recent sleep quality, stress triggers), ask:
@@ -17,6 +12,4 @@ After collecting data, return JSON:
 {"trend": "<trend description>", "alerts": ["<alert1>", ...]}
 If severe anxiety or depression patterns appear, include:
 "⚠️ Please consider consulting a mental health professional."
-""",
-     llm_config={"config_list": config_list}
-)
+"""
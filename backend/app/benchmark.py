@@ -0,0 +1,228 @@
+# backend/app/benchmark.py
+#
+# End-to-end benchmark of the /recommend flow with the fake LLM backend:
+#
+#   python -m backend.app.benchmark --seed-users 20 --requests 200 --concurrency 16
+#   python -m backend.app.benchmark --json bench.json                        # save results
+#   python -m backend.app.benchmark --baseline bench.json --tolerance 0.2    # CI gate
+#   python -m backend.app.benchmark --retrieval --requests 100               # hybrid vs vector-only
+#
+# Needs Postgres (DATABASE_URL) with the tables created and some ayurveda_docs
+# loaded; the agents never touch the network. Reports p50/p95/p99 per stage:
+# db_fetch, embedding, retrieval, agent:<name> and total.
+
+import os
+
+# Before the app modules read their settings
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("LLM_CACHE", "0")
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import datetime
+import numpy as np
+from collections import defaultdict
+
+from backend.app.models import MoodLog, SymptomLog, MealLog
+from backend.app.activity_cache import get_user_context, activity_cache
+from backend.app.log_writer import write_logs
+from backend.app import orchestrator
+from backend.app.rag_context import render_logs
+from backend.app.agent_registry import llm_io_executor
+
+SAMPLE_MESSAGES = [
+    "I feel bloated after lunch and tired in the afternoon",
+    "What should I eat for better sleep?",
+    "My skin is dry and I feel anxious in the evenings",
+    "Suggest a light dinner for hot weather",
+    "I have frequent headaches and acidity",
+    "How can I improve my digestion in winter?",
+]
+
+
+# ─── Fixtures ────────────────────────────────────────────────────────────────────
+def bench_users(n: int) -> list[str]:
+    return [f"bench-{i}@example.com" for i in range(n)]
+
+
+async def seed_users(users: list[str], entries: int = 5):
+    """Give every bench user `entries` mood, symptom and meal logs."""
+    now = datetime.datetime.utcnow()
+    records = []
+    for user in users:
+        for i in range(entries):
+            ts = now - datetime.timedelta(hours=i)
+            records.append((MoodLog, {"user_email": user, "mood": "calm", "intensity": 3, "timestamp": ts}))
+            records.append((SymptomLog, {"user_email": user, "symptom": "bloating", "severity": 2, "timestamp": ts}))
+            records.append((MealLog, {"user_email": user, "meal_type": "lunch", "items": "rice,dal", "timestamp": ts}))
+    await write_logs(records)
+    print(f"Seeded {len(records)} log rows for {len(users)} user(s).")
+
+
+# ─── One request, timed per stage ────────────────────────────────────────────────
+async def run_one(user: str, message: str, mode: str, cold: bool, timings: dict):
+    t_start = time.perf_counter()
+
+    if cold:
+        activity_cache.invalidate(user)
+    t0 = time.perf_counter()
+    ctx = await get_user_context(user, limit=5)
+    timings["db_fetch"].append(time.perf_counter() - t0)
+
+    model = await orchestrator.current_model()
+    t0 = time.perf_counter()
+    emb = await orchestrator.batcher_for(model.name).encode(message)
+    timings["embedding"].append(time.perf_counter() - t0)
+
+    # Seed the query-embedding cache so "retrieval" is the SQL side only
+    orchestrator.embedding_cache.put((model.id, orchestrator.normalize_query(message)), emb.tolist())
+    if cold:
+        orchestrator.retrieval_cache.clear()
+    t0 = time.perf_counter()
+    docs = await orchestrator.get_relevant_ayurveda_docs(message)
+    timings["retrieval"].append(time.perf_counter() - t0)
+
+    last = time.perf_counter()
+    async for event, data in orchestrator.stream_pipeline(message, docs=docs, mode=mode, user_context=ctx):
+        now = time.perf_counter()
+        if event == "agent_turn" and data["agent"] != "user_proxy":
+            # DAG nodes report their own duration; GroupChat turns are back to back
+            timings[f"agent:{data['agent']}"].append(data.get("elapsed", now - last))
+        elif event == "error":
+            raise RuntimeError(data["detail"])
+        last = now
+    timings["total"].append(time.perf_counter() - t_start)
+
+
+async def time_retrieval(users: list[str], runs: int) -> dict:
+    """
+    Hybrid vs vector-only search on the diet-plan query (the user's rendered
+    logs), results cache cleared before every search. Query embeddings are
+    cached after the first run, so this times the SQL side only.
+    """
+    retrievers = {"hybrid": orchestrator.PgVectorRetriever(hybrid=True),
+                  "vector": orchestrator.PgVectorRetriever(hybrid=False)}
+    queries = [render_logs(await get_user_context(user, limit=5)) for user in users]
+    timings: dict[str, list[float]] = defaultdict(list)
+    for i in range(runs + 1):                 # the first round warms up, untimed
+        query = queries[i % len(queries)]
+        for name, retriever in retrievers.items():
+            orchestrator.retrieval_cache.clear()
+            t0 = time.perf_counter()
+            await retriever(query)
+            if i:
+                timings[f"retrieval:{name}"].append(time.perf_counter() - t0)
+    return summarize(timings)
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────────
+def summarize(timings: dict) -> dict:
+    summary = {}
+    for stage, values in timings.items():
+        ms = np.asarray(values) * 1000
+        summary[stage] = {
+            "count": len(values),
+            "mean_ms": round(float(ms.mean()), 2),
+            "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p95_ms": round(float(np.percentile(ms, 95)), 2),
+            "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        }
+    return summary
+
+
+def print_summary(summary: dict, wall: float, requests: int, errors: int):
+    print(f"\n{'stage':<32}{'n':>6}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for stage in sorted(summary, key=lambda s: (s == "total", s)):
+        s = summary[stage]
+        print(f"{stage:<32}{s['count']:>6}{s['mean_ms']:>10.1f}{s['p50_ms']:>10.1f}"
+              f"{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}")
+    print(f"\n{requests} request(s), {errors} error(s) in {wall:.2f}s "
+          f"({requests / wall:.1f} req/s)")
+
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Stages whose p95 regressed by more than `tolerance` against the baseline."""
+    regressions = []
+    for stage, base in baseline.get("stages", {}).items():
+        current = summary.get(stage)
+        if current and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{stage}: p95 {base['p95_ms']:.1f}ms → {current['p95_ms']:.1f}ms")
+    return regressions
+
+
+# ─── Driver ──────────────────────────────────────────────────────────────────────
+async def run_benchmark(args) -> int:
+    # Same LLM I/O pool as the API (main.lifespan); fake calls sleep on it
+    asyncio.get_running_loop().set_default_executor(llm_io_executor())
+    users = bench_users(args.users)
+    if args.seed_users:
+        users = bench_users(args.seed_users)
+        await seed_users(users)
+
+    if args.retrieval:
+        started = time.perf_counter()
+        print_summary(await time_retrieval(users, args.requests), time.perf_counter() - started, 2 * args.requests, 0)
+        return 0
+
+    timings: dict[str, list[float]] = defaultdict(list)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    errors = 0
+
+    async def worker(i: int):
+        nonlocal errors
+        async with semaphore:
+            try:
+                await run_one(users[i % len(users)], SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)],
+                              args.mode, args.cold, timings)
+            except Exception as e:
+                errors += 1
+                print(f"Request {i} failed: {e}")
+
+    # Warm-up: load the embedding model and open pool connections untimed
+    await run_one(users[0], SAMPLE_MESSAGES[0], args.mode, args.cold, defaultdict(list))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.requests)))
+    wall = time.perf_counter() - started
+
+    summary = summarize(timings)
+    print_summary(summary, wall, args.requests, errors)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"mode": args.mode, "concurrency": args.concurrency, "requests": args.requests,
+                       "wall_seconds": round(wall, 3), "stages": summary}, f, indent=2)
+        print(f"Wrote {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(summary, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 1 if errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation pipeline offline.")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=10, help="number of bench-N@example.com users to cycle")
+    parser.add_argument("--seed-users", type=int, default=0, help="create N bench users with logs first")
+    parser.add_argument("--mode", choices=("dag", "groupchat"), default=orchestrator.PIPELINE_MODE)
+    parser.add_argument("--cold", action="store_true", help="bypass the activity and retrieval caches")
+    parser.add_argument("--retrieval", action="store_true",
+                        help="only time hybrid vs vector-only retrieval on the diet-plan query")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare p95s against a previous --json file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 regression (0.2 = 20%%)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run_benchmark(args)))
+
+
+if __name__ == "__main__":
+    main()
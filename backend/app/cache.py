@@ -0,0 +1,109 @@
+# backend/app/cache.py
+
+import time
+from cachetools import TTLCache
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .models import CacheVersion
+
+CORPUS_SCOPE = "corpus"
+
+
+def user_scope(user_email: str) -> str:
+    return f"user:{user_email}"
+
+
+# ─── Bounded LRU + TTL cache with hit/miss counters ─────────────────────────────
+class StatsCache:
+    """
+    Thin wrapper around cachetools.TTLCache (LRU eviction once `maxsize` is
+    reached, entries expire after `ttl` seconds) that counts hits and misses.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        value = self._cache.get(key, self._MISSING)
+        if value is self._MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._cache[key] = value
+
+    def pop(self, key):
+        self._cache.pop(key, None)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def normalize_query(query: str) -> str:
+    """
+    Cache key for a query string. all-MiniLM-L6-v2 uses an uncased tokenizer
+    that ignores whitespace runs, so case/whitespace variants embed identically.
+    """
+    return " ".join(query.lower().split())
+
+
+# ─── Cross-process invalidation via Postgres version counters ───────────────────
+async def bump_version(conn, scope: str) -> int:
+    """
+    Increment `scope`'s version (creating it at 1) and return the new value.
+    Run inside the writer's transaction so the bump commits with the data.
+    """
+    stmt = pg_insert(CacheVersion.__table__).values(scope=scope, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["scope"],
+        set_={"version": CacheVersion.__table__.c.version + 1},
+    ).returning(CacheVersion.__table__.c.version)
+    return (await conn.execute(stmt)).scalar_one()
+
+
+async def read_version(session, scope: str) -> int:
+    result = await session.execute(select(CacheVersion.version).where(CacheVersion.scope == scope))
+    return result.scalar_one_or_none() or 0
+
+
+class VersionWatcher:
+    """
+    Remembers the last seen version of a scope and re-reads it from Postgres
+    at most every `poll_seconds`. `check()` returns True when the version has
+    moved since the previous check, i.e. dependent caches must be dropped.
+    """
+
+    def __init__(self, scope: str, poll_seconds: float):
+        self.scope = scope
+        self.poll_seconds = poll_seconds
+        self.version: int | None = None
+        self._checked_at = 0.0
+
+    async def check(self, session) -> bool:
+        now = time.monotonic()
+        if self.version is not None and now - self._checked_at < self.poll_seconds:
+            return False
+        self._checked_at = now
+        current = await read_version(session, self.scope)
+        changed = self.version is not None and current != self.version
+        self.version = current
+        return changed
@@ -0,0 +1,125 @@
+# backend/app/chunker.py
+#
+# Streaming, token-aware chunker shared by the PDF loaders.
+#
+#   pages (generator) → sentences (generator) → chunks (generator)
+#
+# Chunks are sized in tokens of the embedding model's own tokenizer so nothing
+# is silently truncated at encode time, break on sentence boundaries where
+# possible, and repeat the last `overlap` tokens' worth of sentences of the
+# previous chunk. Only the current window of sentences is held in memory, so
+# a textbook is never materialized as one string.
+
+import os
+import re
+from collections import deque
+from typing import Iterable, Iterator
+
+from .embeddings import MAX_SEQ_LENGTH, get_embedder
+
+# Leave room for [CLS]/[SEP] and tokenizer drift below the model's limit
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", str(MAX_SEQ_LENGTH - 16)))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+
+# A run of text with no sentence boundary is flushed once it gets this long,
+# so a page of unpunctuated OCR output can't grow the carry-over unbounded.
+_MAX_CARRY_CHARS = 20_000
+
+
+# ─── Tokenizer ───────────────────────────────────────────────────────────────────
+_tokenizer = None
+
+
+def get_tokenizer():
+    """
+    The active embedding model's HF tokenizer, taken from whichever backend
+    serves it (torch or ONNX) so chunks are sized exactly as they are
+    encoded. Copied once per process with truncation and padding off.
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        from tokenizers import Tokenizer
+
+        tokenizer = Tokenizer.from_str(get_embedder().tokenizer.to_str())
+        tokenizer.no_truncation()
+        tokenizer.no_padding()
+        _tokenizer = tokenizer
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    return len(get_tokenizer().encode(text, add_special_tokens=False).ids)
+
+
+# ─── Sentences ───────────────────────────────────────────────────────────────────
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])|\n\s*\n")
+
+
+def _clean(text: str) -> str:
+    return " ".join(text.split())
+
+
+def iter_sentences(pages: Iterable[str]) -> Iterator[str]:
+    """
+    Yield sentences across page boundaries: the unfinished tail of each page
+    is carried into the next one.
+    """
+    carry = ""
+    for page in pages:
+        parts = _SENTENCE_BREAK.split(carry + "\n" + page if carry else page)
+        for sentence in parts[:-1]:
+            sentence = _clean(sentence)
+            if sentence:
+                yield sentence
+        carry = parts[-1]
+        if len(carry) > _MAX_CARRY_CHARS:
+            yield _clean(carry)
+            carry = ""
+    carry = _clean(carry)
+    if carry:
+        yield carry
+
+
+def _split_long(sentence: str, max_tokens: int) -> list[str]:
+    """Cut a sentence longer than max_tokens at token boundaries."""
+    encoding = get_tokenizer().encode(sentence, add_special_tokens=False)
+    offsets = encoding.offsets
+    pieces = []
+    for start in range(0, len(offsets), max_tokens):
+        window = offsets[start:start + max_tokens]
+        pieces.append(sentence[window[0][0]:window[-1][1]].strip())
+    return [piece for piece in pieces if piece]
+
+
+# ─── Chunks ──────────────────────────────────────────────────────────────────────
+def iter_chunks(pages: Iterable[str], max_tokens: int = CHUNK_TOKENS,
+                overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> Iterator[str]:
+    """
+    Pack sentences into chunks of at most `max_tokens` tokens. Each new chunk
+    starts with the trailing sentences of the previous one that fit in
+    `overlap_tokens`.
+    """
+    window: deque[tuple[str, int]] = deque()
+    total = 0
+    for sentence in iter_sentences(pages):
+        n = count_tokens(sentence)
+        pieces = [(sentence, n)] if n <= max_tokens else [
+            (piece, count_tokens(piece)) for piece in _split_long(sentence, max_tokens)
+        ]
+        for piece, n in pieces:
+            if window and total + n > max_tokens:
+                yield " ".join(s for s, _ in window)
+                kept: deque[tuple[str, int]] = deque()
+                kept_tokens = 0
+                for s, t in reversed(window):
+                    if kept_tokens + t > overlap_tokens:
+                        break
+                    kept.appendleft((s, t))
+                    kept_tokens += t
+                while kept and kept_tokens + n > max_tokens:
+                    kept_tokens -= kept.popleft()[1]
+                window, total = kept, kept_tokens
+            window.append((piece, n))
+            total += n
+    if window:
+        yield " ".join(s for s, _ in window)
@@ -0,0 +1,64 @@
+# backend/app/conftest.py
+#
+# The app modules read their settings at import time, so the test settings go
+# in before any test module imports them: the fake LLM backend (no network,
+# no latency), no response cache, and a DATABASE_URL models.py can build its
+# engine from (no test connects to it).
+
+import os
+
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://localhost/ayurvati_test")
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["LLM_CACHE"] = "0"
+os.environ["LLM_STREAM"] = "1"
+os.environ["FAKE_LLM_LATENCY_MS"] = "0"
+os.environ["FAKE_LLM_JITTER_MS"] = "0"
+
+import sys
+import types
+import numpy as np
+import pytest
+
+# A small BERT-style WordPiece vocabulary: enough for the test texts, with
+# everything else falling back to [UNK] (one token per word).
+_VOCAB = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "what", "should", "i", "eat", "today", "?", ".", ",", ":",
+          "one", "two", "three", "four", "##s", "rice", "dal", "ginger", "tea", "warm"]
+
+
+def _wordpiece_tokenizer():
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+
+    tokenizer = Tokenizer(models.WordPiece({t: i for i, t in enumerate(_VOCAB)}, unk_token="[UNK]"))
+    tokenizer.normalizer = normalizers.BertNormalizer(lowercase=True)
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.post_processor = processors.BertProcessing(("[SEP]", 3), ("[CLS]", 2))
+    tokenizer.enable_truncation(max_length=256)
+    tokenizer.enable_padding()
+    return tokenizer
+
+
+@pytest.fixture
+def torch_embedder(monkeypatch):
+    """
+    EMBEDDING_BACKEND=torch (the default) without downloading a model: a
+    stand-in SentenceTransformer carrying a real tokenizers.Tokenizer, in
+    place of sentence_transformers. No ONNX export exists.
+    """
+    pytest.importorskip("tokenizers")
+    from backend.app import chunker, embeddings
+
+    class SentenceTransformer:
+        def __init__(self, model_name):
+            self.tokenizer = types.SimpleNamespace(backend_tokenizer=_wordpiece_tokenizer())
+
+        def get_sentence_embedding_dimension(self):
+            return 8
+
+        def encode(self, sentences, **kwargs):
+            return np.ones((len(sentences), 8), dtype=np.float32)
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers",
+                        types.SimpleNamespace(SentenceTransformer=SentenceTransformer))
+    monkeypatch.setattr(embeddings, "_embedders", {})
+    monkeypatch.setattr(chunker, "_tokenizer", None)
+    return embeddings.get_embedder("torch")
@@ -7,12 +7,23 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Now that os.environ["DATABASE_URL"] is available, import engine/Base
-from models import engine, Base
+from sqlalchemy import text
+from models import engine, Base, ADD_DOC_TSV_COLUMN
+
+def create_missing_indexes(sync_conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
 
 async def init_db():
     async with engine.begin() as conn:
         # Create all tables defined on Base.metadata
         await conn.run_sync(Base.metadata.create_all)
+        # Columns added after a table was first created (create_all skips them)
+        await conn.execute(text(ADD_DOC_TSV_COLUMN))
+        # create_all only indexes tables it creates; add indexes that were
+        # introduced after an existing table was first created.
+        await conn.run_sync(create_missing_indexes)
     print("Tables created!")
 
 if __name__ == "__main__":
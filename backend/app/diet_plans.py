@@ -0,0 +1,187 @@
+# backend/app/diet_plans.py
+#
+# Precomputed diet plans. /recommendations/diet serves the user's stored plan
+# while no mood, symptom or meal log is newer than the ones it was built from,
+# and only runs the RAG + agent pipeline live (storing the result) otherwise.
+#
+# Batch mode, meant for an off-peak cron entry, e.g. nightly at 03:00:
+#
+#   0 3 * * *  cd /srv/ayurvati && python -m backend.app.diet_plans --concurrency 8
+#
+# finds users who logged something in the last DIET_PLAN_ACTIVE_DAYS days
+# after their stored plan was built (or who have none) and regenerates their
+# plans with at most `--concurrency` pipelines in flight.
+
+import os
+import time
+import asyncio
+import argparse
+import datetime
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .models import SessionLocal, DietPlan
+from .user_context import UserContext, load_user_context
+from .activity_cache import get_user_context
+from .rag_context import render_logs
+from .orchestrator import run_pipeline_with_stats, get_relevant_ayurveda_docs
+from .agent_registry import llm_io_executor
+
+DIET_PLAN_REQUEST = "Suggest today's Ayurvedic diet plan based on my recent logs."
+DIET_PLAN_CONCURRENCY = int(os.getenv("DIET_PLAN_CONCURRENCY", "4"))
+DIET_PLAN_ACTIVE_DAYS = float(os.getenv("DIET_PLAN_ACTIVE_DAYS", "7"))   # "active user" window
+DIET_PLAN_LOG_LIMIT = 5    # entries per log type the plan is built from
+
+_plans = DietPlan.__table__
+
+
+# ─── Inputs ──────────────────────────────────────────────────────────────────────
+async def fetch_plan_inputs(user_email: str):
+    """
+    Fetch the most recent 5 entries of mood, symptom, and meal logs for this
+    user (activity cache first, database on a miss) and the RAG chunks that
+    match them. Returns (user_context, docs).
+    """
+    ctx = await get_user_context(user_email, limit=DIET_PLAN_LOG_LIMIT)
+    docs = await get_relevant_ayurveda_docs(render_logs(ctx))
+    return ctx, docs
+
+
+def logs_through(ctx: UserContext) -> datetime.datetime | None:
+    """Timestamp of the newest mood/symptom/meal entry in `ctx` (chats do not shape the plan)."""
+    newest = [entries[0].timestamp for entries in (ctx.moods, ctx.symptoms, ctx.meals) if entries]
+    return max(newest) if newest else None
+
+
+# ─── Storage ─────────────────────────────────────────────────────────────────────
+async def load_plan(user_email: str):
+    async with SessionLocal() as session:
+        return (await session.execute(select(_plans).where(_plans.c.user_email == user_email))).first()
+
+
+def is_current(stored, ctx: UserContext) -> bool:
+    """True when `stored` was built from logs at least as new as those in `ctx`."""
+    if stored is None:
+        return False
+    latest = logs_through(ctx)
+    if latest is None:
+        return True
+    return stored.logs_through is not None and latest <= stored.logs_through
+
+
+async def store_plan(user_email: str, plan: str, stats: dict, through: datetime.datetime | None, source: str):
+    """
+    Upsert a user's plan. A plan built from older logs than the stored one
+    (e.g. a slow live run finishing after the batch) does not replace it.
+    """
+    stmt = pg_insert(_plans).values(
+        user_email=user_email,
+        plan=plan,
+        stats=stats,
+        logs_through=through,
+        source=source,
+        computed_at=datetime.datetime.utcnow(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_email"],
+        set_={col: stmt.excluded[col] for col in ("plan", "stats", "logs_through", "source", "computed_at")},
+        where=_plans.c.logs_through.is_(None) | (stmt.excluded.logs_through >= _plans.c.logs_through),
+    )
+    async with SessionLocal() as session:
+        await session.execute(stmt)
+        await session.commit()
+
+
+# ─── Generation ──────────────────────────────────────────────────────────────────
+async def generate_plan(user_email: str, ctx: UserContext, source: str) -> dict:
+    """
+    1. Retrieve the Ayurvedic sources that match the user's logs.
+    2. Run the RAG/agent pipeline (logs rendered compactly).
+    3. Store the plan, stamped with the newest log it was built from.
+    """
+    docs = await get_relevant_ayurveda_docs(render_logs(ctx))
+    plan, stats = await run_pipeline_with_stats(DIET_PLAN_REQUEST, docs=docs, user_context=ctx)
+    await store_plan(user_email, plan, stats.to_dict(), logs_through(ctx), source)
+    return {"plan": plan, "stats": stats.to_dict()}
+
+
+# ─── Batch mode ──────────────────────────────────────────────────────────────────
+# Newest mood/symptom/meal timestamp per recently active user, kept when it is
+# newer than the user's stored plan (or there is none).
+_DUE_USERS_SQL = text("""
+    WITH latest AS (
+        SELECT user_email, max(timestamp) AS logs_through
+          FROM (SELECT user_email, timestamp FROM mood_logs WHERE timestamp > :since
+                UNION ALL
+                SELECT user_email, timestamp FROM symptom_logs WHERE timestamp > :since
+                UNION ALL
+                SELECT user_email, timestamp FROM meal_logs WHERE timestamp > :since) recent
+         WHERE user_email IS NOT NULL
+         GROUP BY user_email
+    )
+    SELECT latest.user_email
+      FROM latest
+      LEFT JOIN diet_plans p ON p.user_email = latest.user_email
+     WHERE p.user_email IS NULL
+        OR p.logs_through IS NULL
+        OR latest.logs_through > p.logs_through
+     ORDER BY latest.logs_through DESC
+     LIMIT :limit
+""")
+
+
+async def due_users(active_days: float = DIET_PLAN_ACTIVE_DAYS, limit: int | None = None) -> list[str]:
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=active_days)
+    async with SessionLocal() as session:
+        result = await session.execute(_DUE_USERS_SQL, {"since": since, "limit": limit})
+        return [row.user_email for row in result]
+
+
+async def precompute_plans(concurrency: int = DIET_PLAN_CONCURRENCY, active_days: float = DIET_PLAN_ACTIVE_DAYS,
+                           limit: int | None = None, dry_run: bool = False):
+    """Regenerate the plans of every due user, `concurrency` at a time."""
+    users = await due_users(active_days, limit)
+    print(f"{len(users)} user(s) with new logs since their last plan (active within {active_days:g} day(s))")
+    if dry_run or not users:
+        return
+
+    semaphore = asyncio.Semaphore(concurrency)
+    done = failed = 0
+    started = time.perf_counter()
+
+    async def one(user_email: str):
+        nonlocal done, failed
+        async with semaphore:
+            try:
+                # Straight from Postgres: a batch process gains nothing from the activity cache
+                async with SessionLocal() as session:
+                    ctx = await load_user_context(session, user_email, limit=DIET_PLAN_LOG_LIMIT)
+                await generate_plan(user_email, ctx, source="batch")
+                done += 1
+            except Exception as e:
+                failed += 1
+                print(f"Plan for {user_email} failed: {e}")
+            if (done + failed) % 50 == 0:
+                print(f"  {done + failed}/{len(users)} processed")
+
+    await asyncio.gather(*(one(user_email) for user_email in users))
+    elapsed = time.perf_counter() - started
+    print(f"Precomputed {done} plan(s) in {elapsed:.1f}s ({failed} failed, concurrency {concurrency})")
+
+
+async def _main(args):
+    # As in the API's lifespan: LLM calls run on the default executor
+    asyncio.get_running_loop().set_default_executor(llm_io_executor())
+    await precompute_plans(args.concurrency, args.active_days, args.limit, args.dry_run)
+
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute diet plans for users with new logs.")
+    parser.add_argument("--concurrency", type=int, default=DIET_PLAN_CONCURRENCY,
+                        help="pipelines in flight at once")
+    parser.add_argument("--active-days", type=float, default=DIET_PLAN_ACTIVE_DAYS,
+                        help="only users who logged within this many days")
+    parser.add_argument("--limit", type=int, default=None, help="at most this many users (newest activity first)")
+    parser.add_argument("--dry-run", action="store_true", help="only count the users that are due")
+    asyncio.run(_main(parser.parse_args()))
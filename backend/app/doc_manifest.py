@@ -0,0 +1,269 @@
+# backend/app/doc_manifest.py
+
+import os
+import hashlib
+import datetime
+from dataclasses import dataclass
+from sqlalchemy import select, delete, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .models import Base, AyurvedaDoc, AyurvedaDocSource, DocEmbedding, ADD_DOC_TSV_COLUMN
+from .embedding_store import ModelInfo, upsert_embeddings
+
+
+# ─── Content hashing ─────────────────────────────────────────────────────────────
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """sha256 of a file's bytes, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_sha256(chunk: str) -> str:
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+
+
+# ─── Schema ──────────────────────────────────────────────────────────────────────
+async def ensure_manifest_schema(conn):
+    """
+    Create missing tables and add the incremental-ingest columns to an
+    ayurveda_docs table that predates them (create_all never alters tables).
+    """
+    await conn.run_sync(Base.metadata.create_all)
+    await conn.execute(text("""
+        ALTER TABLE ayurveda_docs
+            ADD COLUMN IF NOT EXISTS source_file VARCHAR,
+            ADD COLUMN IF NOT EXISTS chunk_index INTEGER,
+            ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)
+    """))
+    await conn.execute(text(ADD_DOC_TSV_COLUMN))
+    await conn.execute(text("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_ayurveda_docs_source_chunk
+            ON ayurveda_docs (source_file, chunk_index)
+    """))
+    await conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS ix_ayurveda_docs_content_tsv
+            ON ayurveda_docs USING gin (content_tsv)
+    """))
+
+
+# ─── Change detection ────────────────────────────────────────────────────────────
+@dataclass
+class SourceFile:
+    source_file: str     # manifest key (the PDF's file name)
+    path: str
+    size: int
+    mtime: int
+    file_hash: str | None = None
+
+
+@dataclass
+class IngestPlan:
+    changed: list[SourceFile]      # new or modified PDFs → extract + diff chunks
+    unchanged: list[SourceFile]
+    removed: list[str]             # manifest entries whose PDF is gone
+
+
+async def plan_ingest(conn, pdf_paths: list[str]) -> IngestPlan:
+    """
+    Compare the PDFs on disk with the manifest.
+
+    A file whose size and mtime match its manifest row is unchanged without
+    being read. Otherwise it is hashed; if the hash still matches, only its
+    stat fields are refreshed.
+    """
+    manifest = {
+        row.source_file: row
+        for row in (await conn.execute(select(AyurvedaDocSource.__table__))).fetchall()
+    }
+    plan = IngestPlan(changed=[], unchanged=[], removed=[])
+    seen = set()
+
+    for path in pdf_paths:
+        st = os.stat(path)
+        src = SourceFile(os.path.basename(path), path, st.st_size, st.st_mtime_ns)
+        seen.add(src.source_file)
+        known = manifest.get(src.source_file)
+
+        if known is not None and known.file_size == src.size and known.file_mtime == src.mtime:
+            plan.unchanged.append(src)
+            continue
+
+        src.file_hash = file_sha256(path)
+        if known is not None and known.file_hash == src.file_hash:
+            await conn.execute(
+                AyurvedaDocSource.__table__.update()
+                .where(AyurvedaDocSource.source_file == src.source_file)
+                .values(file_size=src.size, file_mtime=src.mtime)
+            )
+            plan.unchanged.append(src)
+        else:
+            plan.changed.append(src)
+
+    plan.removed = [name for name in manifest if name not in seen]
+    return plan
+
+
+async def load_chunk_hashes(conn, source_file: str) -> dict[int, str]:
+    """chunk_index → content_hash of a PDF's stored chunks (no embeddings)."""
+    result = await conn.execute(
+        select(AyurvedaDoc.chunk_index, AyurvedaDoc.content_hash)
+        .where(AyurvedaDoc.source_file == source_file)
+    )
+    return {row.chunk_index: row.content_hash for row in result}
+
+
+class ChunkDiffer:
+    """
+    Work out which chunks of a changed PDF actually need embedding, one chunk
+    at a time as the chunker yields them (indices start at 1).
+
+    A chunk whose hash already sits at the same index is "unchanged". A chunk
+    whose hash exists at another index (e.g. shifted by an inserted page) is
+    "moved" and can copy the stored embeddings. Only genuinely "new" text is
+    embedded. Just the file's hashes are held in memory, never its embeddings.
+    """
+
+    def __init__(self, hash_at: dict[int, str]):
+        self.hash_at = hash_at
+        self.known = set(hash_at.values())
+        self.count = 0
+        self.unchanged = 0
+
+    def classify(self, chunk: str) -> tuple[str, int, str]:
+        """Return (kind, chunk_index, content_hash) for the next chunk."""
+        self.count += 1
+        digest = chunk_sha256(chunk)
+        if self.hash_at.get(self.count) == digest:
+            self.unchanged += 1
+            return "unchanged", self.count, digest
+        if digest in self.known:
+            return "moved", self.count, digest
+        return "new", self.count, digest
+
+    @property
+    def stale_from(self) -> int:
+        """Rows with chunk_index >= this are left over from a longer version."""
+        return self.count + 1
+
+
+async def copy_moved_chunks(conn, source_file: str, moved: list[tuple[int, str, str]],
+                            models: list[ModelInfo]) -> list[tuple[int, str, str]]:
+    """
+    Upsert moved chunks with the vectors stored under their hash, for every
+    model in `models`. Returns the ones lacking a vector for any of them
+    (e.g. the old row was already overwritten during this ingest); the caller
+    embeds those instead.
+    """
+    if not moved:
+        return []
+    vectors = DocEmbedding.__table__
+    # Each vector records the hash of the text it was computed from, so it can
+    # still be found after its chunk row has been overwritten with other text.
+    result = await conn.execute(
+        select(vectors.c.model_id, vectors.c.content_hash, vectors.c.embedding)
+        .join(AyurvedaDoc.__table__, AyurvedaDoc.id == vectors.c.doc_id)
+        .where(AyurvedaDoc.source_file == source_file)
+        .where(vectors.c.model_id.in_([model.id for model in models]))
+        .where(vectors.c.content_hash.in_({digest for _, _, digest in moved}))
+        .distinct(vectors.c.model_id, vectors.c.content_hash)
+    )
+    embedding_for = {(row.model_id, row.content_hash): row.embedding for row in result}
+    found, missing = [], []
+    for item in moved:
+        if all((model.id, item[2]) in embedding_for for model in models):
+            found.append(item)
+        else:
+            missing.append(item)
+    await store_chunks(conn, source_file, found, {
+        model.id: [embedding_for[(model.id, digest)] for _, _, digest in found] for model in models
+    })
+    return missing
+
+
+# ─── Writes ──────────────────────────────────────────────────────────────────────
+def chunk_row(source_file: str, chunk_index: int, chunk: str, content_hash: str) -> dict:
+    return {
+        "title": f"{source_file} (chunk {chunk_index})",
+        "content": chunk,
+        "source_file": source_file,
+        "chunk_index": chunk_index,
+        "content_hash": content_hash,
+    }
+
+
+async def upsert_chunks(conn, rows: list[dict]) -> dict[int, int]:
+    """Multi-row upsert keyed on (source_file, chunk_index); returns chunk_index → id."""
+    if not rows:
+        return {}
+    table = AyurvedaDoc.__table__
+    stmt = pg_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["source_file", "chunk_index"],
+        set_={
+            "title": stmt.excluded.title,
+            "content": stmt.excluded.content,
+            "content_hash": stmt.excluded.content_hash,
+        },
+    ).returning(table.c.chunk_index, table.c.id)
+    result = await conn.execute(stmt, rows)
+    return {row.chunk_index: row.id for row in result}
+
+
+async def store_chunks(conn, source_file: str, items: list[tuple[int, str, str]], vectors: dict[int, list]):
+    """
+    Upsert (chunk_index, chunk, content_hash) items of one PDF together with
+    their vectors: `vectors` maps model id → one vector per item, in order.
+    """
+    if not items:
+        return
+    ids = await upsert_chunks(conn, [chunk_row(source_file, idx, chunk, digest) for idx, chunk, digest in items])
+    for model_id, model_vectors in vectors.items():
+        await upsert_embeddings(conn, model_id, [
+            {"doc_id": ids[idx], "content_hash": digest, "embedding": vector}
+            for (idx, _, digest), vector in zip(items, model_vectors)
+        ])
+
+
+async def delete_stale_chunks(conn, source_file: str, stale_from: int):
+    await conn.execute(
+        delete(AyurvedaDoc.__table__)
+        .where(AyurvedaDoc.source_file == source_file)
+        .where(AyurvedaDoc.chunk_index >= stale_from)
+    )
+
+
+async def record_source(conn, src: SourceFile, chunk_count: int):
+    """Upsert the manifest row once all of a PDF's chunks are stored."""
+    values = {
+        "source_file": src.source_file,
+        "file_hash": src.file_hash or file_sha256(src.path),
+        "file_size": src.size,
+        "file_mtime": src.mtime,
+        "chunk_count": chunk_count,
+        "updated_at": datetime.datetime.utcnow(),
+    }
+    stmt = pg_insert(AyurvedaDocSource.__table__).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["source_file"],
+        set_={k: v for k, v in values.items() if k != "source_file"},
+    )
+    await conn.execute(stmt)
+
+
+async def remove_sources(conn, source_files: list[str], purge_legacy: bool = False):
+    """
+    Delete the chunks and manifest rows of PDFs that no longer exist.
+    With purge_legacy, also drop rows loaded before source tracking existed.
+    """
+    if source_files:
+        await conn.execute(
+            delete(AyurvedaDoc.__table__).where(AyurvedaDoc.source_file.in_(source_files))
+        )
+        await conn.execute(
+            delete(AyurvedaDocSource.__table__).where(AyurvedaDocSource.source_file.in_(source_files))
+        )
+    if purge_legacy:
+        await conn.execute(delete(AyurvedaDoc.__table__).where(AyurvedaDoc.source_file.is_(None)))
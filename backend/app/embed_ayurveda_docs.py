@@ -2,50 +2,170 @@ import os
 import fitz  # PyMuPDF
 from pdf2image import convert_from_path
 import pytesseract
-from sentence_transformers import SentenceTransformer
 import asyncio
-from backend.app.models import AyurvedaDoc, SessionLocal
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from diskcache import Cache
+from backend.app.models import SessionLocal, engine
+from backend.app.doc_manifest import (
+    SourceFile,
+    file_sha256,
+    ensure_manifest_schema,
+    plan_ingest,
+    load_chunk_hashes,
+    ChunkDiffer,
+    copy_moved_chunks,
+    store_chunks,
+    delete_stale_chunks,
+    record_source,
+    remove_sources,
+)
+from backend.app.cache import bump_version, CORPUS_SCOPE
+from backend.app.embeddings import get_embedder
+from backend.app.embedding_store import ensure_ingest_models
+from backend.app.chunker import iter_chunks
 
 PDF_FOLDER = "assets"  # Folder containing your PDFs
 
-# Load embedding model
-model = SentenceTransformer("all-MiniLM-L6-v2")
-
-async def process_pdf(pdf_path, session):
-    # Try direct text extraction first
-    doc = fitz.open(pdf_path)
-    text = ""
-    for page in doc:
-        page_text = page.get_text()
-        if page_text.strip():
-            text += page_text + "\n"
-    doc.close()
-    # If no text extracted, use OCR on images
-    if not text.strip():
-        print(f"Using OCR for: {pdf_path}")
-        images = convert_from_path(pdf_path)
-        for img in images:
-            text += pytesseract.image_to_string(img) + "\n"
-    # Only process if text found
-    if text.strip():
-        embedding = model.encode(text[:2048]).tolist()  # Truncate if very long
-        title = os.path.basename(pdf_path)
-        doc = AyurvedaDoc(
-            title=title,
-            content=text[:10000],   # Store only first 10k chars for demo; adjust as needed
-            embedding=embedding
-        )
-        session.add(doc)
-        print(f"Processed and embedded: {title}")
+EMBED_BATCH_SIZE = 64   # chunks per encode() / upsert
+
+# ─── OCR settings ────────────────────────────────────────────────────────────────
+# Pages are checked one by one: only pages without a usable text layer are
+# rasterized (one page per task, at OCR_DPI) and OCR'd in a process pool.
+# Results are cached on disk per (file hash, page, dpi, language), so
+# re-running after a crash or a chunker change never OCRs a page twice.
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_MIN_TEXT_CHARS = int(os.getenv("OCR_MIN_TEXT_CHARS", "20"))   # less than this + images → scanned page
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", os.path.join(".cache", "ocr"))
+
+ocr_cache = Cache(OCR_CACHE_DIR)
+
+# Embedding model is shared + lazily loaded (see backend.app.embeddings)
+
+
+def _ocr_worker_init():
+    # One tesseract thread per process; the pool provides the parallelism
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ocr_page(pdf_path: str, page_number: int, dpi: int, lang: str) -> str:
+    """Worker: rasterize a single page (1-based) and OCR it."""
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)
+    return pytesseract.image_to_string(images[0], lang=lang) if images else ""
+
+
+def iter_pages(src: SourceFile, ocr_pool: ProcessPoolExecutor, lookahead: int = 2 * OCR_WORKERS):
+    """
+    Yield page texts in order. Pages with a text layer are read directly;
+    the others are OCR'd (cache first) with up to `lookahead` pages in flight.
+    """
+    file_hash = src.file_hash or file_sha256(src.path)
+    window: deque = deque()   # str, or (cache key, future) for an OCR in flight
+    ocr_pages = cached_pages = 0
+
+    def resolve(item) -> str:
+        if isinstance(item, str):
+            return item
+        key, future = item
+        text = future.result()
+        ocr_cache.set(key, text)
+        return text
+
+    doc = fitz.open(src.path)
+    try:
+        for page in doc:
+            page_text = page.get_text()
+            if len(page_text.strip()) >= OCR_MIN_TEXT_CHARS or not page.get_images():
+                window.append(page_text)
+            else:
+                key = (file_hash, page.number + 1, OCR_DPI, OCR_LANG)
+                cached = ocr_cache.get(key)
+                if cached is not None:
+                    cached_pages += 1
+                    window.append(cached)
+                else:
+                    ocr_pages += 1
+                    window.append((key, ocr_pool.submit(_ocr_page, src.path, page.number + 1, OCR_DPI, OCR_LANG)))
+            while len(window) > lookahead:
+                yield resolve(window.popleft())
+    finally:
+        doc.close()
+    while window:
+        yield resolve(window.popleft())
+    if ocr_pages or cached_pages:
+        print(f"OCR for {src.source_file}: {ocr_pages} page(s) OCR'd, {cached_pages} from cache")
+
+
+async def _embed_and_store(session, source_file: str, batch: list[tuple[int, str, str]], models):
+    texts = [chunk for _, chunk, _ in batch]
+    await store_chunks(session, source_file, batch, {
+        model.id: get_embedder(model_name=model.name).encode(texts, batch_size=EMBED_BATCH_SIZE).tolist()
+        for model in models
+    })
+
+
+async def process_pdf(src: SourceFile, session, ocr_pool: ProcessPoolExecutor, models):
+    """
+    Stream the PDF's pages through the shared token-aware chunker; every chunk
+    is stored and embedded in full (no truncation), EMBED_BATCH_SIZE at a time,
+    so memory stays flat however long the PDF is. `models` are the embedding
+    model versions to write (the active one, plus any being re-embedded).
+    """
+    differ = ChunkDiffer(await load_chunk_hashes(session, src.source_file))
+    to_embed: list[tuple[int, str, str]] = []
+    moved: list[tuple[int, str, str]] = []
+    embedded = 0
+    for chunk in iter_chunks(iter_pages(src, ocr_pool)):
+        kind, idx, digest = differ.classify(chunk)
+        if kind == "new":
+            to_embed.append((idx, chunk, digest))
+        elif kind == "moved":
+            moved.append((idx, chunk, digest))
+        if len(moved) >= EMBED_BATCH_SIZE:
+            to_embed.extend(await copy_moved_chunks(session, src.source_file, moved, models))
+            moved = []
+        if len(to_embed) >= EMBED_BATCH_SIZE:
+            await _embed_and_store(session, src.source_file, to_embed, models)
+            embedded += len(to_embed)
+            to_embed = []
+    to_embed.extend(await copy_moved_chunks(session, src.source_file, moved, models))
+    if to_embed:
+        await _embed_and_store(session, src.source_file, to_embed, models)
+        embedded += len(to_embed)
+    await delete_stale_chunks(session, src.source_file, differ.stale_from)
+    await record_source(session, src, differ.count)
+    if not differ.count:
+        print(f"No text found for: {src.path}")
+    elif embedded:
+        print(f"Processed and embedded: {src.source_file} ({differ.count} chunk(s), {embedded} embedded)")
     else:
-        print(f"No text found for: {pdf_path}")
+        print(f"Content unchanged, kept embeddings: {src.source_file}")
 
 async def main():
-    async with SessionLocal() as session:
-        for filename in os.listdir(PDF_FOLDER):
-            if filename.lower().endswith('.pdf'):
-                await process_pdf(os.path.join(PDF_FOLDER, filename), session)
-        await session.commit()
+    pdf_paths = [
+        os.path.join(PDF_FOLDER, filename)
+        for filename in sorted(os.listdir(PDF_FOLDER))
+        if filename.lower().endswith('.pdf')
+    ]
+    async with engine.begin() as conn:
+        await ensure_manifest_schema(conn)
+        models = await ensure_ingest_models(conn)
+        plan = await plan_ingest(conn, pdf_paths)
+        await remove_sources(conn, plan.removed)
+    print(f"{len(plan.changed)} new/changed, {len(plan.unchanged)} unchanged, {len(plan.removed)} removed PDF(s)")
+
+    with ProcessPoolExecutor(max_workers=OCR_WORKERS, initializer=_ocr_worker_init) as ocr_pool:
+        for src in plan.changed:
+            # One transaction per PDF: the manifest row commits with its chunks
+            async with SessionLocal() as session:
+                await process_pdf(src, session, ocr_pool, models)
+                await session.commit()
+    if plan.changed or plan.removed:
+        # Tell running API workers to drop their cached retrieval results
+        async with engine.begin() as conn:
+            await bump_version(conn, CORPUS_SCOPE)
     print("All PDFs processed!")
 
 if __name__ == "__main__":
@@ -0,0 +1,313 @@
+# backend/app/embedding_store.py
+#
+# Versioned embedding store: chunk vectors live in doc_embeddings keyed by
+# (doc_id, model_id), one embedding_models row per model name + version with
+# the model's real dimension, stored as halfvec.
+#
+#   python -m backend.app.embedding_store status
+#   python -m backend.app.embedding_store reembed --model BAAI/bge-small-en-v1.5 --version 1 --activate
+#   python -m backend.app.embedding_store activate --model ... --version ...
+#   python -m backend.app.embedding_store drop --model ... --version ...
+#   python -m backend.app.embedding_store drop-legacy      # old ayurveda_docs.embedding column
+#
+# Switching models:
+#   1. `reembed` registers the new version as "building" and fills it in
+#      batches while the active version keeps serving. The loaders write both
+#      from then on, so chunks ingested meanwhile are not missed.
+#   2. Its partial ANN index is built CONCURRENTLY (vector_index.py).
+#   3. `activate` flips is_active in one UPDATE and bumps the corpus version in
+#      the same transaction; API workers pick the new model (and drop cached
+#      results) on their next corpus poll.
+
+import os
+import time
+import asyncio
+import argparse
+from dataclasses import dataclass
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .models import engine, EmbeddingModel, DocEmbedding
+from .embeddings import get_embedder, MODEL_NAME
+from .cache import bump_version, CORPUS_SCOPE
+
+EMBEDDING_MODEL_VERSION = os.getenv("EMBEDDING_MODEL_VERSION", "1")
+REEMBED_BATCH_SIZE = int(os.getenv("REEMBED_BATCH_SIZE", "256"))
+REEMBED_ENCODE_BATCH_SIZE = 64
+
+
+# ─── Registry ────────────────────────────────────────────────────────────────────
+@dataclass(frozen=True)
+class ModelInfo:
+    id: int
+    name: str
+    version: str
+    dimension: int
+    status: str
+
+    @classmethod
+    def from_row(cls, row) -> "ModelInfo":
+        return cls(row.id, row.name, row.version, row.dimension, row.status)
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}@{self.version}"
+
+    @property
+    def vector_expr(self) -> str:
+        """The typed expression every query and this model's index must share."""
+        return f"(embedding::halfvec({int(self.dimension)}))"
+
+    @property
+    def index_name(self) -> str:
+        return f"doc_embeddings_m{int(self.id)}_ann_idx"
+
+
+_models = EmbeddingModel.__table__
+_vectors = DocEmbedding.__table__
+
+
+async def get_model(conn, name: str, version: str) -> ModelInfo | None:
+    row = (await conn.execute(
+        select(_models).where(_models.c.name == name, _models.c.version == version)
+    )).first()
+    return ModelInfo.from_row(row) if row else None
+
+
+async def active_model(conn) -> ModelInfo | None:
+    row = (await conn.execute(select(_models).where(_models.c.is_active))).first()
+    return ModelInfo.from_row(row) if row else None
+
+
+async def writable_models(conn) -> list[ModelInfo]:
+    """Models the loaders keep current: the active one plus any being built."""
+    rows = (await conn.execute(
+        select(_models).where(_models.c.status.in_(("active", "building"))).order_by(_models.c.id)
+    )).fetchall()
+    return [ModelInfo.from_row(row) for row in rows]
+
+
+async def register_model(conn, name: str, version: str, dimension: int) -> ModelInfo:
+    """Add a model version as "building" (no-op if known; its dimension must match)."""
+    known = await get_model(conn, name, version)
+    if known is not None:
+        if known.dimension != dimension:
+            raise ValueError(f"{known.label} is registered with dimension {known.dimension}, "
+                             f"but the model produces {dimension}; register a new version")
+        return known
+    stmt = pg_insert(_models).values(name=name, version=version, dimension=dimension, status="building")
+    await conn.execute(stmt.on_conflict_do_nothing(index_elements=["name", "version"]))
+    return await get_model(conn, name, version)
+
+
+async def ensure_ingest_models(conn) -> list[ModelInfo]:
+    """
+    The models a loader must embed new chunks with. An empty store gets
+    EMBEDDING_MODEL@EMBEDDING_MODEL_VERSION registered and activated; only
+    then is the embedder loaded here, to read its dimension.
+    """
+    models = await writable_models(conn)
+    if models:
+        return models
+    embedder = await asyncio.to_thread(get_embedder, model_name=MODEL_NAME)
+    model = await register_model(conn, MODEL_NAME, EMBEDDING_MODEL_VERSION, int(embedder.dimension))
+    await _switch_active(conn, model)
+    return await writable_models(conn)
+
+
+# ─── Vectors ─────────────────────────────────────────────────────────────────────
+async def upsert_embeddings(conn, model_id: int, rows: list[dict]):
+    """rows: {"doc_id", "content_hash", "embedding"} for one model."""
+    if not rows:
+        return
+    stmt = pg_insert(_vectors)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["doc_id", "model_id"],
+        set_={"content_hash": stmt.excluded.content_hash, "embedding": stmt.excluded.embedding},
+    )
+    await conn.execute(stmt, [{**row, "model_id": model_id} for row in rows])
+
+
+# Chunks with no vector for the model, or one computed from older text
+_STALE_DOCS = text("""
+    SELECT d.id, d.content, d.content_hash
+    FROM ayurveda_docs d
+    LEFT JOIN doc_embeddings e ON e.doc_id = d.id AND e.model_id = :model_id
+    WHERE d.id > :after
+      AND (e.doc_id IS NULL OR e.content_hash IS DISTINCT FROM d.content_hash)
+    ORDER BY d.id
+    LIMIT :limit
+""")
+
+
+async def count_stale(conn, model: ModelInfo) -> int:
+    return (await conn.execute(text("""
+        SELECT count(*)
+        FROM ayurveda_docs d
+        LEFT JOIN doc_embeddings e ON e.doc_id = d.id AND e.model_id = :model_id
+        WHERE e.doc_id IS NULL OR e.content_hash IS DISTINCT FROM d.content_hash
+    """), {"model_id": model.id})).scalar_one()
+
+
+# ─── Background re-embedding ─────────────────────────────────────────────────────
+async def reembed(name: str = MODEL_NAME, version: str = EMBEDDING_MODEL_VERSION,
+                  batch_size: int = REEMBED_BATCH_SIZE, activate: bool = False, build_index: bool = True):
+    """
+    Fill `name`@`version` for every chunk, `batch_size` chunks per encode and
+    transaction, so the active model keeps serving throughout.
+
+    1. Register the version as "building" with the dimension the model reports.
+    2. Walk ayurveda_docs by id, embedding chunks that lack a current vector;
+       repeat until a pass finds none (catches chunks rewritten mid-run).
+    3. Build the version's ANN index, then optionally activate it.
+    """
+    embedder = await asyncio.to_thread(get_embedder, model_name=name)
+    async with engine.begin() as conn:
+        model = await register_model(conn, name, version, int(embedder.dimension))
+    print(f"Re-embedding into {model.label} (dim {model.dimension}, status {model.status})")
+
+    started = time.perf_counter()
+    total = 0
+    while True:
+        embedded, after = 0, 0
+        while True:
+            async with engine.connect() as conn:
+                rows = (await conn.execute(_STALE_DOCS, {
+                    "model_id": model.id, "after": after, "limit": batch_size,
+                })).fetchall()
+            if not rows:
+                break
+            vectors = await asyncio.to_thread(
+                embedder.encode, [row.content or "" for row in rows],
+                batch_size=REEMBED_ENCODE_BATCH_SIZE, show_progress_bar=False,
+            )
+            async with engine.begin() as conn:
+                await upsert_embeddings(conn, model.id, [
+                    {"doc_id": row.id, "content_hash": row.content_hash, "embedding": vector.tolist()}
+                    for row, vector in zip(rows, vectors)
+                ])
+            embedded += len(rows)
+            after = rows[-1].id
+            elapsed = max(time.perf_counter() - started, 1e-9)
+            print(f"  → {total + embedded} chunk(s) embedded ({(total + embedded) / elapsed:.1f} chunks/s)")
+        total += embedded
+        if not embedded:
+            break
+
+    print(f"{model.label}: {total} chunk(s) embedded in {time.perf_counter() - started:.1f}s")
+    if build_index:
+        from .vector_index import build_index as build_ann_index
+        await build_ann_index(model=model)
+    if activate:
+        await activate_model(name, version)
+
+
+# ─── Atomic switch ───────────────────────────────────────────────────────────────
+async def _switch_active(conn, model: ModelInfo):
+    # One statement: readers see either the old active model or the new one
+    await conn.execute(text("""
+        UPDATE embedding_models
+        SET is_active = (id = :id),
+            status = CASE WHEN id = :id THEN 'active'
+                          WHEN is_active THEN 'retired'
+                          ELSE status END,
+            activated_at = CASE WHEN id = :id THEN now() ELSE activated_at END
+        WHERE id = :id OR is_active
+    """), {"id": model.id})
+    await bump_version(conn, CORPUS_SCOPE)
+
+
+async def activate_model(name: str, version: str, force: bool = False) -> ModelInfo:
+    """
+    Make `name`@`version` the model retrieval uses. Refuses while chunks are
+    still missing a current vector for it, unless `force`.
+    """
+    async with engine.begin() as conn:
+        model = await get_model(conn, name, version)
+        if model is None:
+            raise ValueError(f"{name}@{version} is not registered; run `reembed` first")
+        stale = await count_stale(conn, model)
+        if stale and not force:
+            raise RuntimeError(f"{model.label} still has {stale} chunk(s) without a current vector")
+        await _switch_active(conn, model)
+    print(f"{model.label} is now active.")
+    return model
+
+
+async def drop_model(name: str, version: str):
+    """Delete a non-active model version, its vectors (cascade) and its index."""
+    async with engine.begin() as conn:
+        model = await get_model(conn, name, version)
+        if model is None:
+            print(f"{name}@{version} is not registered.")
+            return
+        if model.status == "active":
+            raise RuntimeError(f"{model.label} is active; activate another version first")
+    from .vector_index import drop_index
+    await drop_index(model)
+    async with engine.begin() as conn:
+        await conn.execute(_models.delete().where(_models.c.id == model.id))
+    print(f"Dropped {model.label}.")
+
+
+async def drop_legacy_column():
+    """Drop the pre-versioning ayurveda_docs.embedding column (and its index)."""
+    async with engine.begin() as conn:
+        await conn.execute(text("ALTER TABLE ayurveda_docs DROP COLUMN IF EXISTS embedding"))
+    print("Dropped ayurveda_docs.embedding.")
+
+
+# ─── Inspection ──────────────────────────────────────────────────────────────────
+async def store_status():
+    async with engine.connect() as conn:
+        docs = (await conn.execute(text("SELECT count(*) FROM ayurveda_docs"))).scalar_one()
+        rows = (await conn.execute(text("""
+            SELECT m.id, m.name, m.version, m.dimension, m.status, m.is_active,
+                   count(e.doc_id) AS vectors,
+                   pg_size_pretty(coalesce(sum(pg_column_size(e.embedding)), 0)) AS size
+            FROM embedding_models m
+            LEFT JOIN doc_embeddings e ON e.model_id = m.id
+            GROUP BY m.id
+            ORDER BY m.id
+        """))).fetchall()
+        stale = {row.id: await count_stale(conn, ModelInfo.from_row(row)) for row in rows}
+    if not rows:
+        print("No embedding models registered yet; the first load registers one.")
+    print(f"{docs} chunk(s) in ayurveda_docs")
+    for row in rows:
+        marker = "*" if row.is_active else " "
+        print(f"{marker} {row.name}@{row.version} (id {row.id}, dim {row.dimension}, {row.status}): "
+              f"{row.vectors} vector(s), {row.size}, {stale[row.id]} stale/missing")
+
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage versioned chunk embeddings.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+    p = sub.add_parser("reembed")
+    p.add_argument("--model", default=MODEL_NAME)
+    p.add_argument("--version", default=EMBEDDING_MODEL_VERSION)
+    p.add_argument("--batch-size", type=int, default=REEMBED_BATCH_SIZE)
+    p.add_argument("--activate", action="store_true", help="switch retrieval to it when done")
+    p.add_argument("--no-index", action="store_true", help="skip building its ANN index")
+    for name in ("activate", "drop"):
+        p = sub.add_parser(name)
+        p.add_argument("--model", default=MODEL_NAME)
+        p.add_argument("--version", default=EMBEDDING_MODEL_VERSION)
+        if name == "activate":
+            p.add_argument("--force", action="store_true", help="activate despite stale vectors")
+    sub.add_parser("drop-legacy")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        asyncio.run(store_status())
+    elif args.command == "reembed":
+        asyncio.run(reembed(args.model, args.version, args.batch_size,
+                            activate=args.activate, build_index=not args.no_index))
+    elif args.command == "activate":
+        asyncio.run(activate_model(args.model, args.version, force=args.force))
+    elif args.command == "drop":
+        asyncio.run(drop_model(args.model, args.version))
+    else:
+        asyncio.run(drop_legacy_column())
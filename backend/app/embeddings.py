@@ -0,0 +1,319 @@
+# backend/app/embeddings.py
+#
+# One embedding service for the API, the loaders and scripts. Nothing heavy is
+# imported until the first encode(), so importing models/orchestrator (e.g. in
+# create_tables or tests) no longer pulls in torch.
+#
+#   EMBEDDING_BACKEND=torch  (default) sentence-transformers on torch
+#   EMBEDDING_BACKEND=onnx   ONNX Runtime, int8-quantized by default
+#
+#   python -m backend.app.embeddings export   # build the ONNX model once
+#   python -m backend.app.embeddings check    # cosine(torch, onnx) equivalence
+
+import os
+import sys
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+MODEL_NAME = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+
+
+# Anchored at the project root, not the working directory, so the API and the
+# loaders find the same export wherever they are started from.
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def onnx_dir_for(model_name: str) -> str:
+    return os.path.join(_PROJECT_ROOT, ".cache", "onnx", model_name.replace("/", "__"))
+
+
+ONNX_DIR = os.path.abspath(os.getenv("EMBEDDING_ONNX_DIR", onnx_dir_for(MODEL_NAME)))
+ONNX_INT8 = os.getenv("EMBEDDING_ONNX_INT8", "1") == "1"
+MAX_SEQ_LENGTH = 256   # all-MiniLM-L6-v2's max_seq_length
+
+
+# ─── Backends ────────────────────────────────────────────────────────────────────
+class TorchEmbedder:
+    """sentence-transformers on torch (reference implementation)."""
+
+    def __init__(self, model_name: str = MODEL_NAME):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    @property
+    def tokenizer(self):
+        """The model's HF tokenizers.Tokenizer, the same kind OnnxEmbedder uses."""
+        return self.model.tokenizer.backend_tokenizer
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        return self.model.encode(sentences, batch_size=batch_size, show_progress_bar=show_progress_bar)
+
+
+class OnnxEmbedder:
+    """
+    ONNX Runtime + HF tokenizers, reproducing the sentence-transformers
+    pipeline for MiniLM: mean pooling over the attention mask, then L2
+    normalisation. Needs neither torch nor transformers at runtime.
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, onnx_dir: str | None = None, int8: bool = ONNX_INT8):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        if onnx_dir is None:
+            onnx_dir = ONNX_DIR if model_name == MODEL_NAME else onnx_dir_for(model_name)
+        model_path = os.path.join(onnx_dir, "model.int8.onnx" if int8 else "model.onnx")
+        if not os.path.exists(model_path):
+            export_onnx(model_name, onnx_dir, quantize=int8)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(onnx_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = os.getenv("EMBEDDING_ONNX_THREADS")
+        if threads:
+            options.intra_op_num_threads = int(threads)
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+
+    def _encode_batch(self, sentences: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(sentences)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        mask = feeds["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+        if not sentences:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        # Sort by length so each padded batch wastes as little compute as possible
+        order = np.argsort([-len(s) for s in sentences])
+        out = np.empty((len(sentences), self.dimension), dtype=np.float32)
+        for start in range(0, len(sentences), batch_size):
+            idx = order[start:start + batch_size]
+            out[idx] = self._encode_batch([sentences[i] for i in idx])
+        return out[0] if single else out
+
+
+def export_onnx(model_name: str, onnx_dir: str, quantize: bool = True) -> str:
+    """
+    One-time export of the HF model to ONNX (+ dynamic int8 quantization).
+    This step needs torch/transformers; serving the result does not.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(onnx_dir, exist_ok=True)
+    fp32_path = os.path.join(onnx_dir, "model.onnx")
+    if not os.path.exists(fp32_path):
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        tokenizer.save_pretrained(onnx_dir)
+        model = AutoModel.from_pretrained(model_name).eval()
+
+        dummy = tokenizer(["an example sentence"], return_tensors="pt")
+        names = ["input_ids", "attention_mask", "token_type_ids"]
+        print(f"Exporting {model_name} → {fp32_path}")
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in names),
+            fp32_path,
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]},
+            opset_version=17,
+        )
+    if not quantize:
+        return fp32_path
+
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    int8_path = os.path.join(onnx_dir, "model.int8.onnx")
+    print(f"Quantizing (int8) → {int8_path}")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+# ─── Lazy shared instances ───────────────────────────────────────────────────────
+# One per model name: EMBEDDING_MODEL by default, others while the embedding
+# store re-embeds into (or serves from) a different model (embedding_store.py).
+_embedders: dict[str, object] = {}
+_lock = threading.Lock()
+
+
+def get_embedder(backend: str = EMBEDDING_BACKEND, model_name: str = MODEL_NAME):
+    """Return the process-wide embedder for `model_name`, loading it on first use."""
+    embedder = _embedders.get(model_name)
+    if embedder is None:
+        with _lock:
+            embedder = _embedders.get(model_name)
+            if embedder is None:
+                embedder = OnnxEmbedder(model_name) if backend == "onnx" else TorchEmbedder(model_name)
+                _embedders[model_name] = embedder
+    return embedder
+
+
+# ─── Async micro-batching of concurrent encodes ─────────────────────────────────
+# encode() is CPU-bound and would stall the event loop; the API runs it on this
+# small, bounded pool (query batches, llm_cache's semantic lookups) so a burst
+# of requests can't oversubscribe the CPU. Threads start on first use.
+embed_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("EMBED_WORKERS", "2")),
+    thread_name_prefix="embed",
+)
+
+
+def _encode_batch(texts: list[str], model_name: str = MODEL_NAME) -> np.ndarray:
+    return get_embedder(model_name=model_name).encode(texts, batch_size=len(texts))
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text encode() calls into one batched call.
+
+    The first caller opens a `window_ms` window; everything that arrives in
+    it (up to `max_batch`, which flushes early) is encoded together on
+    `executor` and each waiting coroutine gets its own row back. Identical
+    texts within a batch are encoded once.
+    """
+
+    def __init__(self, executor, window_ms: float = 5.0, max_batch: int = 32, history: int = 1000,
+                 model_name: str = MODEL_NAME):
+        self.executor = executor
+        self.model_name = model_name
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: list[tuple[str, asyncio.Future, float]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        # The loop only keeps weak references to tasks; hold in-flight batches
+        # here so one is never collected before its futures are resolved.
+        self._tasks: set[asyncio.Task] = set()
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self._batch_sizes: deque = deque(maxlen=history)
+        self._queue_waits_ms: deque = deque(maxlen=history)
+
+    async def encode(self, text: str) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future, float]]):
+        started = time.perf_counter()
+        unique = list(dict.fromkeys(text for text, _, _ in batch))
+        self.batches += 1
+        self.items += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self._batch_sizes.append(len(batch))
+        self._queue_waits_ms.extend(1000 * (started - enqueued) for _, _, enqueued in batch)
+
+        from .telemetry import tracer, encode_duration, encode_batch_size   # keeps this module import-light
+
+        attributes = {"embedding.model": self.model_name}
+        try:
+            with tracer.start_as_current_span("embedding.encode",
+                                              attributes={**attributes, "batch_size": len(unique)}):
+                vectors = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, _encode_batch, unique, self.model_name)
+        except asyncio.CancelledError:
+            # Shutdown / loop teardown: release the waiting callers, then stop
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+        except BaseException as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        encode_duration.record(1000 * (time.perf_counter() - started), attributes)
+        encode_batch_size.record(len(unique), attributes)
+        row_for = {text: vectors[i] for i, text in enumerate(unique)}
+        for text, future, _ in batch:
+            if not future.done():   # caller may have been cancelled meanwhile
+                future.set_result(row_for[text])
+
+    def stats(self) -> dict:
+        waits = sorted(self._queue_waits_ms)
+        sizes = self._batch_sizes
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": sum(sizes) / len(sizes) if sizes else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "queue_wait_ms_p50": waits[len(waits) // 2] if waits else 0.0,
+            "queue_wait_ms_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+            "queue_wait_ms_max": waits[-1] if waits else 0.0,
+        }
+
+
+# ─── Equivalence check ───────────────────────────────────────────────────────────
+SAMPLE_SENTENCES = [
+    "Ashwagandha is an adaptogen traditionally used to calm Vata.",
+    "Triphala supports digestion and gentle detoxification.",
+    "Pitta types should favour cooling foods such as cucumber and coconut water.",
+    "I slept badly and feel anxious and bloated after dinner.",
+    "Kapha imbalance can show up as heaviness, congestion and low motivation.",
+    "Warm, grounding breakfasts like spiced oatmeal balance Vata in autumn.",
+]
+
+
+def check_equivalence(sentences: list[str] = SAMPLE_SENTENCES, tolerance: float = 0.99) -> bool:
+    """
+    Encode `sentences` with both backends and compare. Embeddings are unit
+    length, so the row-wise dot product is the cosine similarity.
+    """
+    reference = TorchEmbedder().encode(sentences)
+    for int8 in (False, True):
+        candidate = OnnxEmbedder(int8=int8).encode(sentences)
+        cosine = np.sum(reference * candidate, axis=1)
+        label = "onnx-int8" if int8 else "onnx-fp32"
+        print(f"{label}: min cosine {cosine.min():.4f}, mean {cosine.mean():.4f} (tolerance {tolerance})")
+        if cosine.min() < tolerance:
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    if command == "export":
+        export_onnx(MODEL_NAME, ONNX_DIR, quantize=True)
+    elif command == "check":
+        sys.exit(0 if check_equivalence() else 1)
+    else:
+        print("Usage: python -m backend.app.embeddings [export|check]")
+        sys.exit(1)
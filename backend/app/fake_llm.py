@@ -0,0 +1,158 @@
+# backend/app/fake_llm.py
+#
+# Deterministic stand-in for the OpenAI API, for benchmarks and offline runs.
+# LLM_BACKEND=fake makes orchestrator.build_agents() give every assistant a
+# FakeLLMClient (autogen custom model client) instead of an OpenAI config.
+#
+# Answers, in order of precedence:
+#   FAKE_LLM_REPLAY  – JSONL of {"key": sha256 of the request messages, "content": "..."}
+#   FAKE_LLM_SCRIPT  – JSON of {agent name: reply | [replies, cycled per call]}
+#   SCRIPTED_REPLIES – built-in JSON answers shaped like each agent's prompt
+#
+# Each call sleeps FAKE_LLM_LATENCY_MS ± FAKE_LLM_JITTER_MS, with the jitter
+# seeded from the request so reruns see the same latencies. With "stream" in
+# the llm_config the reply is also sent in FAKE_LLM_CHUNK_CHARS pieces through
+# autogen's IOStream, as the OpenAI client does with real stream chunks.
+
+import os
+import json
+import time
+import random
+import hashlib
+from types import SimpleNamespace
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+FAKE_LLM_MODEL = "fake-llm"
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "200"))
+FAKE_LLM_JITTER_MS = float(os.getenv("FAKE_LLM_JITTER_MS", "50"))
+FAKE_LLM_SCRIPT = os.getenv("FAKE_LLM_SCRIPT")
+FAKE_LLM_REPLAY = os.getenv("FAKE_LLM_REPLAY")
+FAKE_LLM_CHUNK_CHARS = int(os.getenv("FAKE_LLM_CHUNK_CHARS", "16"))
+
+SCRIPTED_REPLIES = {
+    "memory_manager": "No additional history beyond the logs provided.",
+    "dosha_agent": json.dumps({"dosha": "vata", "secondary": "pitta", "confidence": 0.7}),
+    "mental_health_agent": json.dumps({"stress_level": "moderate",
+                                       "recommendations": ["abhyanga before bed", "nadi shodhana, 10 minutes"]}),
+    "climate_agent": json.dumps({"season": "late autumn", "adjustments": ["favour warm, moist foods"]}),
+    "deficiency_agent": json.dumps({"deficiencies": ["iron"], "foods": ["dates", "beetroot", "sesame"]}),
+    "meal_planner_agent": json.dumps({"breakfast": "Spiced oats with dates and ghee",
+                                      "lunch": "Moong dal khichdi with sautéed beetroot",
+                                      "dinner": "Vegetable soup with cumin and a little rice"}),
+    "herbal_advisor_agent": json.dumps({"herbs": ["ashwagandha", "triphala"],
+                                        "routines": ["warm water on waking", "early dinner"]}),
+}
+
+
+def request_key(messages: list[dict]) -> str:
+    payload = json.dumps(
+        [{"role": m.get("role"), "content": m.get("content")} for m in messages],
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _load_replay(path: str | None) -> dict[str, str]:
+    if not path:
+        return {}
+    replies = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                replies[record["key"]] = record["content"]
+    return replies
+
+
+def _load_script(path: str | None) -> dict:
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+_replay = _load_replay(FAKE_LLM_REPLAY)
+_script = {**SCRIPTED_REPLIES, **_load_script(FAKE_LLM_SCRIPT)}
+
+
+# ─── autogen custom model client ─────────────────────────────────────────────────
+class FakeLLMClient:
+    """Implements autogen's ModelClient protocol (create / message_retrieval / cost / get_usage)."""
+
+    def __init__(self, config: dict, agent_name: str = "", latency_ms: float = FAKE_LLM_LATENCY_MS,
+                 jitter_ms: float = FAKE_LLM_JITTER_MS, **kwargs):
+        self.model = config.get("model", FAKE_LLM_MODEL)
+        self.agent_name = agent_name
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls = 0
+
+    def _reply(self, key: str) -> str:
+        if key in _replay:
+            return _replay[key]
+        scripted = _script.get(self.agent_name, "OK")
+        if isinstance(scripted, list):
+            return scripted[(self.calls - 1) % len(scripted)]
+        return scripted
+
+    def create(self, params: dict):
+        messages = params.get("messages", [])
+        key = request_key(messages)
+        self.calls += 1
+
+        # Runs on an executor thread (like the OpenAI client), so sleeping is the network
+        jitter = random.Random(key).uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+
+        content = self._reply(key)
+        if params.get("stream"):
+            self._stream(content)
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4
+        return SimpleNamespace(
+            model=self.model,
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content, role="assistant",
+                                                             tool_calls=None, function_call=None))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(content) // 4,
+                                  total_tokens=prompt_tokens + len(content) // 4),
+            cost=0.0,
+        )
+
+    @staticmethod
+    def _stream(content: str):
+        from autogen.io import IOStream
+        from autogen.events.client_events import StreamEvent
+
+        iostream = IOStream.get_default()
+        for i in range(0, len(content), FAKE_LLM_CHUNK_CHARS):
+            iostream.send(StreamEvent(content=content[i:i + FAKE_LLM_CHUNK_CHARS]))
+
+    def message_retrieval(self, response) -> list[str]:
+        return [choice.message.content for choice in response.choices]
+
+    def cost(self, response) -> float:
+        return 0.0
+
+    @staticmethod
+    def get_usage(response) -> dict:
+        return {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens,
+            "total_tokens": response.usage.total_tokens,
+            "cost": 0.0,
+            "model": response.model,
+        }
+
+
+def fake_llm_config() -> dict:
+    """llm_config routing an agent to FakeLLMClient (autogen's own cache off)."""
+    return {
+        "config_list": [{"model": FAKE_LLM_MODEL, "model_client_cls": "FakeLLMClient"}],
+        "cache_seed": None,
+    }
+
+
+def use_fake_llm(agent):
+    """Register FakeLLMClient on an agent built with fake_llm_config()."""
+    if agent.llm_config:
+        agent.register_model_client(model_client_cls=FakeLLMClient, agent_name=agent.name)
+    return agent
@@ -0,0 +1,144 @@
+# backend/app/group_flow.py
+#
+# Rule-based speaker selection and early termination for the GroupChat.
+#
+# With speaker_selection_method="auto" the GroupChatManager makes an extra LLM
+# call every round just to pick the next speaker, and the chat only stops at
+# max_round. SpeakerFlow walks the order documented in the UserProxyAgent
+# prompt instead (no LLM calls) and ends the chat as soon as the aggregated
+# plan validates or the flow is exhausted.
+
+import time
+from dataclasses import dataclass
+
+from .agent_dag import NodeResult, aggregate, extract_json, validate_plan
+from .telemetry import RoundSpans
+
+# UserProxyAgent prompt, steps 1, 3 and 4 (step 2 – asking the user – does not
+# apply: the proxy runs with human_input_mode="NEVER"; step 5 is aggregate()).
+FLOW = (
+    "memory_manager",
+    "dosha_agent",
+    "mental_health_agent",
+    "climate_agent",
+    "deficiency_agent",
+    "meal_planner_agent",
+    "herbal_advisor_agent",
+)
+
+
+def results_from_messages(messages: list[dict]) -> dict[str, NodeResult]:
+    """Latest message of each agent in the chat, in the shape aggregate() takes."""
+    results = {}
+    for message in messages:
+        name = message.get("name")
+        content = message.get("content")
+        if name and isinstance(content, str):
+            results[name] = NodeResult(name, "ok", content, extract_json(content))
+    return results
+
+
+class SpeakerFlow:
+    """
+    Callable for GroupChat(speaker_selection_method=...). Returns the next
+    agent in `flow`, or None – which ends the chat – once the plan assembled
+    from the messages so far validates, or after the last agent has spoken.
+    """
+
+    def __init__(self, flow: tuple[str, ...] = FLOW):
+        self.flow = flow
+        self.plan: dict | None = None
+        self.terminated_by = "max_round"    # until the flow itself stops the chat
+
+    def __call__(self, last_speaker, groupchat):
+        plan = aggregate(results_from_messages(groupchat.messages))
+        if validate_plan(plan):
+            return self._stop(plan, "plan")
+
+        name = last_speaker.name
+        position = self.flow.index(name) + 1 if name in self.flow else 0
+        while position < len(self.flow):
+            # Skip flow entries that are not part of this chat
+            if self.flow[position] in groupchat.agent_names:
+                return groupchat.agent_by_name(self.flow[position])
+            position += 1
+        return self._stop(plan, "flow_end")
+
+    def _stop(self, plan: dict, reason: str):
+        self.plan = plan
+        self.terminated_by = reason
+        return None
+
+
+# ─── Run accounting ──────────────────────────────────────────────────────────────
+@dataclass
+class RunStats:
+    mode: str
+    rounds: int = 0             # agent turns (GroupChat) / nodes run (DAG)
+    llm_calls: int = 0          # agent replies + LLM speaker selections
+    speaker_selections: int = 0
+    terminated_by: str = ""
+    elapsed: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "mode": self.mode,
+            "rounds": self.rounds,
+            "llm_calls": self.llm_calls,
+            "speaker_selections": self.speaker_selections,
+            "terminated_by": self.terminated_by,
+            "elapsed": round(self.elapsed, 3),
+        }
+
+    def report(self) -> str:
+        return (f"Pipeline [{self.mode}]: {self.rounds} round(s), {self.llm_calls} LLM call(s) "
+                f"({self.speaker_selections} for speaker selection), "
+                f"stopped by {self.terminated_by} in {self.elapsed:.2f}s")
+
+
+class LLMCallCounter:
+    """
+    Counts the replies generated by agents that have an llm_config (one LLM
+    call each) and, when selection is "auto", every speaker selection. Each
+    selection also opens that round's trace span; close() ends the last one.
+    """
+
+    def __init__(self, groupchat, llm_selection: bool):
+        self.agent_calls = 0
+        self.selections = 0
+        self.llm_selection = llm_selection
+        self.started = time.perf_counter()
+        self.round_spans = RoundSpans()
+
+        for agent in groupchat.agents:
+            if agent.llm_config:
+                agent.register_hook("process_all_messages_before_reply", self._count_reply)
+
+        # Instance attribute shadows the method the manager calls each round
+        select = groupchat.a_select_speaker
+
+        async def counted_select(last_speaker, selector):
+            self.selections += 1
+            speaker = await select(last_speaker, selector)
+            self.round_spans.next(getattr(speaker, "name", None))
+            return speaker
+
+        groupchat.a_select_speaker = counted_select
+
+    def _count_reply(self, messages):
+        self.agent_calls += 1
+        return messages
+
+    def close(self):
+        self.round_spans.end()
+
+    def stats(self, groupchat, terminated_by: str) -> RunStats:
+        llm_selections = self.selections if self.llm_selection else 0
+        return RunStats(
+            mode="groupchat",
+            rounds=sum(1 for m in groupchat.messages if m.get("name") != "user_proxy"),
+            llm_calls=self.agent_calls + llm_selections,
+            speaker_selections=llm_selections,
+            terminated_by=terminated_by,
+            elapsed=time.perf_counter() - self.started,
+        )
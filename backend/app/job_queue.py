@@ -0,0 +1,371 @@
+# backend/app/job_queue.py
+#
+# Postgres-backed queue for asynchronous pipeline runs.
+#
+#   submit()      insert a job (or join the identical one already in flight)
+#   get_job()     current state of a job, for polling
+#   JobWorkerPool claims queued jobs with FOR UPDATE SKIP LOCKED, runs them
+#                 under a renewable lease and stores the result on the row
+#
+# Single flight: a job's dedupe_key hashes its kind, user, input and the
+# user's log version (cache_versions), and a partial unique index allows one
+# queued/running job per key, so double-submits share one run.
+#
+# Restarts: a graceful shutdown puts this worker's running jobs back in the
+# queue; after a crash their leases expire and another worker reclaims them,
+# up to JOB_MAX_ATTEMPTS runs in total.
+
+import os
+import uuid
+import time
+import socket
+import asyncio
+import hashlib
+import logging
+import datetime
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+import orjson
+from sqlalchemy import select, update, delete, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .models import SessionLocal, RecommendationJob
+from .cache import read_version, user_scope, normalize_query
+from .telemetry import tracer
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))                     # concurrent runs per process (0 = submit only)
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))     # renewed every third of this while running
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))       # idle workers / subscribers re-check this often
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))           # runs before an abandoned job is failed
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))  # finished rows kept this long
+
+ACTIVE = ("queued", "running")
+FINISHED = ("succeeded", "failed")
+
+_jobs = RecommendationJob.__table__
+
+
+def _utcnow():
+    # Timestamps come from the database clock, so leases compare correctly
+    # across hosts; UTC like the Python-side defaults in models.py.
+    return func.timezone("utc", func.now())
+
+
+# ─── Runners ─────────────────────────────────────────────────────────────────────
+# kind → async runner(user_email, payload) returning the JSON-able result
+JOB_RUNNERS: dict[str, Callable[[str | None, dict], Awaitable[dict]]] = {}
+
+
+def job_runner(kind: str):
+    """Register the coroutine that executes jobs of `kind`."""
+    def register(fn):
+        JOB_RUNNERS[kind] = fn
+        return fn
+    return register
+
+
+# ─── Submit / poll ───────────────────────────────────────────────────────────────
+def dedupe_key(kind: str, user_email: str | None, payload: dict, log_version: int) -> str:
+    """
+    Identity of a submission: same kind, user, input (case/whitespace
+    normalised like the query caches) and log snapshot.
+    """
+    normalized = {k: normalize_query(v) if isinstance(v, str) else v for k, v in payload.items()}
+    blob = orjson.dumps([kind, user_email, normalized, log_version], option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(blob).hexdigest()
+
+
+def job_view(row) -> dict:
+    """API representation of a job row."""
+    def iso(ts):
+        return ts.isoformat() if ts is not None else None
+    return {
+        "job_id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "result": row["result"],
+        "error": row["error"],
+        "created_at": iso(row["created_at"]),
+        "started_at": iso(row["started_at"]),
+        "finished_at": iso(row["finished_at"]),
+    }
+
+
+async def submit(kind: str, user_email: str | None, payload: dict) -> tuple[dict, bool]:
+    """
+    Queue a job, or return the queued/running one with the same dedupe key.
+    Returns (job, created).
+    """
+    if kind not in JOB_RUNNERS:
+        raise KeyError(f"Unknown job kind: {kind!r}")
+    async with SessionLocal() as session:
+        version = await read_version(session, user_scope(user_email)) if user_email else 0
+        key = dedupe_key(kind, user_email, payload, version)
+        while True:
+            stmt = pg_insert(_jobs).values(
+                id=uuid.uuid4().hex,
+                kind=kind,
+                user_email=user_email,
+                payload=payload,
+                dedupe_key=key,
+                status="queued",
+                attempts=0,
+                created_at=datetime.datetime.utcnow(),
+            ).on_conflict_do_nothing(
+                index_elements=["dedupe_key"],
+                index_where=_jobs.c.status.in_(ACTIVE),
+            ).returning(*_jobs.c)
+            row = (await session.execute(stmt)).mappings().first()
+            created = row is not None
+            if not created:
+                row = (await session.execute(
+                    select(_jobs).where(_jobs.c.dedupe_key == key).where(_jobs.c.status.in_(ACTIVE))
+                )).mappings().first()
+            await session.commit()
+            # None: the in-flight twin finished in between, so insert again
+            if row is not None:
+                break
+    if created:
+        job_workers.notify()
+    return job_view(row), created
+
+
+async def get_job(job_id: str) -> dict | None:
+    async with SessionLocal() as session:
+        row = (await session.execute(select(_jobs).where(_jobs.c.id == job_id))).mappings().first()
+    return job_view(row) if row is not None else None
+
+
+# ─── Workers ─────────────────────────────────────────────────────────────────────
+_CLAIM = text("""
+    UPDATE recommendation_jobs
+       SET status = 'running',
+           attempts = attempts + 1,
+           worker_id = :worker_id,
+           started_at = timezone('utc', now()),
+           lease_expires_at = timezone('utc', now()) + make_interval(secs => :lease_seconds)
+     WHERE id = (
+            SELECT id FROM recommendation_jobs
+             WHERE status = 'queued'
+                OR (status = 'running'
+                    AND lease_expires_at < timezone('utc', now())
+                    AND attempts < :max_attempts)
+             ORDER BY created_at
+             LIMIT 1
+             FOR UPDATE SKIP LOCKED)
+    RETURNING id, kind, user_email, payload, attempts
+""")
+
+
+class JobWorkerPool:
+    """
+    `concurrency` worker tasks on this process's event loop. Each claims one
+    job at a time; between jobs they sleep until notify() (a local submit)
+    or JOB_POLL_SECONDS, whichever comes first.
+
+    Every write after the claim is fenced on (worker_id, attempts): if the
+    lease expired and the job was reclaimed, the stale run's result is dropped.
+    """
+
+    def __init__(self, concurrency: int = JOB_WORKERS, lease_seconds: float = JOB_LEASE_SECONDS,
+                 poll_seconds: float = JOB_POLL_SECONDS, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._watchers: dict[str, set[asyncio.Event]] = defaultdict(set)
+        self._swept_at = 0.0
+        self.succeeded = 0
+        self.failed = 0
+        self.reclaimed = 0
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._loop()) for _ in range(self.concurrency)]
+            logger.info("Job workers: %d on %s", self.concurrency, self.worker_id)
+
+    async def stop(self):
+        """Cancel the workers and hand their running jobs back to the queue."""
+        if not self._tasks:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        async with SessionLocal() as session:
+            result = await session.execute(
+                update(_jobs)
+                .where(_jobs.c.worker_id == self.worker_id)
+                .where(_jobs.c.status == "running")
+                # Give back the attempt: the run was interrupted, not failed
+                .values(status="queued", attempts=_jobs.c.attempts - 1, lease_expires_at=None)
+            )
+            await session.commit()
+        if result.rowcount:
+            logger.info("Job workers: requeued %d running job(s) on shutdown", result.rowcount)
+
+    def notify(self, job_id: str | None = None):
+        """Wake idle workers (new job) or the subscribers of `job_id` (state change)."""
+        if job_id is None:
+            self._wakeup.set()
+            return
+        for event in self._watchers.get(job_id, ()):
+            event.set()
+
+    # ── claim / run ────────────────────────────────────────────────────────────
+    async def _loop(self):
+        while True:
+            try:
+                job = await self.claim()
+            except Exception:
+                logger.exception("Job claim failed")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            try:
+                await self._run(job)
+            except Exception:
+                # Recording the outcome failed (e.g. a database blip): the job
+                # stays running, so it is retried once its lease expires.
+                logger.exception("Job %s: could not record its outcome, retried after the lease expires", job["id"])
+
+    async def claim(self):
+        async with SessionLocal() as session:
+            job = (await session.execute(_CLAIM, {
+                "worker_id": self.worker_id,
+                "lease_seconds": self.lease_seconds,
+                "max_attempts": self.max_attempts,
+            })).mappings().first()
+            if job is None:
+                await self._sweep(session)
+            await session.commit()
+        if job is not None:
+            if job["attempts"] > 1:
+                self.reclaimed += 1
+                logger.warning("Job %s: reclaimed after an expired lease (attempt %d)", job["id"], job["attempts"])
+            self.notify(job["id"])
+        return job
+
+    async def _sweep(self, session):
+        """
+        Once per lease period: fail abandoned jobs that used up their
+        attempts and delete finished rows past JOB_RETENTION_HOURS.
+        """
+        now = time.monotonic()
+        if now - self._swept_at < self.lease_seconds:
+            return
+        self._swept_at = now
+        await session.execute(
+            update(_jobs)
+            .where(_jobs.c.status == "running")
+            .where(_jobs.c.lease_expires_at < _utcnow())
+            .where(_jobs.c.attempts >= self.max_attempts)
+            .values(status="failed", error="worker lost (lease expired)", finished_at=_utcnow())
+        )
+        await session.execute(
+            delete(_jobs)
+            .where(_jobs.c.status.in_(FINISHED))
+            .where(_jobs.c.finished_at < _utcnow() - datetime.timedelta(hours=JOB_RETENTION_HOURS))
+        )
+
+    async def _run(self, job):
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            runner = JOB_RUNNERS.get(job["kind"])
+            if runner is None:
+                raise KeyError(f"No runner registered for job kind {job['kind']!r}")
+            with tracer.start_as_current_span("job.run", attributes={"job.kind": job["kind"]}):
+                result = await runner(job["user_email"], job["payload"])
+        except asyncio.CancelledError:
+            raise           # shutdown: stop() requeues the job
+        except Exception as e:
+            await self._finish(job, status="failed", error=str(e))
+            self.failed += 1
+        else:
+            await self._finish(job, status="succeeded", result=result)
+            self.succeeded += 1
+        finally:
+            heartbeat.cancel()
+
+    def _owned(self, stmt, job):
+        return (stmt.where(_jobs.c.id == job["id"])
+                .where(_jobs.c.worker_id == self.worker_id)
+                .where(_jobs.c.attempts == job["attempts"])
+                .where(_jobs.c.status == "running"))
+
+    async def _heartbeat(self, job):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                async with SessionLocal() as session:
+                    await session.execute(self._owned(update(_jobs), job).values(
+                        lease_expires_at=_utcnow() + datetime.timedelta(seconds=self.lease_seconds)
+                    ))
+                    await session.commit()
+            except Exception as e:
+                logger.warning("Job %s: lease renewal failed: %s", job["id"], e)
+
+    async def _finish(self, job, **values):
+        async with SessionLocal() as session:
+            result = await session.execute(self._owned(update(_jobs), job).values(
+                finished_at=_utcnow(), lease_expires_at=None, **values
+            ))
+            await session.commit()
+        if not result.rowcount:
+            logger.warning("Job %s: lease lost before finishing, result dropped", job["id"])
+        self.notify(job["id"])
+
+    # ── subscribe ──────────────────────────────────────────────────────────────
+    async def watch(self, job_id: str):
+        """
+        Async iterator of a job's state, yielding on every status change and
+        ending after it finishes (or immediately if it does not exist).
+        State changes made by this process wake the watcher at once; others
+        are seen within JOB_POLL_SECONDS.
+        """
+        event = asyncio.Event()
+        self._watchers[job_id].add(event)
+        try:
+            last_status = None
+            while True:
+                event.clear()
+                job = await get_job(job_id)
+                if job is None:
+                    return
+                if job["status"] != last_status:
+                    last_status = job["status"]
+                    yield job
+                if job["status"] in FINISHED:
+                    return
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._watchers[job_id].discard(event)
+            if not self._watchers[job_id]:
+                del self._watchers[job_id]
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": len(self._tasks),
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "reclaimed": self.reclaimed,
+        }
+
+
+job_workers = JobWorkerPool()
@@ -0,0 +1,245 @@
+# backend/app/llm_cache.py
+#
+# Response cache for the agents' LLM calls, stored with diskcache so it is
+# shared by every worker on the host and survives restarts.
+#
+#   exact    – key = sha256(model, system prompt, messages); always on
+#   semantic – LLM_CACHE_SEMANTIC=1: same model/system prompt/history and a
+#              last message whose MiniLM embedding is within
+#              LLM_CACHE_SEMANTIC_THRESHOLD of a cached one
+#
+# Entries expire per agent (LLM_CACHE_TTLS) and the store is size-bounded with
+# LRU eviction (LLM_CACHE_SIZE_MB).
+#
+# diskcache is synchronous SQLite (and transact() takes a cross-process lock),
+# so every store access runs on a small dedicated pool, never on the event
+# loop. The cache fails open: a lock timeout or disk error is logged and
+# treated as a miss / skipped store.
+
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from diskcache import Cache
+from autogen import Agent
+
+from .embeddings import get_embedder, embed_executor
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE = os.getenv("LLM_CACHE", "1") == "1"
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(".cache", "llm"))
+LLM_CACHE_SIZE_MB = int(os.getenv("LLM_CACHE_SIZE_MB", "512"))
+LLM_CACHE_SEMANTIC = os.getenv("LLM_CACHE_SEMANTIC", "0") == "1"
+LLM_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD", "0.97"))
+LLM_CACHE_SEMANTIC_ENTRIES = int(os.getenv("LLM_CACHE_SEMANTIC_ENTRIES", "256"))   # per scope
+LLM_CACHE_IO_WORKERS = int(os.getenv("LLM_CACHE_IO_WORKERS", "2"))
+LLM_CACHE_TIMEOUT = float(os.getenv("LLM_CACHE_TIMEOUT", "1.0"))   # seconds to wait on the SQLite lock
+
+# Seconds an answer stays valid, per agent. Climate advice follows the weather
+# and mood advice the user's day; dosha assessments change slowly.
+DEFAULT_TTL = 6 * 3600
+AGENT_TTLS = {
+    "climate_agent": 3 * 3600,
+    "mental_health_agent": 3600,
+    "dosha_agent": 7 * 86400,
+}
+
+
+def _parse_ttls(spec: str) -> dict[str, int]:
+    """LLM_CACHE_TTLS="climate_agent=600,dosha_agent=86400" overrides AGENT_TTLS."""
+    ttls = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, seconds = item.partition("=")
+        ttls[name.strip()] = int(seconds)
+    return ttls
+
+
+AGENT_TTLS.update(_parse_ttls(os.getenv("LLM_CACHE_TTLS", "")))
+
+# Semantic windows: MiniLM only sees the first 256 tokens of a text, and the
+# prompts lead with long RAG context, so long messages are embedded in windows
+# and every window must match.
+_WINDOW_CHARS = 1000
+
+
+# ─── Keys ────────────────────────────────────────────────────────────────────────
+def _model_of(llm_config) -> str:
+    config_list = (llm_config or {}).get("config_list") or [{}]
+    return ",".join(str(config.get("model", "")) for config in config_list)
+
+
+def _normalize_messages(messages: list[dict]) -> list[dict]:
+    return [
+        {"role": m.get("role"), "name": m.get("name"), "content": m.get("content")}
+        for m in messages
+    ]
+
+
+def _digest(*parts) -> str:
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _windows(text: str) -> list[str]:
+    return [text[i:i + _WINDOW_CHARS] for i in range(0, len(text), _WINDOW_CHARS)] or [""]
+
+
+def _embed(text: str) -> np.ndarray:
+    vectors = np.asarray(get_embedder().encode(_windows(text)), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+
+
+# ─── Cache ───────────────────────────────────────────────────────────────────────
+class LLMResponseCache:
+    def __init__(self, directory: str = LLM_CACHE_DIR, size_mb: int = LLM_CACHE_SIZE_MB,
+                 semantic: bool = LLM_CACHE_SEMANTIC, threshold: float = LLM_CACHE_SEMANTIC_THRESHOLD):
+        self.directory = directory
+        self.size_limit = size_mb * 2**20
+        self.semantic = semantic
+        self.threshold = threshold
+        self._cache: Cache | None = None
+        self._open_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=LLM_CACHE_IO_WORKERS, thread_name_prefix="llm-cache")
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    @property
+    def cache(self) -> Cache:
+        with self._open_lock:
+            if self._cache is None:
+                self._cache = Cache(self.directory, size_limit=self.size_limit, timeout=LLM_CACHE_TIMEOUT,
+                                    eviction_policy="least-recently-used")
+        return self._cache
+
+    async def _io(self, fn, *args):
+        """Run a store access on the cache's own pool; None if it fails."""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        except Exception as e:
+            logger.warning("LLM cache %s failed: %s", fn.__name__, e)
+            return None
+
+    # ── lookups ────────────────────────────────────────────────────────────────
+    def _hit(self, entry: dict, semantic: bool):
+        if semantic:
+            self.semantic_hits += 1
+        else:
+            self.exact_hits += 1
+        self.tokens_saved += entry.get("tokens", 0)
+        return entry["reply"]
+
+    # ── store access (cache pool threads) ──────────────────────────────────────
+    def _load(self, key: str):
+        return self.cache.get(key)
+
+    def _load_similar(self, scope: str, query: np.ndarray):
+        similar = self._semantic_lookup(scope, query)
+        return self.cache.get(similar) if similar else None
+
+    def _store(self, key: str, entry: dict, ttl: int, scope: str | None, query: np.ndarray | None):
+        self.cache.set(key, entry, expire=ttl)
+        if query is not None:
+            self._index(scope, key, query, ttl)
+
+    def _semantic_lookup(self, scope: str, query: np.ndarray):
+        best_key, best_score = None, self.threshold
+        for key, vectors in self.cache.get(("semantic", scope), []):
+            if vectors.shape != query.shape:
+                continue
+            score = float(np.min(np.sum(vectors * query, axis=1)))   # worst window decides
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def _index(self, scope: str, key: str, query: np.ndarray, ttl: int):
+        with self.cache.transact():
+            entries = [e for e in self.cache.get(("semantic", scope), []) if e[0] != key]
+            entries.append((key, query))
+            self.cache.set(("semantic", scope), entries[-LLM_CACHE_SEMANTIC_ENTRIES:], expire=ttl)
+
+    async def a_reply(self, agent, messages: list[dict], sender, config):
+        """
+        autogen reply function (registered at position 0): answer from the
+        cache, otherwise call the LLM via the agent's own OpenAI reply and
+        store the result.
+        """
+        if messages is None:
+            messages = agent._oai_messages[sender]
+        model = _model_of(agent.llm_config)
+        ttl = AGENT_TTLS.get(agent.name, DEFAULT_TTL)
+        key = _digest(model, agent.system_message, _normalize_messages(messages))
+
+        entry = await self._io(self._load, key)
+        if entry is not None:
+            return True, self._hit(entry, semantic=False)
+
+        query = scope = None
+        if self.semantic and messages:
+            scope = _digest(model, agent.system_message, _normalize_messages(messages[:-1]))
+            query = await asyncio.get_running_loop().run_in_executor(
+                embed_executor, _embed, str(messages[-1].get("content") or ""))
+            entry = await self._io(self._load_similar, scope, query)
+            if entry is not None:
+                return True, self._hit(entry, semantic=True)
+
+        self.misses += 1
+        tokens_before = _total_tokens(agent)
+        final, reply = await agent.a_generate_oai_reply(messages=messages, sender=sender, config=config)
+        if final and reply is not None:
+            tokens = _total_tokens(agent) - tokens_before
+            await self._io(self._store, key, {"reply": reply, "tokens": tokens}, ttl, scope, query)
+        return final, reply
+
+    # ── reporting ──────────────────────────────────────────────────────────────
+    def stats(self) -> dict:
+        """Counters plus the store's size; volume() reads the store, so not for the hot path."""
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+            "volume_bytes": self.cache.volume() if self._cache is not None else 0,
+            "size_limit_bytes": self.size_limit,
+        }
+
+    def report(self) -> str:
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return (f"LLM cache: {hits / lookups if lookups else 0.0:.1%} hit rate "
+                f"({self.exact_hits} exact, {self.semantic_hits} semantic, {self.misses} misses), "
+                f"{self.tokens_saved} tokens saved")
+
+
+def _total_tokens(agent) -> int:
+    """Cumulative tokens this agent's client has used (0 if unknown)."""
+    usage = getattr(agent.client, "actual_usage_summary", None) or {}
+    return sum(
+        model_usage.get("total_tokens", 0)
+        for model_usage in usage.values()
+        if isinstance(model_usage, dict)
+    )
+
+
+llm_cache = LLMResponseCache()
+
+
+def enable_llm_cache(agent, cache: LLMResponseCache = llm_cache):
+    """Put `cache` in front of an LLM-backed agent's OpenAI replies."""
+    if not LLM_CACHE or not agent.llm_config:
+        return agent
+
+    async def cached_reply(recipient, messages=None, sender=None, config=None):
+        return await cache.a_reply(recipient, messages, sender, config)
+
+    agent.register_reply([Agent, None], cached_reply, position=0, ignore_async_in_sync_chat=True)
+    return agent
@@ -0,0 +1,141 @@
+# backend/app/log_writer.py
+
+import os
+import asyncio
+import logging
+from collections import defaultdict
+from sqlalchemy import insert
+
+from .models import SessionLocal, MoodLog, SymptomLog, MealLog, ChatLog
+from .cache import bump_version, user_scope
+from .activity_cache import activity_cache
+from .user_context import MoodEntry, SymptomEntry, MealEntry, ChatEntry
+
+logger = logging.getLogger(__name__)
+
+
+# ─── Row → activity-cache entry ─────────────────────────────────────────────────
+def _cache_entry(model, row: dict):
+    if model is MoodLog:
+        return MoodEntry(row["mood"], row["intensity"], row["timestamp"])
+    if model is SymptomLog:
+        return SymptomEntry(row["symptom"], row["severity"], row["timestamp"])
+    if model is MealLog:
+        return MealEntry(row["meal_type"], row["items"].split(",") if row["items"] else [], row["timestamp"])
+    return ChatEntry(row["sender"], row["message"], row["timestamp"])
+
+
+# ─── Bulk writes ─────────────────────────────────────────────────────────────────
+async def write_logs(records: list[tuple[type, dict]]) -> int:
+    """
+    Insert (model, row) pairs in one transaction: one multi-row INSERT per
+    log table, one cache-version bump per user. After commit the rows are
+    pushed into the activity cache. Returns the number of rows written.
+    """
+    if not records:
+        return 0
+    by_model: dict[type, list[dict]] = defaultdict(list)
+    by_user: dict[str, list] = defaultdict(list)
+    for model, row in records:
+        by_model[model].append(row)
+        by_user[row["user_email"]].append(_cache_entry(model, row))
+
+    async with SessionLocal() as session:
+        try:
+            for model, rows in by_model.items():
+                await session.execute(insert(model), rows)
+            versions = {
+                user_email: await bump_version(session, user_scope(user_email))
+                for user_email in sorted(by_user)   # stable lock order across writers
+            }
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+    for user_email, entries in by_user.items():
+        entries.sort(key=lambda e: e.timestamp)
+        activity_cache.record(user_email, versions[user_email], *entries)
+    return len(records)
+
+
+# ─── Write-behind buffer for chat logs ──────────────────────────────────────────
+CHAT_LOG_WRITE_BEHIND = os.getenv("CHAT_LOG_WRITE_BEHIND", "0") == "1"
+CHAT_LOG_FLUSH_SIZE = int(os.getenv("CHAT_LOG_FLUSH_SIZE", "200"))
+CHAT_LOG_FLUSH_SECONDS = float(os.getenv("CHAT_LOG_FLUSH_SECONDS", "1.0"))
+
+
+class ChatLogBuffer:
+    """
+    Buffers chat-log rows in memory and writes them with write_logs() once
+    `flush_size` rows are queued or `flush_seconds` have passed.
+
+    At-least-once: a failed flush puts its rows back at the head of the queue
+    for the next attempt, and close() drains the buffer on shutdown. A row may
+    be written twice if a commit succeeds but its acknowledgement is lost.
+    """
+
+    def __init__(self, flush_size: int = CHAT_LOG_FLUSH_SIZE, flush_seconds: float = CHAT_LOG_FLUSH_SECONDS):
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self._rows: list[dict] = []
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.flushed = 0
+        self.failed_flushes = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def add(self, row: dict):
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("Chat log flush failed, will retry: %s", e)
+
+    async def flush(self):
+        async with self._lock:
+            while self._rows:
+                batch, self._rows = self._rows[:self.flush_size], self._rows[self.flush_size:]
+                try:
+                    await write_logs([(ChatLog, row) for row in batch])
+                except BaseException:
+                    # Includes cancellation at shutdown: never drop the batch
+                    self.failed_flushes += 1
+                    self._rows = batch + self._rows
+                    raise
+                self.flushed += len(batch)
+
+    async def close(self, attempts: int = 3):
+        """Stop the timer task and drain whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for attempt in range(1, attempts + 1):
+            try:
+                await self.flush()
+                return
+            except Exception as e:
+                logger.warning("Chat log flush on shutdown failed (%d/%d): %s", attempt, attempts, e)
+                await asyncio.sleep(0.5 * attempt)
+        logger.error("%d chat log row(s) could not be written on shutdown and were dropped", len(self._rows))
+
+
+chat_log_buffer = ChatLogBuffer()
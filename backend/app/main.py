@@ -1,102 +1,121 @@
 import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Query
 from typing import List
 from datetime import datetime
 from dotenv import load_dotenv
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # Load environment variables (e.g., DATABASE_URL, OPENAI_API_KEY)
 load_dotenv()
 # Import your pipeline runner
-from .orchestrator import run_pipeline
+from .orchestrator import stream_pipeline
+from .diet_plans import (
+    DIET_PLAN_REQUEST, DIET_PLAN_LOG_LIMIT, fetch_plan_inputs, load_plan, store_plan, is_current, logs_through,
+    generate_plan,
+)
+from .sse import sse_response
 
 # Import Async session factory and ORM models
-from .models import SessionLocal, MoodLog, SymptomLog, MealLog
+from .models import engine
+from .activity_cache import get_user_context
+from .log_writer import chat_log_buffer, CHAT_LOG_WRITE_BEHIND
+from .telemetry import setup_telemetry, shutdown_telemetry
+from .agent_registry import agent_registry, llm_io_executor
+from .job_queue import job_workers, job_runner, JOB_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Autogen's async reply path runs the (synchronous) OpenAI client on the
+    # loop's default executor. Size it for many concurrent agent calls so LLM
+    # I/O never queues behind a handful of threads or blocks the loop; its
+    # threads inherit the caller's contextvars (streamed-token IOStream, spans).
+    asyncio.get_running_loop().set_default_executor(llm_io_executor())
+    if CHAT_LOG_WRITE_BEHIND:
+        chat_log_buffer.start()
+    if JOB_WORKERS > 0:
+        job_workers.start()
+    yield
+    # Hand running jobs back to the queue before anything they use shuts down
+    await job_workers.stop()
+    # Drain buffered chat logs before the worker exits
+    await chat_log_buffer.close()
+    agent_registry.close()      # shared LLM connection pool
+    shutdown_telemetry()
 
 
 app = FastAPI(
     title="Ayurveda Personal Doctor AI",
     version="0.1.0",
-    description="AI-driven diet & wellness recommendations rooted in Ayurveda"
+    description="AI-driven diet & wellness recommendations rooted in Ayurveda",
+    lifespan=lifespan,
 )
 
+# Tracing/metrics export (TELEMETRY_EXPORTER) + DB query timing; the FastAPI
+# instrumentation must be in place before the app starts serving.
+setup_telemetry(app, engines=[engine])
+
 # Include the DB-backed logging router
 from .routes.logs import router as logs_router
+from .recommend import router as recommend_router
+from .routes.jobs import router as jobs_router
 
 app.include_router(logs_router)
+app.include_router(recommend_router)
+app.include_router(jobs_router)
 
 
 @app.get("/recommendations/diet")
 async def get_diet_plan(user_email: str = Query(..., description="End user’s email")):
     """
-    1. Fetch the most recent 5 entries of mood, symptom, and meal logs for this user from the database.
-    2. Build a summary string from those logs.
-    3. Send to the RAG/agent pipeline and return the generated diet plan.
+    1. Fetch the most recent 5 entries of mood, symptom, and meal logs for this user (activity cache first).
+    2. If the stored plan (nightly batch or an earlier call) was built from those same logs, return it.
+    3. Otherwise retrieve the matching Ayurvedic sources, run the RAG/agent pipeline,
+       store the new plan and return it.
     """
-    async with SessionLocal() as session:  # type: AsyncSession
-        # Fetch last 5 MoodLog entries for this user, ordered by timestamp descending
-        mood_rows = await session.execute(
-            select(MoodLog)
-            .where(MoodLog.user_email == user_email)
-            .order_by(MoodLog.timestamp.desc())
-            .limit(5)
-        )
-        recent_moods = mood_rows.scalars().all()
-
-        # Fetch last 5 SymptomLog entries
-        symptom_rows = await session.execute(
-            select(SymptomLog)
-            .where(SymptomLog.user_email == user_email)
-            .order_by(SymptomLog.timestamp.desc())
-            .limit(5)
-        )
-        recent_symptoms = symptom_rows.scalars().all()
-
-        # Fetch last 5 MealLog entries
-        meal_rows = await session.execute(
-            select(MealLog)
-            .where(MealLog.user_email == user_email)
-            .order_by(MealLog.timestamp.desc())
-            .limit(5)
-        )
-        recent_meals = meal_rows.scalars().all()
-
-    # Build a simple summary dictionary
-    logs_summary = {
-        "mood_logs": [
-            {
-                "mood": m.mood,
-                "intensity": m.intensity,
-                "timestamp": m.timestamp.isoformat()
-            }
-            for m in recent_moods
-        ],
-        "symptom_logs": [
-            {
-                "symptom": s.symptom,
-                "severity": s.severity,
-                "timestamp": s.timestamp.isoformat()
-            }
-            for s in recent_symptoms
-        ],
-        "meal_logs": [
-            {
-                "meal_type": ml.meal_type,
-                # split back into list[str] if needed
-                "items": ml.items.split(","),
-                "timestamp": ml.timestamp.isoformat()
-            }
-            for ml in recent_meals
-        ],
-    }
-
-    user_input = f"{logs_summary}"
+    ctx = await get_user_context(user_email, limit=DIET_PLAN_LOG_LIMIT)
+    stored = await load_plan(user_email)
+    if is_current(stored, ctx):
+        return {"plan": stored.plan, "precomputed": True, "computed_at": stored.computed_at.isoformat()}
     try:
-        plan = run_pipeline(user_input)
-        return {"plan": plan}
+        result = await generate_plan(user_email, ctx, source="live")
+        return {"plan": result["plan"], "precomputed": False}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@job_runner("diet")
+async def run_diet_job(user_email: str, payload: dict) -> dict:
+    """Queued /recommendations/diet (POST /jobs/diet); the plan is stored like a live one."""
+    ctx = await get_user_context(user_email, limit=DIET_PLAN_LOG_LIMIT)
+    return await generate_plan(user_email, ctx, source="job")
+
+@app.get("/recommendations/diet/stream")
+async def stream_diet_plan(user_email: str = Query(..., description="End user’s email")):
+    """
+    Server-sent-events variant of /recommendations/diet: emits `status`,
+    `retrieval`, one `agent_turn` per agent message, `token` chunks while the
+    LLM streams, and finally `plan` with the assembled diet plan (or `error`).
+    """
+    async def events():
+        yield "status", {"stage": "fetching_logs"}
+        ctx, docs = await fetch_plan_inputs(user_email)
+        yield "status", {"stage": "retrieving"}
+        async for event, data in stream_pipeline(DIET_PLAN_REQUEST, docs=docs, user_context=ctx):
+            if event == "plan":
+                # The plan is the client's either way; a failed store only means
+                # the next request recomputes it
+                try:
+                    await store_plan(user_email, data["plan"], data["stats"], logs_through(ctx), source="live")
+                except Exception:
+                    logger.exception("Storing the diet plan for %s failed", user_email)
+            yield event, data
+
+    return sse_response(events())
+
 # To run:
 # uvicorn main:app --reload --port 8000
@@ -1,28 +1,142 @@
 import os
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy import Column, Integer, String, Text, DateTime
-from sqlalchemy.dialects.postgresql import TIMESTAMP
-from pgvector.sqlalchemy import Vector
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, Text, Boolean, DateTime, ForeignKey, UniqueConstraint, Index, Computed,
+)
+from sqlalchemy.dialects.postgresql import TIMESTAMP, TSVECTOR, JSONB
+from pgvector.sqlalchemy import HALFVEC
 import datetime
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 Base = declarative_base()
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Statement echo is for debugging only (SQL_ECHO=1); telemetry.instrument_engine
+# times every statement and logs a sample of the slow ones instead.
+engine = create_async_engine(DATABASE_URL, echo=os.getenv("SQL_ECHO", "0") == "1")
 SessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+DOC_TSV_EXPRESSION = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, ''))"
+
+# create_all never alters existing tables; create_tables / the loaders run this first.
+ADD_DOC_TSV_COLUMN = f"""
+    ALTER TABLE ayurveda_docs
+        ADD COLUMN IF NOT EXISTS content_tsv tsvector
+        GENERATED ALWAYS AS ({DOC_TSV_EXPRESSION}) STORED
+"""
+
 class AyurvedaDoc(Base):
+    """RAG source chunks. Their vectors live in doc_embeddings, one row per embedding model version."""
     __tablename__ = "ayurveda_docs"
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
     content = Column(Text)
-    embedding = Column(Vector(768))
+    # Incremental re-ingestion key: one row per (source PDF, chunk position)
+    source_file = Column(String, index=True)
+    chunk_index = Column(Integer)
+    content_hash = Column(String(64))  # sha256 of `content`
+    # Full-text side of hybrid retrieval, maintained by Postgres on write
+    content_tsv = Column(TSVECTOR, Computed(DOC_TSV_EXPRESSION, persisted=True))
+
+    __table_args__ = (
+        UniqueConstraint("source_file", "chunk_index", name="uq_ayurveda_docs_source_chunk"),
+        Index("ix_ayurveda_docs_content_tsv", "content_tsv", postgresql_using="gin"),
+    )
+
+class EmbeddingModel(Base):
+    """
+    Registry of embedding model versions. Exactly one is active (serves
+    retrieval); a "building" one is being filled by embedding_store's re-embed
+    job and is written by the loaders alongside the active one.
+    """
+    __tablename__ = "embedding_models"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)        # e.g. sentence-transformers/all-MiniLM-L6-v2
+    version = Column(String, nullable=False)     # bumped when the same model's vectors change
+    dimension = Column(Integer, nullable=False)  # as reported by the loaded model
+    status = Column(String, nullable=False, default="building")   # building | active | retired
+    is_active = Column(Boolean, nullable=False, default=False)
+    created_at = Column(TIMESTAMP, default=datetime.datetime.utcnow)
+    activated_at = Column(TIMESTAMP)
+
+    __table_args__ = (UniqueConstraint("name", "version", name="uq_embedding_models_name_version"),)
+
+class DocEmbedding(Base):
+    """
+    One vector per (chunk, model version), stored as halfvec (float16, half
+    the bytes of vector). The column is dimensionless so every model version
+    shares the table; each gets a partial ANN index on
+    (embedding::halfvec(dimension)) WHERE model_id = its id.
+    """
+    __tablename__ = "doc_embeddings"
+    doc_id = Column(Integer, ForeignKey("ayurveda_docs.id", ondelete="CASCADE"), primary_key=True)
+    model_id = Column(Integer, ForeignKey("embedding_models.id", ondelete="CASCADE"), primary_key=True)
+    content_hash = Column(String(64))   # hash of the text the vector was computed from
+    embedding = Column(HALFVEC(), nullable=False)
+
+class AyurvedaDocSource(Base):
+    """Ingest manifest: one row per source PDF that has been loaded into ayurveda_docs."""
+    __tablename__ = "ayurveda_doc_sources"
+    source_file = Column(String, primary_key=True)
+    file_hash = Column(String(64))     # sha256 of the PDF bytes
+    file_size = Column(BigInteger)
+    file_mtime = Column(BigInteger)    # st_mtime_ns, used as a cheap “unchanged” fast path
+    chunk_count = Column(Integer)
+    updated_at = Column(TIMESTAMP, default=datetime.datetime.utcnow)
+
+class CacheVersion(Base):
+    """Monotonic version counters used to invalidate in-process caches across workers."""
+    __tablename__ = "cache_versions"
+    scope = Column(String, primary_key=True)   # e.g. "corpus"
+    version = Column(BigInteger, nullable=False, default=0)
+
+class RecommendationJob(Base):
+    """
+    Queue row for one asynchronous pipeline run (job_queue.py). Workers claim
+    queued rows with FOR UPDATE SKIP LOCKED and hold them under a lease, so a
+    job whose worker died is picked up again once the lease expires.
+    """
+    __tablename__ = "recommendation_jobs"
+    id = Column(String(32), primary_key=True)        # uuid4 hex, handed to clients
+    kind = Column(String, nullable=False)             # recommend | diet
+    user_email = Column(String)
+    payload = Column(JSONB, nullable=False)           # runner input, e.g. {"message": ...}
+    # sha256 of kind + user + input snapshot; identical in-flight submissions share a job
+    dedupe_key = Column(String(64), nullable=False)
+    status = Column(String, nullable=False, default="queued")   # queued | running | succeeded | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(JSONB)
+    error = Column(Text)
+    worker_id = Column(String)
+    lease_expires_at = Column(TIMESTAMP)
+    created_at = Column(TIMESTAMP, default=datetime.datetime.utcnow)
+    started_at = Column(TIMESTAMP)
+    finished_at = Column(TIMESTAMP)
+
+    __table_args__ = (
+        # At most one queued/running job per dedupe key (single flight)
+        Index("uq_recommendation_jobs_inflight", "dedupe_key", unique=True,
+              postgresql_where=status.in_(["queued", "running"])),
+        Index("ix_recommendation_jobs_status_created", "status", "created_at"),
+    )
+
+class DietPlan(Base):
+    """
+    Latest diet plan per user, precomputed off-peak by diet_plans.py or stored
+    after a live run. Served as-is while no log is newer than logs_through.
+    """
+    __tablename__ = "diet_plans"
+    user_email = Column(String, primary_key=True)
+    plan = Column(Text, nullable=False)
+    stats = Column(JSONB)                  # RunStats.to_dict() of the run that produced it
+    logs_through = Column(TIMESTAMP)       # newest mood/symptom/meal log timestamp it was built from
+    source = Column(String)                # batch | live | job
+    computed_at = Column(TIMESTAMP, default=datetime.datetime.utcnow)
 
 class MoodLog(Base):
     __tablename__ = "mood_logs"
     id = Column(Integer, primary_key=True, index=True)
-    user_email = Column(String, index=True)
+    user_email = Column(String)
     mood = Column(String)
     intensity = Column(Integer)
     timestamp = Column(TIMESTAMP, default=datetime.datetime.utcnow)
@@ -30,7 +144,7 @@ class MoodLog(Base):
 class SymptomLog(Base):
     __tablename__ = "symptom_logs"
     id = Column(Integer, primary_key=True, index=True)
-    user_email = Column(String, index=True)
+    user_email = Column(String)
     symptom = Column(String)
     severity = Column(Integer)
     timestamp = Column(TIMESTAMP, default=datetime.datetime.utcnow)
@@ -38,7 +152,7 @@ class SymptomLog(Base):
 class MealLog(Base):
     __tablename__ = "meal_logs"
     id = Column(Integer, primary_key=True, index=True)
-    user_email = Column(String, index=True)
+    user_email = Column(String)
     meal_type = Column(String)
     items = Column(Text)  # store as comma-separated list or JSON
     timestamp = Column(TIMESTAMP, default=datetime.datetime.utcnow)
@@ -46,7 +160,18 @@ class MealLog(Base):
 class ChatLog(Base):
     __tablename__ = "chat_logs"
     id = Column(Integer, primary_key=True, index=True)
-    user_email = Column(String, index=True)
+    user_email = Column(String)
     message = Column(Text)
     sender = Column(String)
     timestamp = Column(TIMESTAMP, default=datetime.datetime.utcnow)
+
+# Every per-user log read filters on user_email and wants the newest rows
+# first; (user_email, timestamp DESC, id DESC) serves both without a sort
+# (id breaks timestamp ties) and makes a separate user_email index redundant.
+for _log in (MoodLog, SymptomLog, MealLog, ChatLog):
+    Index(
+        f"ix_{_log.__tablename__}_user_email_timestamp",
+        _log.user_email,
+        _log.timestamp.desc(),
+        _log.id.desc(),
+    )
@@ -1,131 +1,528 @@
 # backend/app/orchestrator.py
 
+import os
+import json
+import time
 import asyncio
-from sqlalchemy import text
-from sentence_transformers import SentenceTransformer
+import logging
+from sqlalchemy import text, bindparam, Integer, String, Text, Float
+from pgvector.sqlalchemy import HALFVEC
 
 # ─── Autogen 0.9.1 imports ───────────────────────────────────────────────────────
-from autogen.agentchat.user_proxy_agent import UserProxyAgent
-from autogen.agentchat.assistant_agent import AssistantAgent
 from autogen.agentchat.groupchat import GroupChat, GroupChatManager
+from autogen.io import IOStream
 
 # ─── Your SQLAlchemy AsyncSession factory ────────────────────────────────────────
 from .models import SessionLocal
+from .vector_index import apply_search_settings, DEFAULT_EF_SEARCH, DEFAULT_PROBES
+from .embeddings import EmbeddingBatcher, embed_executor
+from .embedding_store import ModelInfo, active_model
+from .cache import StatsCache, VersionWatcher, normalize_query, CORPUS_SCOPE
+from .agent_dag import run_dag, validate_plan, SPECIALIST_DAG
+from .agent_registry import agent_registry
+from .group_flow import SpeakerFlow, LLMCallCounter, RunStats
+from .llm_cache import llm_cache, LLM_CACHE
+from .rag_context import build_context, search_terms
+from .telemetry import tracer, retrieval_duration, pipeline_duration, groupchat_rounds
+
+# Per-run reports go to this logger at DEBUG, never to stdout on the request path
+logger = logging.getLogger(__name__)
 
 # ─── Embedding model for RAG retrieval ─────────────────────────────────────────
-model = SentenceTransformer("all-MiniLM-L6-v2")
+# Loaded lazily by embeddings.get_embedder() on the first query (torch or ONNX)
+# and run on embeddings.embed_executor, the small pool shared with llm_cache.
+
+# Concurrent queries arriving within EMBED_BATCH_WINDOW_MS are encoded together
+# (up to EMBED_MAX_BATCH per call) instead of paying per-call overhead each.
+# One batcher per model name: queries follow the embedding store's active model.
+_query_batchers: dict[str, EmbeddingBatcher] = {}
+
+
+def batcher_for(model_name: str) -> EmbeddingBatcher:
+    batcher = _query_batchers.get(model_name)
+    if batcher is None:
+        batcher = _query_batchers[model_name] = EmbeddingBatcher(
+            embed_executor,
+            window_ms=float(os.getenv("EMBED_BATCH_WINDOW_MS", "5")),
+            max_batch=int(os.getenv("EMBED_MAX_BATCH", "32")),
+            model_name=model_name,
+        )
+    return batcher
+
+
+# ─── Query-embedding + retrieval caches ─────────────────────────────────────────
+# Embeddings depend only on the text and the model version; results also depend
+# on the corpus, so the results cache is dropped whenever a loader (or a model
+# switch) bumps the "corpus" version (polled at most every
+# CORPUS_VERSION_POLL_SECONDS).
+embedding_cache = StatsCache(
+    "query_embedding",
+    maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("EMBEDDING_CACHE_TTL", "86400")),
+)
+retrieval_cache = StatsCache(
+    "retrieval_results",
+    maxsize=int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("RETRIEVAL_CACHE_TTL", "3600")),
+)
+corpus_watcher = VersionWatcher(CORPUS_SCOPE, poll_seconds=float(os.getenv("CORPUS_VERSION_POLL_SECONDS", "5")))
+
+# The embedding store's active model, re-read whenever the corpus version moves
+_active_model: ModelInfo | None = None
+
+
+async def current_model() -> ModelInfo | None:
+    global _active_model
+    if _active_model is None:
+        async with SessionLocal() as session:
+            _active_model = await active_model(session)
+    return _active_model
+
+
+async def embed_query(model: ModelInfo, query: str) -> list[float]:
+    """The query's embedding under `model` (cached per model version)."""
+    key = (model.id, normalize_query(query))
+    query_emb = embedding_cache.get(key)
+    if query_emb is None:
+        query_emb = (await batcher_for(model.name).encode(query)).tolist()
+        embedding_cache.put(key, query_emb)
+    return query_emb
 
 
 # ─── VECTOR DB retriever class (Postgres + pgvector) ─────────────────────────────
+RAG_HYBRID = os.getenv("RAG_HYBRID", "1") == "1"
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))    # the usual RRF damping constant
+RAG_LEX_TERMS = int(os.getenv("RAG_LEX_TERMS", "8"))      # full-text query terms kept
+RAG_LEX_SCAN = int(os.getenv("RAG_LEX_SCAN", "500"))      # full-text matches ranked
+
+
 class PgVectorRetriever:
-    def __init__(self, k: int = 5):
+    """
+    Top-k similarity search over ayurveda_docs, using the active embedding
+    model's vectors in doc_embeddings.
+
+    With hybrid=True (RAG_HYBRID, default) the vector top-N and a full-text
+    top-N over the generated content_tsv column are fused by reciprocal rank
+    (score = Σ 1 / (rrf_k + rank)) inside one statement, so exact terms such
+    as herb and dosha names still surface when the embedding misses them.
+
+    ef_search / probes tune the HNSW / IVFFlat index (see vector_index.py) and
+    are applied per transaction; force_index keeps the planner on the index
+    path instead of falling back to a sequential scan + sort.
+
+    Results are cached per (model version, normalized query, k, mode) and
+    shared with callers; treat them as read-only.
+    """
+
+    _columns = dict(id=Integer, title=String, content=Text, embedding=HALFVEC(), distance=Float, score=Float)
+
+    # The model's id and dimension are inlined: the ORDER BY expression and
+    # the WHERE clause must match its partial index literally, which a bind
+    # parameter (under a generic prepared-statement plan) would not.
+    _sql = """
+        SELECT
+            d.id,
+            d.title,
+            d.content,
+            e.embedding,
+            {vec} <#> :q_emb AS distance,
+            -({vec} <#> :q_emb) AS score
+        FROM doc_embeddings e
+        JOIN ayurveda_docs d ON d.id = e.doc_id
+        WHERE e.model_id = {model_id}
+        ORDER BY {vec} <#> :q_emb
+        LIMIT :limit
+    """
+
+    # The vector branch walks the HNSW index for :candidates rows. GIN cannot
+    # return rows in rank order, so the lexical branch ranks only the first
+    # :lex_scan matches of a capped set of terms (search_terms), OR-ed so one
+    # matching herb name is enough to rank; without the caps ts_rank_cd would
+    # run over most of the corpus for a long query.
+    _hybrid_sql = """
+        WITH vec AS (
+            SELECT doc_id AS id, row_number() OVER (ORDER BY distance) AS rank
+            FROM (
+                SELECT e.doc_id, {vec} <#> :q_emb AS distance FROM doc_embeddings e
+                WHERE e.model_id = {model_id}
+                ORDER BY {vec} <#> :q_emb
+                LIMIT :candidates
+            ) nearest
+        ),
+        lex AS (
+            SELECT id, row_number() OVER (ORDER BY ts_rank_cd(content_tsv, q) DESC, id) AS rank
+            FROM (
+                SELECT id, content_tsv, q
+                FROM ayurveda_docs, websearch_to_tsquery('english', :q_terms) AS q
+                WHERE content_tsv @@ q
+                LIMIT :lex_scan
+            ) matches
+            ORDER BY ts_rank_cd(content_tsv, q) DESC, id
+            LIMIT :candidates
+        ),
+        fused AS (
+            SELECT id, sum(1.0 / (:rrf_k + rank)) AS score
+            FROM (SELECT id, rank FROM vec UNION ALL SELECT id, rank FROM lex) ranked
+            GROUP BY id
+            ORDER BY score DESC
+            LIMIT :limit
+        )
+        SELECT d.id, d.title, d.content, e.embedding,
+               {vec} <#> :q_emb AS distance, f.score
+        FROM fused f
+        JOIN ayurveda_docs d USING (id)
+        JOIN doc_embeddings e ON e.doc_id = d.id AND e.model_id = {model_id}
+        ORDER BY f.score DESC
+    """
+
+    _statements: dict = {}
+
+    def __init__(self, k: int = 5, ef_search: int | None = DEFAULT_EF_SEARCH,
+                 probes: int | None = DEFAULT_PROBES, force_index: bool = True,
+                 hybrid: bool = RAG_HYBRID, candidates: int | None = None, rrf_k: int = RRF_K):
         self.k = k
+        self.ef_search = ef_search
+        self.probes = probes
+        self.force_index = force_index
+        self.hybrid = hybrid
+        self.candidates = candidates or 3 * k
+        self.rrf_k = rrf_k
+
+    @classmethod
+    def _statement(cls, model: ModelInfo, hybrid: bool):
+        key = (model.id, model.dimension, hybrid)
+        stmt = cls._statements.get(key)
+        if stmt is None:
+            sql = (cls._hybrid_sql if hybrid else cls._sql).format(
+                vec=f"(e.embedding::halfvec({int(model.dimension)}))",
+                model_id=int(model.id),
+            )
+            stmt = cls._statements[key] = (
+                text(sql).bindparams(bindparam("q_emb", type_=HALFVEC())).columns(**cls._columns)
+            )
+        return stmt
 
     async def __call__(self, query: str):
+        """Traced + timed search; see _search."""
+        started = time.perf_counter()
+        with tracer.start_as_current_span("retriever.search",
+                                          attributes={"k": self.k, "hybrid": self.hybrid}) as span:
+            results = await self._search(query, span)
+            span.set_attribute("results", len(results))
+        retrieval_duration.record(1000 * (time.perf_counter() - started), {"hybrid": self.hybrid})
+        return results
+
+    async def _search(self, query: str, span):
         """
-        1. Encode the query string to a 768-dim embedding.
-        2. Run async SQL against the `ayurveda_docs` table (using pgvector’s <#> operator).
-        3. Return a list of dicts with keys: title, content, distance.
+        1. Encode the query with the active embedding model (cached; misses
+           are micro-batched onto embed_executor so the event loop stays free).
+        2. Serve from the results cache unless the corpus version moved; a
+           move also re-reads the active model, so a switch made by
+           embedding_store takes effect here within one poll interval.
+        3. Run async SQL against doc_embeddings + ayurveda_docs (pgvector’s
+           <#> on halfvec, fused with full-text ranks in hybrid mode), with
+           the ANN search settings applied to the same transaction.
+        4. Return a list of dicts with keys: title, content, embedding,
+           distance, score (higher is better; the embedding lets rag_context
+           drop near-duplicates and run MMR).
         """
-        query_emb = model.encode(query).tolist()
+        global _active_model
+        model = await current_model()
+        if model is None:
+            return []       # nothing ingested yet
+        query_emb = await embed_query(model, query)
 
         async with SessionLocal() as session:
-            sql = text("""
-                SELECT
-                    id,
-                    title,
-                    content,
-                    embedding <#> :q_emb AS distance
-                FROM ayurveda_docs
-                ORDER BY embedding <#> :q_emb
-                LIMIT :limit
-            """)
-            result = await session.execute(sql, {"q_emb": query_emb, "limit": self.k})
-            docs = result.fetchall()
-
-        return [
-            {"title": row.title, "content": row.content, "distance": row.distance}
+            async with session.begin():
+                if await corpus_watcher.check(session):
+                    retrieval_cache.clear()
+                    _active_model = await active_model(session)
+                    if _active_model is None:
+                        return []
+                    if _active_model != model:
+                        model = _active_model
+                        query_emb = await embed_query(model, query)
+                span.set_attribute("embedding.model", model.label)
+                key = (model.id, normalize_query(query), self.k, self.hybrid)
+                cached = retrieval_cache.get(key)
+                span.set_attribute("cache_hit", cached is not None)
+                if cached is not None:
+                    return cached
+
+                await apply_search_settings(session, self.ef_search, self.probes, self.force_index)
+                if self.hybrid:
+                    result = await session.execute(self._statement(model, True), {
+                        "q_emb": query_emb, "q_terms": " or ".join(search_terms(query, RAG_LEX_TERMS)),
+                        "limit": self.k, "candidates": self.candidates, "lex_scan": RAG_LEX_SCAN,
+                        "rrf_k": self.rrf_k,
+                    })
+                else:
+                    result = await session.execute(self._statement(model, False),
+                                                   {"q_emb": query_emb, "limit": self.k})
+                docs = result.fetchall()
+
+        results = [
+            {"title": row.title, "content": row.content, "embedding": row.embedding.to_numpy(),
+             "distance": row.distance, "score": row.score}
             for row in docs
         ]
+        retrieval_cache.put(key, results)
+        return results
+
+    @staticmethod
+    def cache_stats() -> list[dict]:
+        return [embedding_cache.stats(), retrieval_cache.stats()]
 
+    @staticmethod
+    def batcher_stats() -> dict:
+        return {name: batcher.stats() for name, batcher in _query_batchers.items()}
 
-# One global retriever instance (don’t reload the model on every request)
-retriever = PgVectorRetriever(k=5)
+
+# One global retriever instance (don’t reload the model on every request).
+# It over-fetches RAG_CANDIDATES chunks; rag_context picks the ones that fit
+# the prompt budget.
+retriever = PgVectorRetriever(k=int(os.getenv("RAG_CANDIDATES", "8")))
 
 
 # ─── Initialize all Autogen agents ───────────────────────────────────────────────
 # None of these accept `retriever=` or `tools=` in Autogen 0.9.1.
-user_proxy           = UserProxyAgent(name="user_proxy")
-memory_manager       = AssistantAgent(name="memory_manager")
-dosha_agent          = AssistantAgent(name="dosha_agent")
-mental_health_agent  = AssistantAgent(name="mental_health_agent")
-climate_agent        = AssistantAgent(name="climate_agent")
-deficiency_agent     = AssistantAgent(name="deficiency_agent")
-meal_planner_agent   = AssistantAgent(name="meal_planner_agent")
-herbal_advisor_agent = AssistantAgent(name="herbal_advisor_agent")
-
-agents = [
-    user_proxy,
-    memory_manager,
-    dosha_agent,
-    mental_health_agent,
-    climate_agent,
-    deficiency_agent,
-    meal_planner_agent,
-    herbal_advisor_agent
-]
-
-
-# ─── Build the GroupChat ──────────────────────────────────────────────────────────
-# According to Autogen 0.9.1, the signature is:
-#    GroupChat.__init__(self, agents, messages=<factory>, max_round=10, admin_name="Admin", …)
 #
-# We will supply only the `agents` list and override `max_round` if desired.
-group_chat = GroupChat(
-    agents,          # required positional argument
-    max_round=10     # override the default of 10 (if you want more/fewer rounds)
-    # (all other keywords use their default values)
+# Agents and the GroupChat keep per-conversation message history, so every
+# pipeline run gets its own set; sharing one GroupChat between concurrent
+# requests would interleave their conversations. agent_registry shares what
+# can be shared: prompts, the parsed LLM config and the HTTP connection pool.
+AGENT_NAMES = (
+    "user_proxy",
+    "memory_manager",
+    "dosha_agent",
+    "mental_health_agent",
+    "climate_agent",
+    "deficiency_agent",
+    "meal_planner_agent",
+    "herbal_advisor_agent",
 )
 
 
-# ─── Build the GroupChatManager ───────────────────────────────────────────────────
-# The signature is:
+def build_agents(names: tuple[str, ...] = AGENT_NAMES) -> list:
+    """Fresh agents (user_proxy first) with cached, traced LLM replies."""
+    return agent_registry.create_all(list(names))
+
+
+# ─── Build the GroupChat + GroupChatManager ──────────────────────────────────────
+# According to Autogen 0.9.1, the signatures are:
+#    GroupChat.__init__(self, agents, messages=<factory>, max_round=10, admin_name="Admin", …)
 #    GroupChatManager.__init__(self, groupchat: GroupChat)
 #
-group_chat_manager = GroupChatManager(group_chat)
+# GROUPCHAT_SPEAKER_SELECTION="flow" (default) follows the documented agent
+# order without LLM calls and stops once the plan validates (group_flow.py);
+# "auto" restores autogen's LLM-picked speakers, for comparison runs.
+GROUPCHAT_SPEAKER_SELECTION = os.getenv("GROUPCHAT_SPEAKER_SELECTION", "flow")
+
+
+def build_group_chat(selection: str = GROUPCHAT_SPEAKER_SELECTION):
+    """Return (user_proxy, group_chat_manager, speaker_flow) for a single pipeline run."""
+    agents = build_agents()
+    flow = SpeakerFlow() if selection == "flow" else None
+    group_chat = GroupChat(
+        agents,          # required positional argument
+        max_round=10,    # upper bound; the flow normally stops well before it
+        speaker_selection_method=flow or selection,
+    )
+    return agents[0], GroupChatManager(group_chat), flow
+
+
+# ─── Pipeline mode ───────────────────────────────────────────────────────────────
+# "dag"       – specialists run concurrently, then the planners (agent_dag.py);
+#               latency ≈ the longest path through the graph.
+# "groupchat" – the turn-by-turn GroupChat.
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "dag")
+
+
+def build_agent_map() -> dict:
+    """Fresh agents for one DAG run, keyed by name (only the DAG's nodes)."""
+    return {agent.name: agent for agent in build_agents(tuple(node.name for node in SPECIALIST_DAG))}
 
 
 # ─── Orchestration entrypoint ─────────────────────────────────────────────────────
-def run_pipeline(user_input: str) -> str:
+def build_prompt(user_input: str, docs: list[dict], user_context=None) -> str:
+    """Token-budgeted prompt: compact logs + selected RAG chunks + the user’s question."""
+    context = build_context(user_input, docs, user_context)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(context.report())
+    return context.prompt
+
+
+async def get_relevant_ayurveda_docs(query: str, k: int | None = None) -> list[dict]:
+    """RAG search with a custom k (shares the embedding/results caches)."""
+    if k is None or k == retriever.k:
+        return await retriever(query)
+    return await PgVectorRetriever(k=k, ef_search=retriever.ef_search, probes=retriever.probes,
+                                   hybrid=retriever.hybrid)(query)
+
+
+def _message_content(message) -> str:
+    if isinstance(message, str):
+        return message
+    return (message or {}).get("content") or ""
+
+
+async def _execute(prompt: str, mode: str, on_event=None) -> tuple[str, RunStats]:
+    """Run the agents on a fresh set; returns (final text, run stats)."""
+    with tracer.start_as_current_span("pipeline", attributes={"mode": mode}) as span:
+        text_result, stats = await _run_agents(prompt, mode, on_event)
+        span.set_attributes({"rounds": stats.rounds, "llm_calls": stats.llm_calls,
+                             "terminated_by": stats.terminated_by})
+    pipeline_duration.record(1000 * stats.elapsed, {"mode": mode, "terminated_by": stats.terminated_by})
+    if mode != "dag":
+        groupchat_rounds.record(stats.rounds, {"terminated_by": stats.terminated_by})
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(stats.report())
+        if LLM_CACHE:
+            logger.debug(llm_cache.report())
+    return text_result, stats
+
+
+async def _run_agents(prompt: str, mode: str, on_event=None) -> tuple[str, RunStats]:
+    if mode == "dag":
+        result = await run_dag(build_agent_map(), prompt, on_event=on_event)
+        stats = RunStats(
+            mode="dag",
+            rounds=sum(1 for r in result.nodes.values() if r.status != "skipped"),
+            llm_calls=sum(1 for r in result.nodes.values() if r.status != "skipped"),
+            terminated_by="plan" if validate_plan(result.plan) else "partial",
+            elapsed=result.elapsed,
+        )
+        return json.dumps(result.plan), stats
+
+    user_proxy, group_chat_manager, flow = build_group_chat()
+    groupchat = group_chat_manager.groupchat
+    counter = LLMCallCounter(groupchat, llm_selection=flow is None)
+    if on_event is not None:
+        def on_send(sender, message, recipient, silent):
+            on_event("agent_turn", {"agent": sender.name, "content": _message_content(message)})
+            return message
+        for agent in groupchat.agents:
+            agent.register_hook("process_message_before_send", on_send)
+
+    try:
+        chat_result = await user_proxy.a_initiate_chat(group_chat_manager, message=prompt)
+    finally:
+        counter.close()
+    stats = counter.stats(groupchat, flow.terminated_by if flow else "max_round")
+    if flow is not None and flow.plan is not None:
+        return json.dumps(flow.plan), stats
+    return chat_result.summary, stats
+
+
+async def run_pipeline_with_stats(user_input: str, docs: list[dict] | None = None, mode: str | None = None,
+                                  user_context=None) -> tuple[str, RunStats]:
     """
-    1. Do a vector search (RAG) using PgVectorRetriever.
-    2. Format the top-k docs into a “context” string.
+    1. Do a vector search (RAG) using PgVectorRetriever, unless `docs` were
+       already retrieved by the caller.
+    2. Build the token-budgeted context: compact `user_context` logs plus the
+       deduplicated, MMR-ordered, trimmed chunks (rag_context.py).
     3. Prepend that context to the user’s question.
-    4. Pass the combined prompt into group_chat_manager.run(...).
-    5. Return the final text response.
+    4. Run the agents: the specialist DAG (default) or the GroupChat via
+       user_proxy.a_initiate_chat(...), per `mode` / PIPELINE_MODE.
+    5. Return the final text response (the aggregated JSON plan when one was
+       assembled) and the run's round / LLM-call counts.
     """
-    async def _inner():
-        # (1) Retrieve up to k documents for RAG
+    # (1) Retrieve up to k documents for RAG
+    if docs is None:
         docs = await retriever(user_input)
 
-        # (2) Build a simple “context” string from the results
-        if docs:
-            lines = []
-            for idx, doc in enumerate(docs, start=1):
-                lines.append(
-                    f"Doc {idx} – Title: {doc['title']}\n"
-                    f"Content: {doc['content']}\n"
-                    f"Score: {doc['distance']:.3f}\n"
-                )
-            rag_context = "\n".join(lines)
-        else:
-            rag_context = "No relevant documents found."
-
-        # (3) Combine the RAG context + the user’s original question
-        combined_prompt = f"Context:\n{rag_context}\n\nUser asks: {user_input}"
-
-        # (4) Run the GroupChat pipeline (it’s async, so we await it)
-        return await group_chat_manager.run(combined_prompt)
-
-    # Since run(...) is async, wrap it in asyncio.run() for a synchronous API
-    return asyncio.run(_inner())
+    # (2) + (3) Combine the RAG context + the user’s original question
+    combined_prompt = build_prompt(user_input, docs, user_context)
+
+    # (4) + (5); nobody consumes streamed chunks here
+    with IOStream.set_default(_EventIOStream()):
+        text_result, stats = await _execute(combined_prompt, mode or PIPELINE_MODE)
+    return text_result, stats
+
+
+async def run_pipeline(user_input: str, docs: list[dict] | None = None, mode: str | None = None,
+                       user_context=None) -> str:
+    text_result, _ = await run_pipeline_with_stats(user_input, docs, mode, user_context)
+    return text_result
+
+
+# ─── Streaming entrypoint (server-sent events) ───────────────────────────────────
+class _EventIOStream:
+    """
+    IOStream that forwards streamed LLM chunks to the pipeline's event queue.
+    Autogen sends each chunk as a "stream" event when an agent's llm_config
+    has "stream": True (agent_registry, LLM_STREAM); everything else it would
+    print is dropped. With emit=None it drops the chunks too, which keeps
+    non-streaming runs off the console.
+
+    The chunks are sent from the LLM I/O thread (autogen installs the
+    caller's IOStream there), so `emit` hops back to the loop thread-safely.
+    """
+
+    def __init__(self, emit=None):
+        self._emit = emit
+
+    def print(self, *objects, sep: str = " ", end: str = "\n", flush: bool = False) -> None:
+        pass
+
+    def send(self, message) -> None:
+        if self._emit is None or getattr(message, "type", None) != "stream":
+            return
+        content = getattr(message, "content", None)
+        text = getattr(content, "content", content)   # wrapped event → inner payload
+        if text:
+            self._emit("token", {"text": text})
+
+    def input(self, prompt: str = "", *, password: bool = False) -> str:
+        return ""
+
+
+async def stream_pipeline(user_input: str, docs: list[dict] | None = None, mode: str | None = None,
+                          user_context=None):
+    """
+    Async-generator variant of run_pipeline yielding (event, data) pairs as
+    the run progresses:
+
+      retrieval    – the top-k docs used as context
+      agent_turn   – every message an agent posts to the group chat (in DAG
+                     mode: each node as it finishes, with status and elapsed)
+      node_started – DAG mode only: a node's dependencies are done and it started
+      token        – LLM output chunks, for agents configured with "stream": True
+      plan         – the final assembled plan plus run stats (always the last
+                     event on success)
+      error        – the run failed; nothing follows
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: str | None, data: dict | None):
+        # LLM calls run on executor threads, so always hop back to the loop.
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    async def _run(docs):
+        try:
+            if docs is None:
+                docs = await retriever(user_input)
+            emit("retrieval", {"docs": [
+                {"title": doc["title"], "distance": doc["distance"]} for doc in docs
+            ]})
+
+            with IOStream.set_default(_EventIOStream(emit)):
+                plan, stats = await _execute(build_prompt(user_input, docs, user_context), mode or PIPELINE_MODE, on_event=emit)
+            emit("plan", {"plan": plan, "stats": stats.to_dict()})
+        except Exception as e:
+            emit("error", {"detail": str(e)})
+        finally:
+            emit(None, None)
+
+    task = asyncio.create_task(_run(docs))
+    try:
+        while True:
+            event, data = await queue.get()
+            if event is None:
+                break
+            yield event, data
+    finally:
+        # Client disconnected mid-run: stop spending LLM calls on it
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,202 @@
+# backend/app/rag_context.py
+#
+# Builds the prompt context every agent receives, under a hard token budget.
+#
+#   1. drop near-duplicate chunks (embedding cosine ≥ RAG_DEDUPE_THRESHOLD)
+#   2. order the rest by maximal marginal relevance (relevance to the query
+#      vs. similarity to chunks already picked)
+#   3. trim each chunk to its sentences sharing the most terms with the query
+#   4. render the user's logs as one compact line per log type
+#
+# The prompt goes to every agent (and in the GroupChat, every round), so each
+# token saved here is saved several times over.
+
+import os
+import re
+import numpy as np
+from dataclasses import dataclass
+
+from .chunker import count_tokens, get_tokenizer
+
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "1200"))   # docs + logs
+RAG_DOC_TOKENS = int(os.getenv("RAG_DOC_TOKENS", "300"))            # per chunk
+RAG_MAX_DOCS = int(os.getenv("RAG_MAX_DOCS", "4"))
+RAG_DEDUPE_THRESHOLD = float(os.getenv("RAG_DEDUPE_THRESHOLD", "0.95"))
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+
+_MIN_DOC_TOKENS = 40   # not worth including a chunk trimmed below this
+
+
+# ─── Token counting ──────────────────────────────────────────────────────────────
+# Tokens are counted with chunker.count_tokens: the tokenizer of the embedding
+# model retrieval already loaded (torch or ONNX backend), so no extra download
+# or export is needed. Its WordPiece counts run a little above the chat
+# model's BPE counts, so the budgets err on the short side.
+def _cut(text: str, budget: int) -> str:
+    """The longest prefix of `text` that is at most `budget` tokens."""
+    offsets = get_tokenizer().encode(text, add_special_tokens=False).offsets[:budget]
+    return text[:offsets[-1][1]] if offsets else ""
+
+
+# ─── Sentence trimming ───────────────────────────────────────────────────────────
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+|\n+")
+_WORD = re.compile(r"[a-z][a-z\-]{2,}")
+_STOPWORDS = frozenset(
+    "the and for with that this from are was were have has had not but you your into "
+    "can may its their them they what which when how why who also more most such".split()
+)
+
+
+def _terms(text: str) -> set[str]:
+    return {w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS}
+
+
+def trim_to_budget(text: str, query_terms: set[str], budget: int) -> str:
+    """
+    Keep the sentences with the most query-term overlap (earlier sentences
+    win ties) until `budget` tokens are used, then restore document order.
+    """
+    if count_tokens(text) <= budget:
+        return text
+    sentences = [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+    ranked = sorted(range(len(sentences)), key=lambda i: (-len(_terms(sentences[i]) & query_terms), i))
+    keep, used = [], 0
+    for i in ranked:
+        cost = count_tokens(sentences[i])
+        if used + cost > budget:
+            continue
+        keep.append(i)
+        used += cost
+    if not keep:
+        # A single sentence longer than the budget: cut it at the token limit
+        return _cut(text, budget)
+    return " ".join(sentences[i] for i in sorted(keep))
+
+
+# ─── Selection: dedupe + MMR ─────────────────────────────────────────────────────
+def _unit_rows(docs: list[dict]) -> np.ndarray:
+    vectors = np.asarray([np.asarray(doc["embedding"], dtype=np.float32) for doc in docs])
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+
+
+def select_docs(docs: list[dict], max_docs: int = RAG_MAX_DOCS,
+                threshold: float = RAG_DEDUPE_THRESHOLD, mmr_lambda: float = RAG_MMR_LAMBDA) -> list[dict]:
+    """
+    Near-duplicates removed, then up to `max_docs` picked by MMR. Relevance is
+    the retriever's score (fused RRF score or inner product), min-max scaled so
+    it weighs against cosine redundancy on the same 0..1 scale.
+    """
+    if not docs:
+        return []
+    if any(doc.get("embedding") is None for doc in docs):
+        return docs[:max_docs]      # no vectors to compare; keep retrieval order
+
+    vectors = _unit_rows(docs)
+    similarity = vectors @ vectors.T
+    relevance = np.asarray([doc.get("score", -doc["distance"]) for doc in docs], dtype=np.float64)
+    spread = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones_like(relevance)
+
+    # Docs arrive best-first, so the first of each near-duplicate group wins
+    unique = []
+    for i in range(len(docs)):
+        if all(similarity[i, j] < threshold for j in unique):
+            unique.append(i)
+
+    picked: list[int] = []
+    candidates = list(unique)
+    while candidates and len(picked) < max_docs:
+        def mmr(i):
+            redundancy = max((similarity[i, j] for j in picked), default=0.0)
+            return mmr_lambda * relevance[i] - (1 - mmr_lambda) * redundancy
+        best = max(candidates, key=mmr)
+        picked.append(best)
+        candidates.remove(best)
+    return [docs[i] for i in picked]
+
+
+# ─── Compact log rendering ───────────────────────────────────────────────────────
+def _when(entry) -> str:
+    return entry.timestamp.strftime("%m-%d %H:%M")
+
+
+def render_logs(ctx) -> str:
+    """UserContext → a few short lines (newest first) instead of a dict repr."""
+    if ctx is None:
+        return ""
+    lines = []
+    if ctx.moods:
+        lines.append("Mood: " + "; ".join(
+            f"{m.mood}" + (f" ({m.intensity})" if m.intensity is not None else "") + f" {_when(m)}"
+            for m in ctx.moods))
+    if ctx.symptoms:
+        lines.append("Symptoms: " + "; ".join(
+            f"{s.symptom}" + (f" (sev {s.severity})" if s.severity is not None else "") + f" {_when(s)}"
+            for s in ctx.symptoms))
+    if ctx.meals:
+        lines.append("Meals: " + "; ".join(
+            f"{m.meal_type}: {', '.join(i.strip() for i in m.items)} {_when(m)}" for m in ctx.meals))
+    if ctx.chats:
+        lines.append("Chat: " + " | ".join(f"{c.sender}: {c.message}" for c in ctx.chats))
+    return "\n".join(lines) if lines else "No recent logs."
+
+
+# Labels render_logs adds to every line; they say nothing about the content
+_LOG_LABELS = frozenset("mood symptoms sev meals chat user assistant recent logs".split())
+
+
+def search_terms(text: str, limit: int) -> list[str]:
+    """
+    At most `limit` distinct query terms for the full-text search, longest
+    first (long words such as herb names are the rarer, more telling ones),
+    ties in order of appearance. A long query such as render_logs(ctx) would
+    otherwise match most of the corpus.
+    """
+    seen = dict.fromkeys(w for w in _WORD.findall(text.lower())
+                         if w not in _STOPWORDS and w not in _LOG_LABELS)
+    return sorted(seen, key=len, reverse=True)[:limit]
+
+
+# ─── Builder ─────────────────────────────────────────────────────────────────────
+@dataclass
+class PromptContext:
+    prompt: str
+    tokens: int             # whole prompt
+    log_tokens: int
+    doc_tokens: int
+    docs_used: int
+    docs_retrieved: int
+
+    def report(self) -> str:
+        return (f"Prompt: {self.tokens} tokens (logs {self.log_tokens}, docs {self.doc_tokens} "
+                f"from {self.docs_used}/{self.docs_retrieved} chunks)")
+
+
+def build_context(question: str, docs: list[dict], user_context=None,
+                  budget: int = RAG_CONTEXT_TOKENS, doc_budget: int = RAG_DOC_TOKENS) -> PromptContext:
+    """
+    Assemble the prompt: compact logs first (always kept), then as many
+    selected, trimmed chunks as fit in what remains of `budget`.
+    """
+    logs = render_logs(user_context)
+    log_tokens = count_tokens(logs) if logs else 0
+    remaining = budget - log_tokens
+    query_terms = _terms(question + " " + logs)
+
+    sections, doc_tokens = [], 0
+    for doc in select_docs(docs):
+        header = f"[{len(sections) + 1}] {doc['title']}\n"
+        allowance = min(doc_budget, remaining - doc_tokens) - count_tokens(header)
+        if allowance < _MIN_DOC_TOKENS:
+            break
+        section = header + trim_to_budget(doc["content"], query_terms, allowance)
+        doc_tokens += count_tokens(section)
+        sections.append(section)
+
+    parts = []
+    if logs:
+        parts.append(f"Recent logs (newest first):\n{logs}")
+    parts.append("Ayurvedic sources:\n" + ("\n\n".join(sections) if sections else "No relevant documents found."))
+    parts.append(f"User asks: {question}")
+    prompt = "\n\n".join(parts)
+    return PromptContext(prompt, count_tokens(prompt), log_tokens, doc_tokens, len(sections), len(docs))
@@ -1,48 +1,60 @@
 from fastapi import APIRouter, HTTPException, Request
-from backend.app.models import SessionLocal, MoodLog, SymptomLog, MealLog, ChatLog
-from backend.app.orchestrator import run_pipeline, get_relevant_ayurveda_docs
-from sqlalchemy.future import select
+from .activity_cache import get_user_context
+from .orchestrator import run_pipeline, run_pipeline_with_stats, stream_pipeline, get_relevant_ayurveda_docs
+from .sse import sse_response
+from .job_queue import job_runner
 
 router = APIRouter()
 
+
+async def build_recommend_context(user_email: str, user_message: str):
+    """Return (user_context, rag_docs) for a /recommend request."""
+    # 1. Fetch latest user logs (past 5 entries for each type): from the
+    #    per-user activity cache when current, else one DB round trip
+    ctx = await get_user_context(user_email, limit=5)
+
+    # 2. Fetch candidate Ayurveda docs via RAG search; the prompt builder
+    #    keeps the ones that fit its token budget
+    rag_docs = await get_relevant_ayurveda_docs(user_message)
+    return ctx, rag_docs
+
+
 @router.post("/recommend")
 async def recommend(request: Request):
     data = await request.json()
-    user_email = data.get("user_email")
-    user_message = data.get("message")
-
-    # 1. Fetch latest user logs (past 5-10 entries for each type)
-    async with SessionLocal() as session:
-        mood_logs = await session.execute(
-            select(MoodLog).where(MoodLog.user_email == user_email).order_by(MoodLog.timestamp.desc()).limit(5)
-        )
-        symptom_logs = await session.execute(
-            select(SymptomLog).where(SymptomLog.user_email == user_email).order_by(SymptomLog.timestamp.desc()).limit(5)
-        )
-        meal_logs = await session.execute(
-            select(MealLog).where(MealLog.user_email == user_email).order_by(MealLog.timestamp.desc()).limit(5)
-        )
-        # Optionally chat logs as well
-
-        mood_logs = [row[0].__dict__ for row in mood_logs.fetchall()]
-        symptom_logs = [row[0].__dict__ for row in symptom_logs.fetchall()]
-        meal_logs = [row[0].__dict__ for row in meal_logs.fetchall()]
-
-    # 2. Fetch relevant Ayurveda docs via RAG search
-    rag_docs = await get_relevant_ayurveda_docs(user_message, k=3)  # can adjust k
-
-    # 3. Build context for your agent pipeline
-    context = {
-        "user_message": user_message,
-        "mood_logs": mood_logs,
-        "symptom_logs": symptom_logs,
-        "meal_logs": meal_logs,
-        "rag_docs": rag_docs
-    }
-
-    # 4. Call your multi-agent orchestrator (can adapt run_pipeline to accept context dict)
+    ctx, rag_docs = await build_recommend_context(data.get("user_email"), data.get("message"))
+
+    # 3. Call the multi-agent orchestrator with the logs and docs fetched above
     try:
-        result = await run_pipeline(context)  # You may need to make run_pipeline async and accept context
+        result = await run_pipeline(data.get("message"), docs=rag_docs, user_context=ctx)
         return {"result": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@job_runner("recommend")
+async def run_recommend_job(user_email: str, payload: dict) -> dict:
+    """Queued /recommend (POST /jobs/recommend): same pipeline, result stored on the job."""
+    ctx, rag_docs = await build_recommend_context(user_email, payload["message"])
+    result, stats = await run_pipeline_with_stats(payload["message"], docs=rag_docs, user_context=ctx)
+    return {"result": result, "stats": stats.to_dict()}
+
+
+@router.post("/recommend/stream")
+async def recommend_stream(request: Request):
+    """
+    Server-sent-events variant of /recommend. Emits `status`, `retrieval`,
+    `agent_turn` and `token` events as they happen and `result` (or `error`)
+    last.
+    """
+    data = await request.json()
+
+    async def events():
+        yield "status", {"stage": "retrieving"}
+        ctx, rag_docs = await build_recommend_context(data.get("user_email"), data.get("message"))
+        async for event, payload in stream_pipeline(data.get("message"), docs=rag_docs, user_context=ctx):
+            if event == "plan":
+                event, payload = "result", {"result": payload["plan"], "stats": payload["stats"]}
+            yield event, payload
+
+    return sse_response(events())
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+from ..job_queue import submit, get_job, job_workers
+from ..sse import sse_response
+
+router = APIRouter()
+
+
+def _accepted(job: dict, created: bool) -> dict:
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        # True when an identical request was already queued/running
+        "deduplicated": not created,
+    }
+
+
+# A. Submit
+class RecommendJobRequest(BaseModel):
+    user_email: str
+    message: str
+
+@router.post("/jobs/recommend", status_code=202)
+async def submit_recommend_job(body: RecommendJobRequest):
+    """Queue a /recommend run; poll /jobs/{job_id} or subscribe to /jobs/{job_id}/events."""
+    job, created = await submit("recommend", body.user_email, {"message": body.message})
+    return _accepted(job, created)
+
+@router.post("/jobs/diet", status_code=202)
+async def submit_diet_job(user_email: str = Query(..., description="End user’s email")):
+    """Queue a /recommendations/diet run."""
+    job, created = await submit("diet", user_email, {})
+    return _accepted(job, created)
+
+
+# B. Poll
+@router.get("/jobs/{job_id}")
+async def read_job(job_id: str):
+    job = await get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# C. Subscribe
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-sent events for one job: `status` on every state change, then
+    `result` (the stored result) or `error` when it finishes.
+    """
+    if await get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        async for job in job_workers.watch(job_id):
+            if job["status"] == "succeeded":
+                yield "result", job["result"]
+            elif job["status"] == "failed":
+                yield "error", {"detail": job["error"]}
+            else:
+                yield "status", {"status": job["status"], "attempts": job["attempts"]}
+
+    return sse_response(events())
@@ -1,11 +1,21 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from sqlalchemy import select
+from typing import Annotated, Literal, Union
+import base64
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import select, tuple_
 from ..models import SessionLocal, MoodLog, SymptomLog, MealLog, ChatLog
+from ..cache import bump_version, user_scope
+from ..activity_cache import activity_cache
+from ..user_context import MoodEntry, SymptomEntry, MealEntry, ChatEntry
+from ..log_writer import write_logs, chat_log_buffer, CHAT_LOG_WRITE_BEHIND
 import datetime
 
 router = APIRouter()
 
+EXPORT_BATCH_ROWS = 1000   # rows fetched per round trip while exporting
+
 
 # A. Mood Log Endpoint
 class MoodLogRequest(BaseModel):
@@ -24,7 +34,10 @@ async def log_mood(entry: MoodLogRequest):
                 timestamp=datetime.datetime.utcnow()
             )
             session.add(mood_log)
+            # Bump the user's cache version in the same transaction as the row
+            version = await bump_version(session, user_scope(entry.user_email))
             await session.commit()
+            activity_cache.record(entry.user_email, version, MoodEntry(entry.mood, entry.intensity, mood_log.timestamp))
             return {"status": "logged", "entry": entry}
         except Exception as e:
             await session.rollback()
@@ -48,7 +61,10 @@ async def log_symptom(entry: SymptomLogRequest):
                 timestamp=datetime.datetime.utcnow()
             )
             session.add(symptom_log)
+            # Bump the user's cache version in the same transaction as the row
+            version = await bump_version(session, user_scope(entry.user_email))
             await session.commit()
+            activity_cache.record(entry.user_email, version, SymptomEntry(entry.symptom, entry.severity, symptom_log.timestamp))
             return {"status": "logged", "entry": entry}
         except Exception as e:
             await session.rollback()
@@ -73,7 +89,10 @@ async def log_meal(entry: MealLogRequest):
                 timestamp=datetime.datetime.utcnow()
             )
             session.add(meal_log)
+            # Bump the user's cache version in the same transaction as the row
+            version = await bump_version(session, user_scope(entry.user_email))
             await session.commit()
+            activity_cache.record(entry.user_email, version, MealEntry(entry.meal_type, list(entry.items), meal_log.timestamp))
             return {"status": "logged", "entry": entry}
         except Exception as e:
             await session.rollback()
@@ -87,7 +106,18 @@ class ChatLogRequest(BaseModel):
     sender: str
 
 @router.post("/log/chat", status_code=201)
-async def log_chat(entry: ChatLogRequest):
+async def log_chat(entry: ChatLogRequest, response: Response):
+    if CHAT_LOG_WRITE_BEHIND:
+        # Buffered; written in bulk by log_writer.chat_log_buffer
+        chat_log_buffer.add({
+            "user_email": entry.user_email,
+            "message": entry.message,
+            "sender": entry.sender,
+            "timestamp": datetime.datetime.utcnow(),
+        })
+        response.status_code = 202
+        return {"status": "queued", "entry": entry}
+
     async with SessionLocal() as session:
         try:
             chat_log = ChatLog(
@@ -97,29 +127,156 @@ async def log_chat(entry: ChatLogRequest):
                 timestamp=datetime.datetime.utcnow()
             )
             session.add(chat_log)
+            # Bump the user's cache version in the same transaction as the row
+            version = await bump_version(session, user_scope(entry.user_email))
             await session.commit()
+            activity_cache.record(entry.user_email, version, ChatEntry(entry.sender, entry.message, chat_log.timestamp))
             return {"status": "logged", "entry": entry}
         except Exception as e:
             await session.rollback()
             raise HTTPException(status_code=500, detail=str(e))
 
 
-# E. Fetch Mood Logs for a User
-@router.get("/logs/mood/{user_email}")
-async def get_mood_logs(user_email: str):
+# E. Batch Log Endpoint (mixed entry types, one multi-row INSERT per table)
+class MoodBatchEntry(MoodLogRequest):
+    type: Literal["mood"]
+
+class SymptomBatchEntry(SymptomLogRequest):
+    type: Literal["symptom"]
+
+class MealBatchEntry(MealLogRequest):
+    type: Literal["meal"]
+
+class ChatBatchEntry(ChatLogRequest):
+    type: Literal["chat"]
+
+BatchEntry = Annotated[
+    Union[MoodBatchEntry, SymptomBatchEntry, MealBatchEntry, ChatBatchEntry],
+    Field(discriminator="type"),
+]
+
+class LogBatchRequest(BaseModel):
+    entries: list[BatchEntry] = Field(..., max_length=1000)
+
+_BATCH_MODELS = {"mood": MoodLog, "symptom": SymptomLog, "meal": MealLog, "chat": ChatLog}
+
+@router.post("/log/batch", status_code=201)
+async def log_batch(batch: LogBatchRequest):
+    timestamp = datetime.datetime.utcnow()
+    records = []
+    for entry in batch.entries:
+        row = entry.model_dump(exclude={"type"})
+        if entry.type == "meal":
+            # Store as comma-separated string for simplicity
+            row["items"] = ",".join(entry.items)
+        row["timestamp"] = timestamp
+        records.append((_BATCH_MODELS[entry.type], row))
+    try:
+        written = await write_logs(records)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "logged", "count": written}
+
+
+# F. Fetch Logs for a User (keyset-paginated) + NDJSON export
+# Rows come newest first, ordered by (timestamp DESC, id DESC) to match the
+# (user_email, timestamp DESC, id DESC) index; the cursor is the last row's
+# (timestamp, id), so every page is an index range scan however deep it is.
+LogType = Literal["mood", "symptom", "meal", "chat"]
+
+_LOG_COLUMNS = {
+    "mood": (MoodLog, ("mood", "intensity")),
+    "symptom": (SymptomLog, ("symptom", "severity")),
+    "meal": (MealLog, ("meal_type", "items")),
+    "chat": (ChatLog, ("message", "sender")),
+}
+
+
+def _encode_cursor(timestamp: datetime.datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{row_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return datetime.datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _log_query(log_type: str, user_email: str, since: datetime.datetime | None,
+               until: datetime.datetime | None):
+    model, columns = _LOG_COLUMNS[log_type]
+    query = (
+        select(model.id, model.user_email, *(getattr(model, c) for c in columns), model.timestamp)
+        .where(model.user_email == user_email)
+        .order_by(model.timestamp.desc(), model.id.desc())
+    )
+    if since is not None:
+        query = query.where(model.timestamp >= since)
+    if until is not None:
+        query = query.where(model.timestamp < until)
+    return model, query
+
+
+def _row_dict(row) -> dict:
+    data = dict(row._mapping)
+    if "items" in data:
+        # split back into list[str]
+        data["items"] = data["items"].split(",") if data["items"] else []
+    return data
+
+
+@router.get("/logs/{log_type}/{user_email}")
+async def get_logs(
+    log_type: LogType,
+    user_email: str,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = Query(None, description="X-Next-Cursor value from the previous page"),
+    since: datetime.datetime | None = Query(None, description="Only entries at or after this time"),
+    until: datetime.datetime | None = Query(None, description="Only entries before this time"),
+):
+    """
+    One page of a user's logs, newest first. The body stays a JSON list; the
+    cursor for the next page (if any) is returned in the X-Next-Cursor header.
+    """
+    model, query = _log_query(log_type, user_email, since, until)
+    if cursor:
+        timestamp, row_id = _decode_cursor(cursor)
+        query = query.where(tuple_(model.timestamp, model.id) < tuple_(timestamp, row_id))
+
     async with SessionLocal() as session:
-        result = await session.execute(
-            select(MoodLog).where(MoodLog.user_email == user_email)
-        )
-        rows = result.scalars().all()
-        # Convert each SQLAlchemy object to a JSON‐serializable dict
-        return [
-            {
-                "id": row.id,
-                "user_email": row.user_email,
-                "mood": row.mood,
-                "intensity": row.intensity,
-                "timestamp": row.timestamp.isoformat()
-            }
-            for row in rows
-        ]
+        rows = (await session.execute(query.limit(limit + 1))).fetchall()
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = _encode_cursor(rows[-1].timestamp, rows[-1].id)
+    return ORJSONResponse([_row_dict(row) for row in rows], headers=headers)
+
+
+@router.get("/logs/{log_type}/{user_email}/export")
+async def export_logs(
+    log_type: LogType,
+    user_email: str,
+    since: datetime.datetime | None = Query(None),
+    until: datetime.datetime | None = Query(None),
+):
+    """
+    Stream a user's full history as NDJSON (one orjson-encoded row per line)
+    from a server-side cursor, so memory stays flat regardless of row count.
+    """
+    _, query = _log_query(log_type, user_email, since, until)
+
+    async def body():
+        async with SessionLocal() as session:
+            result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_ROWS))
+            async for rows in result.partitions():
+                yield b"".join(orjson.dumps(_row_dict(row)) + b"\n" for row in rows)
+
+    filename = f"{log_type}_logs.ndjson"
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
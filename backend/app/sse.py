@@ -0,0 +1,35 @@
+# backend/app/sse.py
+
+import logging
+import orjson
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+
+def sse_event(event: str, data) -> bytes:
+    """Encode one server-sent event (JSON payload on a single data: line)."""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+def sse_response(events) -> StreamingResponse:
+    """
+    Wrap an async iterator of (event, data) pairs in a text/event-stream
+    response. A comment line is flushed first so the client gets its first
+    byte before any DB or model work starts. The status code is sent by then,
+    so a failure in `events` ends the stream with an `error` event instead.
+    """
+    async def body():
+        yield b": stream open\n\n"
+        try:
+            async for event, data in events:
+                yield sse_event(event, data)
+        except Exception as e:
+            logger.exception("Event stream failed")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,257 @@
+# backend/app/telemetry.py
+#
+# OpenTelemetry tracing + metrics for the recommendation path.
+#
+#   TELEMETRY_EXPORTER=otlp     OTLP/gRPC to OTEL_EXPORTER_OTLP_ENDPOINT (default
+#                               when that variable is set, e.g. a local collector)
+#   TELEMETRY_EXPORTER=console  spans and metrics printed to stdout
+#   TELEMETRY_EXPORTER=none     API no-ops (default otherwise)
+#
+# Spans: HTTP request (FastAPI instrumentation) → pipeline → retriever.search
+# → embedding.encode, and pipeline → groupchat.round / agent.reply (one per
+# LLM call, with token counts).
+#
+# Metrics: request durations (FastAPI instrumentation), retrieval / encode /
+# LLM-call / pipeline durations, LLM tokens, GroupChat rounds, DB query
+# durations, slow queries and connection-pool gauges.
+#
+# SQL statements are no longer echoed; statements slower than SLOW_QUERY_MS
+# are counted and a SLOW_QUERY_SAMPLE_RATE fraction of them is logged.
+
+import os
+import time
+import random
+import logging
+from opentelemetry import trace, metrics, context
+from opentelemetry.metrics import Observation
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_EXPORTER = os.getenv(
+    "TELEMETRY_EXPORTER", "otlp" if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") else "none"
+)
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "ayurvati-api")
+METRICS_EXPORT_INTERVAL_MS = int(os.getenv("METRICS_EXPORT_INTERVAL_MS", "15000"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "0.1"))
+
+# The API hands out proxies until setup_telemetry() installs real providers,
+# so modules can create spans and instruments at import time.
+tracer = trace.get_tracer("ayurvati")
+meter = metrics.get_meter("ayurvati")
+
+
+# ─── Instruments ─────────────────────────────────────────────────────────────────
+retrieval_duration = meter.create_histogram(
+    "ayurvati.retrieval.duration", unit="ms", description="PgVectorRetriever call, cache hits included")
+encode_duration = meter.create_histogram(
+    "ayurvati.embedding.encode.duration", unit="ms", description="One batched query encode()")
+encode_batch_size = meter.create_histogram(
+    "ayurvati.embedding.batch_size", description="Texts per batched query encode()")
+llm_call_duration = meter.create_histogram(
+    "ayurvati.llm.call.duration", unit="ms", description="One agent reply (LLM call or cache hit)")
+llm_tokens = meter.create_counter(
+    "ayurvati.llm.tokens", description="LLM tokens used, by agent and type (prompt / completion)")
+pipeline_duration = meter.create_histogram(
+    "ayurvati.pipeline.duration", unit="ms", description="Agent run, by mode and how it ended")
+groupchat_rounds = meter.create_histogram(
+    "ayurvati.groupchat.rounds", description="Agent turns per GroupChat run")
+db_query_duration = meter.create_histogram(
+    "ayurvati.db.query.duration", unit="ms", description="SQL statement execution time")
+slow_queries = meter.create_counter(
+    "ayurvati.db.slow_queries", description=f"Statements slower than SLOW_QUERY_MS ({SLOW_QUERY_MS:g} ms)")
+
+
+# ─── Setup ───────────────────────────────────────────────────────────────────────
+_providers: list = []
+
+
+def setup_telemetry(app=None, engines=()):
+    """
+    Install the tracer/meter providers for TELEMETRY_EXPORTER, instrument the
+    FastAPI `app` (must happen before it starts serving) and every SQLAlchemy
+    async engine in `engines`. Engines are instrumented even with no exporter:
+    slow-query logging does not depend on it.
+    """
+    for engine in engines:
+        instrument_engine(engine)
+    if TELEMETRY_EXPORTER == "none" or _providers:
+        return
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+
+    if TELEMETRY_EXPORTER == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        from opentelemetry.sdk.metrics.export import ConsoleMetricExporter
+        span_exporter, metric_exporter = ConsoleSpanExporter(), ConsoleMetricExporter()
+    elif TELEMETRY_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+        span_exporter, metric_exporter = OTLPSpanExporter(), OTLPMetricExporter()
+    else:
+        raise ValueError(f"Unknown TELEMETRY_EXPORTER: {TELEMETRY_EXPORTER!r} (expected otlp, console or none)")
+
+    resource = Resource.create({"service.name": SERVICE_NAME})
+    tracer_provider = TracerProvider(resource=resource)
+    tracer_provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(tracer_provider)
+
+    reader = PeriodicExportingMetricReader(metric_exporter, export_interval_millis=METRICS_EXPORT_INTERVAL_MS)
+    meter_provider = MeterProvider(resource=resource, metric_readers=[reader])
+    metrics.set_meter_provider(meter_provider)
+    _providers.extend([tracer_provider, meter_provider])
+
+    if app is not None:
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+        FastAPIInstrumentor.instrument_app(app)
+    print(f"Telemetry: exporting to {TELEMETRY_EXPORTER} as {SERVICE_NAME}")
+
+
+def shutdown_telemetry():
+    """Flush pending spans / metrics (call on worker shutdown)."""
+    for provider in _providers:
+        provider.shutdown()
+    _providers.clear()
+
+
+# ─── Database: query timing, slow-query log, pool gauges ─────────────────────────
+# id(engine) → (db.engine label, engine); the engines are held here, so ids stay unique
+_engines: dict[int, tuple[str, object]] = {}
+
+
+def _statement_kind(statement: str) -> str:
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+
+
+def instrument_engine(engine, name: str | None = None):
+    """
+    Time every statement on an async engine and expose its pool as gauges
+    (once per engine). `name` labels its metrics; engines on the same
+    database get the database name with a #2, #3, ... suffix.
+    """
+    if id(engine) in _engines:
+        return
+    base = name or engine.url.database or "default"
+    labels = {label for label, _ in _engines.values()}
+    name, n = base, 1
+    while name in labels:
+        n += 1
+        name = f"{base}#{n}"
+    _engines[id(engine)] = (name, engine)
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, ctx, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, ctx, executemany):
+        started = conn.info["query_started"].pop()
+        elapsed_ms = 1000 * (time.perf_counter() - started)
+        attributes = {"db.engine": name, "db.operation": _statement_kind(statement)}
+        db_query_duration.record(elapsed_ms, attributes)
+        if elapsed_ms >= SLOW_QUERY_MS:
+            slow_queries.add(1, attributes)
+            if random.random() < SLOW_QUERY_SAMPLE_RATE:
+                logger.warning("Slow query (%.0f ms, %s): %s", elapsed_ms, name, " ".join(statement.split())[:500])
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        # A failed statement never reaches after_cursor_execute; drop its start
+        # time so the connection's stack doesn't grow (or mis-time the next one).
+        if exception_context.connection is not None:
+            exception_context.connection.info.pop("query_started", None)
+
+
+def _pool_gauge(read):
+    def callback(options):
+        for name, engine in _engines.values():
+            pool = engine.sync_engine.pool
+            if hasattr(pool, "checkedout"):    # QueuePool-like
+                yield Observation(read(pool), {"db.engine": name})
+    return callback
+
+
+meter.create_observable_gauge("ayurvati.db.pool.checked_out", [_pool_gauge(lambda p: p.checkedout())],
+                              description="Connections in use")
+meter.create_observable_gauge("ayurvati.db.pool.idle", [_pool_gauge(lambda p: p.checkedin())],
+                              description="Idle connections in the pool")
+meter.create_observable_gauge("ayurvati.db.pool.size", [_pool_gauge(lambda p: p.size())],
+                              description="Configured pool size")
+meter.create_observable_gauge("ayurvati.db.pool.overflow", [_pool_gauge(lambda p: p.overflow())],
+                              description="Connections open beyond the pool size")
+
+
+# ─── Agents ──────────────────────────────────────────────────────────────────────
+def _usage(agent) -> tuple[int, int]:
+    """Cumulative (prompt, completion) tokens of an agent's client."""
+    usage = getattr(agent.client, "actual_usage_summary", None) or {}
+    prompt = completion = 0
+    for model_usage in usage.values():
+        if isinstance(model_usage, dict):
+            prompt += model_usage.get("prompt_tokens", 0)
+            completion += model_usage.get("completion_tokens", 0)
+    return prompt, completion
+
+
+def instrument_agent(agent):
+    """
+    Wrap an LLM-backed agent's a_generate_reply in an "agent.reply" span with
+    the tokens it used (0 on an llm_cache hit). The DAG and the
+    GroupChatManager both call it through the instance, so both are covered.
+    """
+    if not agent.llm_config:
+        return agent
+    inner = agent.a_generate_reply
+
+    async def traced_reply(*args, **kwargs):
+        attributes = {"agent": agent.name}
+        with tracer.start_as_current_span("agent.reply", attributes=attributes) as span:
+            prompt_before, completion_before = _usage(agent)
+            started = time.perf_counter()
+            try:
+                return await inner(*args, **kwargs)
+            finally:
+                llm_call_duration.record(1000 * (time.perf_counter() - started), attributes)
+                prompt_after, completion_after = _usage(agent)
+                prompt, completion = prompt_after - prompt_before, completion_after - completion_before
+                span.set_attribute("llm.prompt_tokens", prompt)
+                span.set_attribute("llm.completion_tokens", completion)
+                llm_tokens.add(prompt, {**attributes, "type": "prompt"})
+                llm_tokens.add(completion, {**attributes, "type": "completion"})
+
+    agent.a_generate_reply = traced_reply
+    return agent
+
+
+class RoundSpans:
+    """
+    One "groupchat.round" span per GroupChatManager round: opened when the
+    next speaker is selected and made current, so that speaker's agent.reply
+    nests under it; closed by the next selection or end().
+    """
+
+    def __init__(self):
+        self.rounds = 0
+        self._span = None
+        self._token = None
+
+    def next(self, speaker_name: str | None):
+        self.end()
+        if speaker_name is None:
+            return
+        self.rounds += 1
+        self._span = tracer.start_span("groupchat.round",
+                                       attributes={"round": self.rounds, "speaker": speaker_name})
+        self._token = context.attach(trace.set_span_in_context(self._span))
+
+    def end(self):
+        if self._span is not None:
+            context.detach(self._token)
+            self._span.end()
+            self._span = self._token = None
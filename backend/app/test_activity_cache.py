@@ -0,0 +1,83 @@
+# backend/app/test_activity_cache.py
+
+import datetime
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from backend.app.activity_cache import ActivityCache
+from backend.app.user_context import UserContext, MoodEntry, MealEntry, ChatEntry
+
+T0 = datetime.datetime(2026, 1, 1, 8, 0)
+
+
+def _at(minutes: int) -> datetime.datetime:
+    return T0 + datetime.timedelta(minutes=minutes)
+
+
+def _loaded(*moods: MoodEntry) -> UserContext:
+    """What load_user_context returns: newest first."""
+    return UserContext(moods=sorted(moods, key=lambda e: e.timestamp, reverse=True))
+
+
+def test_fill_then_record_next_version_prepends():
+    cache = ActivityCache(entries=3)
+    cache.fill("a@x", 4, _loaded(MoodEntry("calm", 3, _at(0)), MoodEntry("tired", 2, _at(1))), limit=3)
+
+    cache.record("a@x", 5, MoodEntry("happy", 4, _at(2)))
+
+    ctx = cache.get("a@x", 5, limit=3)
+    assert [m.mood for m in ctx.moods] == ["happy", "tired", "calm"]
+    assert cache.get("a@x", 4, limit=3) is None        # old version no longer served
+
+
+def test_record_keeps_ring_bounded():
+    cache = ActivityCache(entries=2)
+    cache.fill("a@x", 1, _loaded(MoodEntry("calm", 3, _at(0)), MoodEntry("tired", 2, _at(1))), limit=2)
+
+    cache.record("a@x", 2, MoodEntry("happy", 4, _at(2)))
+
+    assert [m.mood for m in cache.get("a@x", 2, limit=2).moods] == ["happy", "tired"]
+
+
+def test_record_after_missed_write_drops_user():
+    cache = ActivityCache()
+    cache.fill("a@x", 4, _loaded(MoodEntry("calm", 3, _at(0))), limit=5)
+
+    # Another worker wrote version 5; this worker's write is version 6
+    cache.record("a@x", 6, MoodEntry("happy", 4, _at(2)))
+
+    assert cache.get("a@x", 6, limit=5) is None
+    assert cache.stats()["users"] == 0
+
+
+def test_record_for_uncached_user_is_ignored():
+    cache = ActivityCache()
+    cache.record("a@x", 1, MoodEntry("happy", 4, _at(0)))
+    assert cache.get("a@x", 1, limit=5) is None
+    assert cache.stats()["users"] == 0
+
+
+def test_entries_go_to_their_own_ring():
+    cache = ActivityCache()
+    cache.fill("a@x", 1, UserContext(), limit=5, include_chats=True)
+
+    cache.record("a@x", 2, MealEntry("lunch", ["rice", "dal"], _at(1)), ChatEntry("user", "hi", _at(2)))
+
+    ctx = cache.get("a@x", 2, limit=5, include_chats=True)
+    assert [m.meal_type for m in ctx.meals] == ["lunch"]
+    assert [c.message for c in ctx.chats] == ["hi"]
+    assert ctx.moods == [] and ctx.symptoms == []
+    assert cache.get("a@x", 2, limit=5).chats == []      # chats only on request
+
+
+def test_least_recently_used_user_is_evicted():
+    cache = ActivityCache(max_users=2)
+    cache.fill("a@x", 1, UserContext(), limit=5)
+    cache.fill("b@x", 1, UserContext(), limit=5)
+    cache.get("a@x", 1, limit=5)                         # a is now the most recent
+    cache.fill("c@x", 1, UserContext(), limit=5)
+
+    assert cache.get("b@x", 1, limit=5) is None
+    assert cache.get("a@x", 1, limit=5) is not None
+    assert cache.get("c@x", 1, limit=5) is not None
@@ -0,0 +1,146 @@
+# backend/app/test_agent_dag.py
+
+import json
+import asyncio
+import pytest
+
+from backend.app.agent_dag import (
+    DagNode, SPECIALIST_DAG, run_dag, aggregate, validate_plan, extract_json, NodeResult,
+)
+
+
+class StubAgent:
+    """Just enough of a ConversableAgent for run_dag: a delayed canned reply."""
+
+    def __init__(self, name: str, reply, delay: float = 0.0):
+        self.name = name
+        self.reply = reply
+        self.delay = delay
+        self.prompts: list[str] = []
+
+    async def a_generate_reply(self, messages):
+        self.prompts.append(messages[-1]["content"])
+        await asyncio.sleep(self.delay)
+        if isinstance(self.reply, BaseException):
+            raise self.reply
+        return self.reply
+
+
+MEALS = {"breakfast": "Spiced oats", "lunch": "Khichdi", "dinner": "Soup"}
+
+
+def _stub_agents(**overrides) -> dict:
+    replies = {node.name: json.dumps({"ok": node.name}) for node in SPECIALIST_DAG}
+    replies["meal_planner_agent"] = json.dumps(MEALS)
+    agents = {name: StubAgent(name, reply) for name, reply in replies.items()}
+    agents.update(overrides)
+    return agents
+
+
+# ─── run_dag ─────────────────────────────────────────────────────────────────────
+def test_dependents_see_their_inputs():
+    agents = _stub_agents()
+    result = asyncio.run(run_dag(agents, "base prompt"))
+
+    assert all(r.status == "ok" for r in result.nodes.values())
+    assert validate_plan(result.plan)
+    assert agents["dosha_agent"].prompts == ["base prompt"]
+    meal_prompt = agents["meal_planner_agent"].prompts[0]
+    assert "### dosha_agent" in meal_prompt and "### mental_health_agent" not in meal_prompt
+
+
+def test_failed_and_timed_out_deps_are_passed_on_as_unavailable():
+    nodes = (DagNode("a", timeout=0.01), DagNode("b"), DagNode("c", deps=("a", "b")))
+    agents = {
+        "a": StubAgent("a", "late", delay=1.0),
+        "b": StubAgent("b", RuntimeError("boom")),
+        "c": StubAgent("c", "done"),
+    }
+    result = asyncio.run(run_dag(agents, "p", nodes=nodes))
+
+    assert result.nodes["a"].status == "timeout"
+    assert result.nodes["b"].status == "error" and result.nodes["b"].error == "boom"
+    assert result.nodes["c"].status == "ok"
+    assert "(unavailable: timeout" in agents["c"].prompts[0]
+    assert "(unavailable: error" in agents["c"].prompts[0]
+
+
+def test_missing_agent_is_skipped():
+    nodes = (DagNode("a"), DagNode("b", deps=("a",)))
+    result = asyncio.run(run_dag({"b": StubAgent("b", "x")}, "p", nodes=nodes))
+    assert result.nodes["a"].status == "skipped"
+    assert result.nodes["b"].status == "ok"
+
+
+def test_cancelling_mid_node_propagates_without_agent_turn():
+    nodes = (DagNode("fast"), DagNode("slow"), DagNode("after", deps=("slow",)))
+    agents = {
+        "fast": StubAgent("fast", "x"),
+        "slow": StubAgent("slow", "y", delay=10),
+        "after": StubAgent("after", "z"),
+    }
+    events: list[tuple[str, dict]] = []
+
+    async def scenario():
+        task = asyncio.create_task(run_dag(agents, "p", nodes=nodes, on_event=lambda e, d: events.append((e, d))))
+        while ("agent_turn", "fast") not in [(e, d["agent"]) for e, d in events]:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(scenario())
+    turns = [d["agent"] for e, d in events if e == "agent_turn"]
+    assert turns == ["fast"]
+    assert agents["after"].prompts == []
+
+
+def test_node_cancelled_from_inside_is_not_masked():
+    # e.g. the executor future behind the LLM call was cancelled
+    nodes = (DagNode("a"), DagNode("b"))
+    agents = {"a": StubAgent("a", asyncio.CancelledError()), "b": StubAgent("b", "x")}
+    events: list[tuple[str, dict]] = []
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(run_dag(agents, "p", nodes=nodes, on_event=lambda e, d: events.append((e, d))))
+    assert "a" not in [d["agent"] for e, d in events if e == "agent_turn"]
+
+
+# ─── Aggregation / validation ────────────────────────────────────────────────────
+def test_aggregate_keeps_text_outputs_and_lists_missing():
+    results = {
+        "dosha_agent": NodeResult("dosha_agent", "ok", "vata, mostly"),
+        "meal_planner_agent": NodeResult("meal_planner_agent", "ok", json.dumps(MEALS), MEALS),
+        "herbal_advisor_agent": NodeResult("herbal_advisor_agent", "timeout"),
+    }
+    plan = aggregate(results)
+    assert plan["dosha"] == "vata, mostly"
+    assert plan["meal_plan"] == MEALS
+    assert plan["herbal"] is None
+    assert plan["missing"] == ["herbal_advisor_agent"]
+    assert plan["disclaimer"]
+
+
+@pytest.mark.parametrize("plan, valid", [
+    ({"meal_plan": MEALS, "herbal": {"herbs": ["triphala"]}}, True),
+    ({"meal_plan": MEALS, "herbal": "Triphala at night"}, True),
+    ({"meal_plan": MEALS, "herbal": None}, False),
+    ({"meal_plan": {**MEALS, "dinner": "  "}, "herbal": "x"}, False),
+    ({"meal_plan": {"breakfast": "a", "lunch": "b"}, "herbal": "x"}, False),
+    ({"meal_plan": "oats, then khichdi", "herbal": "x"}, False),
+    ({}, False),
+])
+def test_validate_plan(plan, valid):
+    assert validate_plan(plan) is valid
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1}', {"a": 1}),
+    ('Here you go:\n```json\n{"a": 1}\n```', {"a": 1}),
+    ('Sure! {"a": {"b": 2}} Hope that helps.', {"a": {"b": 2}}),
+    ("[1, 2]", None),
+    ("no json here", None),
+    (None, None),
+])
+def test_extract_json(text, expected):
+    assert extract_json(text) == expected
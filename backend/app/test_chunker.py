@@ -0,0 +1,60 @@
+# backend/app/test_chunker.py
+
+import pytest
+
+from backend.app import chunker
+from backend.app.chunker import iter_chunks, iter_sentences
+
+
+@pytest.fixture(autouse=True)
+def _word_tokens(monkeypatch):
+    # One token per word, so sizes are easy to read off the text
+    monkeypatch.setattr(chunker, "count_tokens", lambda text: len(text.split()))
+    monkeypatch.setattr(chunker, "_split_long", lambda sentence, max_tokens: [
+        " ".join(sentence.split()[i:i + max_tokens]) for i in range(0, len(sentence.split()), max_tokens)
+    ])
+
+
+PAGE = "One two three. Four five six. Seven eight nine. Ten eleven twelve."
+
+
+def test_sentences_continue_across_pages():
+    pages = ["Intro here. The first half", "of a sentence. Next one."]
+    assert list(iter_sentences(pages)) == ["Intro here.", "The first half of a sentence.", "Next one."]
+
+
+def test_chunks_repeat_trailing_sentences_within_overlap():
+    assert list(iter_chunks([PAGE], max_tokens=6, overlap_tokens=3)) == [
+        "One two three. Four five six.",
+        "Four five six. Seven eight nine.",
+        "Seven eight nine. Ten eleven twelve.",
+    ]
+
+
+def test_no_overlap():
+    assert list(iter_chunks([PAGE], max_tokens=6, overlap_tokens=0)) == [
+        "One two three. Four five six.",
+        "Seven eight nine. Ten eleven twelve.",
+    ]
+
+
+def test_overlap_never_pushes_a_chunk_over_max_tokens():
+    chunks = list(iter_chunks(["A b c. D e f g h."], max_tokens=6, overlap_tokens=3))
+    assert chunks == ["A b c.", "D e f g h."]
+    assert all(len(chunk.split()) <= 6 for chunk in chunks)
+
+
+def test_long_sentence_is_cut_at_max_tokens():
+    chunks = list(iter_chunks(["w1 w2 w3 w4 w5 w6 w7 w8 w9 w10."], max_tokens=4, overlap_tokens=0))
+    assert chunks == ["w1 w2 w3 w4", "w5 w6 w7 w8", "w9 w10."]
+
+
+def test_tokenizer_comes_from_the_torch_model(torch_embedder):
+    # The fixture's embedder is a torch one and no ONNX export exists
+    assert torch_embedder.tokenizer.truncation is not None
+
+    tokenizer = chunker.get_tokenizer()
+    assert tokenizer.truncation is None and tokenizer.padding is None
+    assert torch_embedder.tokenizer.truncation is not None      # the model's own is left alone
+    assert tokenizer.encode("what should i eat today?", add_special_tokens=False).tokens == [
+        "what", "should", "i", "eat", "today", "?"]
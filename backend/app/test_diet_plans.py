@@ -0,0 +1,62 @@
+# backend/app/test_diet_plans.py
+
+import types
+import datetime
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("autogen")
+
+from backend.app.diet_plans import is_current, logs_through
+from backend.app.user_context import UserContext, MoodEntry, SymptomEntry, MealEntry, ChatEntry
+
+T0 = datetime.datetime(2026, 1, 1, 8, 0)
+
+
+def _at(minutes: int) -> datetime.datetime:
+    return T0 + datetime.timedelta(minutes=minutes)
+
+
+def _stored(through):
+    return types.SimpleNamespace(logs_through=through)
+
+
+CTX = UserContext(
+    moods=[MoodEntry("calm", 3, _at(5)), MoodEntry("tired", 2, _at(0))],
+    symptoms=[SymptomEntry("bloating", 2, _at(20))],
+    meals=[MealEntry("lunch", ["rice", "dal"], _at(10))],
+    chats=[ChatEntry("user", "hi", _at(90))],
+)
+
+
+def test_logs_through_is_the_newest_non_chat_entry():
+    assert logs_through(CTX) == _at(20)
+    assert logs_through(UserContext(chats=[ChatEntry("user", "hi", _at(0))])) is None
+
+
+@pytest.mark.parametrize("stored, current", [
+    (None, False),
+    (_stored(_at(20)), True),          # built from exactly these logs
+    (_stored(_at(30)), True),          # built from newer logs than the cached view
+    (_stored(_at(19)), False),         # a newer symptom log since
+    (_stored(None), False),            # stored before any logs existed
+])
+def test_is_current(stored, current):
+    assert is_current(stored, CTX) is current
+
+
+def test_any_stored_plan_is_current_without_logs():
+    assert is_current(_stored(None), UserContext())
+    assert not is_current(None, UserContext())
+
+
+def test_user_without_logs_computes_once_then_again_after_the_first_log():
+    no_logs = UserContext()
+    assert not is_current(None, no_logs)                 # first request computes...
+    stored = _stored(logs_through(no_logs))              # ...and stores logs_through = NULL
+    assert stored.logs_through is None
+    assert is_current(stored, no_logs)                   # later requests reuse it
+
+    first_log = UserContext(moods=[MoodEntry("calm", 3, _at(0))])
+    assert not is_current(stored, first_log)             # the first log makes it stale
+    assert is_current(_stored(logs_through(first_log)), first_log)
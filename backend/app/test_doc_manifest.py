@@ -0,0 +1,42 @@
+# backend/app/test_doc_manifest.py
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from backend.app.doc_manifest import ChunkDiffer, chunk_sha256
+
+STORED = ["chunk a", "chunk b", "chunk c"]
+
+
+def _differ(chunks=STORED) -> ChunkDiffer:
+    return ChunkDiffer({i: chunk_sha256(chunk) for i, chunk in enumerate(chunks, start=1)})
+
+
+def test_same_file_is_all_unchanged():
+    differ = _differ()
+    kinds = [differ.classify(chunk)[0] for chunk in STORED]
+    assert kinds == ["unchanged"] * 3
+    assert differ.unchanged == 3
+    assert differ.stale_from == 4
+
+
+def test_inserted_chunk_shifts_the_rest():
+    differ = _differ()
+    result = [differ.classify(chunk) for chunk in ["new page", *STORED]]
+    assert [(kind, index) for kind, index, _ in result] == [("new", 1), ("moved", 2), ("moved", 3), ("moved", 4)]
+    assert result[1][2] == chunk_sha256("chunk a")
+    assert differ.unchanged == 0
+
+
+def test_shorter_version_leaves_stale_rows():
+    differ = _differ()
+    for chunk in ["chunk a", "edited b"]:
+        differ.classify(chunk)
+    assert differ.unchanged == 1
+    assert differ.stale_from == 3      # the old chunk 3 is removed
+
+
+def test_empty_file():
+    assert _differ().stale_from == 1
+    assert [_differ({}).classify("chunk a")[0]] == ["new"]
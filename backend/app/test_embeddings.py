@@ -0,0 +1,47 @@
+# backend/app/test_embeddings.py
+
+import time
+import asyncio
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.app import embeddings
+from backend.app.embeddings import EmbeddingBatcher
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=1)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def test_concurrent_encodes_share_a_batch(monkeypatch, executor):
+    monkeypatch.setattr(embeddings, "_encode_batch",
+                        lambda texts, model_name: np.asarray([[len(t)] for t in texts], dtype=np.float32))
+
+    async def scenario():
+        batcher = EmbeddingBatcher(executor, window_ms=5)
+        return batcher, await asyncio.gather(*(batcher.encode(t) for t in ["a", "bb", "a"]))
+
+    batcher, rows = asyncio.run(scenario())
+    assert [float(row[0]) for row in rows] == [1.0, 2.0, 1.0]
+    assert batcher.batches == 1
+
+
+def test_cancelled_batch_releases_its_callers(monkeypatch, executor):
+    monkeypatch.setattr(embeddings, "_encode_batch", lambda texts, model_name: time.sleep(0.2))
+
+    async def scenario():
+        batcher = EmbeddingBatcher(executor, window_ms=0)
+        caller = asyncio.create_task(batcher.encode("text"))
+        while not batcher._tasks:
+            await asyncio.sleep(0.001)
+        for task in batcher._tasks:
+            task.cancel()
+        # Without the cancellation reaching the caller this would time out
+        await asyncio.wait_for(caller, timeout=1)
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(scenario())
@@ -0,0 +1,57 @@
+# backend/app/test_job_queue.py
+
+import asyncio
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("orjson")
+
+from backend.app.job_queue import JobWorkerPool, JOB_RUNNERS, dedupe_key
+
+
+# ─── dedupe_key ──────────────────────────────────────────────────────────────────
+def test_dedupe_key_normalizes_text_input():
+    a = dedupe_key("recommend", "a@x", {"message": "What should I eat?"}, 3)
+    b = dedupe_key("recommend", "a@x", {"message": "  what SHOULD i eat?  "}, 3)
+    assert a == b
+
+
+@pytest.mark.parametrize("kind, user, payload, version", [
+    ("diet", "a@x", {"message": "What should I eat?"}, 3),
+    ("recommend", "b@x", {"message": "What should I eat?"}, 3),
+    ("recommend", "a@x", {"message": "What should I drink?"}, 3),
+    ("recommend", "a@x", {"message": "What should I eat?"}, 4),     # new logs since
+])
+def test_dedupe_key_differs(kind, user, payload, version):
+    assert dedupe_key(kind, user, payload, version) != dedupe_key("recommend", "a@x", {"message": "What should I eat?"}, 3)
+
+
+# ─── Worker loop ─────────────────────────────────────────────────────────────────
+def test_worker_survives_a_failed_finish(monkeypatch):
+    job = {"id": "j1", "kind": "test-echo", "user_email": None, "payload": {}, "attempts": 1}
+    monkeypatch.setitem(JOB_RUNNERS, "test-echo", lambda user, payload: asyncio.sleep(0, {"ok": True}))
+
+    async def scenario():
+        pool = JobWorkerPool(concurrency=1, poll_seconds=0.01)
+        claims = [job, None]
+        claimed_again = asyncio.Event()
+
+        async def claim():
+            if not claims:
+                claimed_again.set()
+                return None
+            return claims.pop(0)
+
+        async def finish(job, **values):
+            raise ConnectionError("database went away")
+
+        monkeypatch.setattr(pool, "claim", claim)
+        monkeypatch.setattr(pool, "_finish", finish)
+        pool.start()
+        await asyncio.wait_for(claimed_again.wait(), timeout=1)
+        worker = pool._tasks[0]
+        assert not worker.done()
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+    asyncio.run(scenario())
@@ -0,0 +1,29 @@
+# backend/app/test_rag_context.py
+
+from backend.app.rag_context import search_terms, build_context, count_tokens
+
+
+def test_search_terms_keeps_the_longest_distinct_terms():
+    logs = "Mood: anxious (3) 01-01 08:00\nMeals: lunch: rice, dal, ashwagandha tea 01-01 08:00; lunch: rice 01-01 12:00"
+    assert search_terms(logs, 4) == ["ashwagandha", "anxious", "lunch", "rice"]
+
+
+def test_search_terms_drops_stopwords_and_log_labels():
+    assert search_terms("Symptoms: what can I eat with the headache (sev 2)", 8) == ["headache", "eat"]
+
+
+# ─── build_context, with the embedding model's real tokenizer ────────────────────
+def test_build_context_without_docs_or_logs(torch_embedder):
+    context = build_context("What should I eat today?", [])
+    assert context.prompt.endswith("User asks: What should I eat today?")
+    assert "No relevant documents found." in context.prompt
+    assert context.tokens == count_tokens(context.prompt) > 0
+    assert context.docs_used == 0
+
+
+def test_build_context_cuts_an_overlong_chunk_to_its_budget(torch_embedder):
+    docs = [{"title": "Grains", "content": "warm rice and dal " * 100, "embedding": None}]
+    context = build_context("What should I eat today?", docs, budget=200, doc_budget=60)
+    assert context.docs_used == 1
+    assert context.doc_tokens <= 60
+    assert context.tokens <= 200
@@ -0,0 +1,62 @@
+# backend/app/test_sse.py
+#
+# The SSE endpoints after their headers are sent: every failure must reach the
+# client as an `error` event. Fake LLM backend, no database.
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("autogen")
+pytest.importorskip("sqlalchemy")
+
+import orjson
+from fastapi.testclient import TestClient
+
+from backend.app import main, recommend
+from backend.app.user_context import UserContext
+
+
+def _events(response) -> list[tuple[str, dict]]:
+    events = []
+    for block in response.text.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in lines:
+            events.append((lines["event"], orjson.loads(lines["data"])))
+    return events
+
+
+async def _failing_fetch(*args):
+    raise ConnectionError("database went away")
+
+
+@pytest.fixture
+def client():
+    # No `with`: the lifespan (job workers, chat log buffer) stays off
+    return TestClient(main.app)
+
+
+def test_failing_diet_fetch_emits_error(client, monkeypatch):
+    monkeypatch.setattr(main, "fetch_plan_inputs", _failing_fetch)
+    events = _events(client.get("/recommendations/diet/stream", params={"user_email": "a@x"}))
+    assert events[-1] == ("error", {"detail": "database went away"})
+
+
+def test_failing_recommend_fetch_emits_error(client, monkeypatch):
+    monkeypatch.setattr(recommend, "build_recommend_context", _failing_fetch)
+    events = _events(client.post("/recommend/stream", json={"user_email": "a@x", "message": "What should I eat?"}))
+    assert events[-1] == ("error", {"detail": "database went away"})
+
+
+def test_plan_is_sent_when_storing_it_fails(client, monkeypatch, torch_embedder):
+    async def fetch(user_email):
+        return UserContext(), []
+
+    async def store(*args, **kwargs):
+        raise ConnectionError("database went away")
+
+    monkeypatch.setattr(main, "fetch_plan_inputs", fetch)
+    monkeypatch.setattr(main, "store_plan", store)
+    events = _events(client.get("/recommendations/diet/stream", params={"user_email": "a@x"}))
+    assert events[-1][0] == "plan"
+    assert "breakfast" in events[-1][1]["plan"]
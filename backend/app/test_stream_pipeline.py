@@ -0,0 +1,51 @@
+# backend/app/test_stream_pipeline.py
+#
+# stream_pipeline end to end on the fake LLM backend: no network, no database
+# (docs are passed in, so the retriever is never called).
+
+import asyncio
+import pytest
+
+pytest.importorskip("autogen")
+pytest.importorskip("sqlalchemy")
+
+from backend.app import orchestrator
+from backend.app.agent_registry import llm_io_executor
+from backend.app.fake_llm import SCRIPTED_REPLIES, FAKE_LLM_CHUNK_CHARS
+
+
+async def _collect(mode: str) -> list[tuple[str, dict]]:
+    asyncio.get_running_loop().set_default_executor(llm_io_executor())
+    return [event async for event in orchestrator.stream_pipeline("What should I eat today?", docs=[], mode=mode)]
+
+
+@pytest.fixture(autouse=True)
+def _embedder(torch_embedder):
+    # Prompt budgeting uses the embedding model's tokenizer
+    return torch_embedder
+
+
+@pytest.mark.parametrize("mode", ["dag", "groupchat"])
+def test_tokens_are_streamed(mode):
+    events = asyncio.run(_collect(mode))
+    names = [event for event, _ in events]
+
+    assert "token" in names
+    assert names[-1] == "plan"
+    assert names.index("token") < names.index("plan")
+    # DAG nodes run concurrently, so their chunks may interleave; each reply's
+    # own chunks still arrive in order
+    streamed = iter(data["text"] for event, data in events if event == "token")
+    reply = SCRIPTED_REPLIES["meal_planner_agent"]
+    chunks = [reply[i:i + FAKE_LLM_CHUNK_CHARS] for i in range(0, len(reply), FAKE_LLM_CHUNK_CHARS)]
+    assert all(chunk in streamed for chunk in chunks)
+
+
+def test_run_pipeline_does_not_print_chunks(capsys):
+    async def run():
+        asyncio.get_running_loop().set_default_executor(llm_io_executor())
+        return await orchestrator.run_pipeline_with_stats("What should I eat today?", docs=[])
+
+    text, _ = asyncio.run(run())
+    assert "breakfast" in text
+    assert SCRIPTED_REPLIES["meal_planner_agent"] not in capsys.readouterr().out
@@ -0,0 +1,36 @@
+# backend/app/test_telemetry.py
+
+import types
+import pytest
+
+pytest.importorskip("opentelemetry")
+sqlalchemy = pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import create_engine, text
+from backend.app.telemetry import instrument_engine
+
+
+def _instrumented(name: str):
+    # instrument_engine only needs the AsyncEngine's sync_engine
+    sync_engine = create_engine("sqlite://")
+    instrument_engine(types.SimpleNamespace(sync_engine=sync_engine), name=name)
+    return sync_engine
+
+
+def test_failed_statement_does_not_leave_a_start_time():
+    engine = _instrumented("test-failed")
+    with engine.connect() as conn:
+        with pytest.raises(sqlalchemy.exc.OperationalError):
+            conn.execute(text("SELECT * FROM missing_table"))
+        assert not conn.info.get("query_started")
+
+        conn.execute(text("SELECT 1"))
+        assert conn.info["query_started"] == []
+
+
+def test_engines_sharing_a_name_are_each_instrumented():
+    first, second = _instrumented("test-shared"), _instrumented("test-shared")
+    for engine in (first, second):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            assert conn.info["query_started"] == []      # the timing listeners ran
@@ -0,0 +1,111 @@
+# backend/app/user_context.py
+
+import datetime
+from dataclasses import dataclass, field
+from sqlalchemy import text
+
+
+# ─── Lightweight typed log records ───────────────────────────────────────────────
+@dataclass(frozen=True, slots=True)
+class MoodEntry:
+    mood: str
+    intensity: int | None
+    timestamp: datetime.datetime
+
+    def to_dict(self) -> dict:
+        return {"mood": self.mood, "intensity": self.intensity, "timestamp": self.timestamp.isoformat()}
+
+
+@dataclass(frozen=True, slots=True)
+class SymptomEntry:
+    symptom: str
+    severity: int | None
+    timestamp: datetime.datetime
+
+    def to_dict(self) -> dict:
+        return {"symptom": self.symptom, "severity": self.severity, "timestamp": self.timestamp.isoformat()}
+
+
+@dataclass(frozen=True, slots=True)
+class MealEntry:
+    meal_type: str
+    items: list[str]
+    timestamp: datetime.datetime
+
+    def to_dict(self) -> dict:
+        return {"meal_type": self.meal_type, "items": self.items, "timestamp": self.timestamp.isoformat()}
+
+
+@dataclass(frozen=True, slots=True)
+class ChatEntry:
+    sender: str
+    message: str
+    timestamp: datetime.datetime
+
+    def to_dict(self) -> dict:
+        return {"sender": self.sender, "message": self.message, "timestamp": self.timestamp.isoformat()}
+
+
+@dataclass(slots=True)
+class UserContext:
+    """The latest N entries of each log type, newest first."""
+    moods: list[MoodEntry] = field(default_factory=list)
+    symptoms: list[SymptomEntry] = field(default_factory=list)
+    meals: list[MealEntry] = field(default_factory=list)
+    chats: list[ChatEntry] = field(default_factory=list)
+
+    def to_summary(self) -> dict:
+        summary = {
+            "mood_logs": [m.to_dict() for m in self.moods],
+            "symptom_logs": [s.to_dict() for s in self.symptoms],
+            "meal_logs": [ml.to_dict() for ml in self.meals],
+        }
+        if self.chats:
+            summary["chat_logs"] = [c.to_dict() for c in self.chats]
+        return summary
+
+
+# ─── Single round-trip loader ────────────────────────────────────────────────────
+# One statement, one round trip: each branch is a top-N read that walks the
+# (user_email, timestamp DESC, id DESC) index, so no branch sorts.
+_CONTEXT_SQL = text("""
+    (SELECT 'mood' AS kind, mood AS label, intensity AS score, NULL::text AS body, timestamp
+       FROM mood_logs WHERE user_email = :user_email
+      ORDER BY timestamp DESC, id DESC LIMIT :limit)
+    UNION ALL
+    (SELECT 'symptom', symptom, severity, NULL::text, timestamp
+       FROM symptom_logs WHERE user_email = :user_email
+      ORDER BY timestamp DESC, id DESC LIMIT :limit)
+    UNION ALL
+    (SELECT 'meal', meal_type, NULL::int, items, timestamp
+       FROM meal_logs WHERE user_email = :user_email
+      ORDER BY timestamp DESC, id DESC LIMIT :limit)
+    UNION ALL
+    (SELECT 'chat', sender, NULL::int, message, timestamp
+       FROM chat_logs WHERE user_email = :user_email AND :chat_limit > 0
+      ORDER BY timestamp DESC, id DESC LIMIT :chat_limit)
+""")
+
+
+async def load_user_context(session, user_email: str, limit: int = 5, chat_limit: int = 0) -> UserContext:
+    """
+    Fetch the latest `limit` mood, symptom and meal entries (and optionally
+    `chat_limit` chat messages) for a user in a single query.
+    """
+    result = await session.execute(
+        _CONTEXT_SQL, {"user_email": user_email, "limit": limit, "chat_limit": chat_limit}
+    )
+    ctx = UserContext()
+    for kind, label, score, body, timestamp in result.fetchall():
+        if kind == "mood":
+            ctx.moods.append(MoodEntry(label, score, timestamp))
+        elif kind == "symptom":
+            ctx.symptoms.append(SymptomEntry(label, score, timestamp))
+        elif kind == "meal":
+            ctx.meals.append(MealEntry(label, body.split(",") if body else [], timestamp))
+        else:
+            ctx.chats.append(ChatEntry(label, body, timestamp))
+    # UNION ALL does not promise to keep each branch's order; lists are tiny.
+    for entries in (ctx.moods, ctx.symptoms, ctx.meals, ctx.chats):
+        entries.sort(key=lambda e: e.timestamp, reverse=True)
+    return ctx
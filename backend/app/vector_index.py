@@ -0,0 +1,220 @@
+# backend/app/vector_index.py
+#
+# ANN index management for doc_embeddings, one partial index per embedding
+# model version (the active one unless --model/--version is given).
+#
+#   python -m backend.app.vector_index build   --method hnsw --m 16 --ef-construction 64
+#   python -m backend.app.vector_index rebuild --method ivfflat --lists 1000
+#   python -m backend.app.vector_index status
+#   python -m backend.app.vector_index explain
+#
+# The retriever orders by `(embedding::halfvec(dim)) <#> :q` (negative inner
+# product) with `model_id = <id>`, so each index is on that exact expression,
+# uses the halfvec_ip_ops operator class and carries the same WHERE clause, or
+# Postgres will ignore it.
+
+import os
+import math
+import asyncio
+import argparse
+from sqlalchemy import text
+
+from .models import engine
+from .embedding_store import ModelInfo, active_model, get_model, EMBEDDING_MODEL_VERSION
+
+TABLE = "doc_embeddings"
+OPCLASS = "halfvec_ip_ops"
+
+# Query-time knobs (overridable per retriever); pgvector's own defaults are 40 / 1.
+DEFAULT_EF_SEARCH = int(os.getenv("PGVECTOR_EF_SEARCH", "40"))
+DEFAULT_PROBES = int(os.getenv("PGVECTOR_PROBES", "10"))
+
+
+# ─── Query-time settings ─────────────────────────────────────────────────────────
+async def apply_search_settings(session, ef_search: int | None = None, probes: int | None = None,
+                                force_index: bool = True):
+    """
+    Set per-transaction ANN search parameters. Must run inside the same
+    transaction as the similarity query (SET LOCAL is discarded on commit).
+
+    - hnsw.ef_search: candidate list size; higher = better recall, slower.
+    - ivfflat.probes: lists scanned; higher = better recall, slower.
+    - force_index: disable seq scans so the planner never falls back to a
+      full-table distance sort when its row estimates are off.
+    """
+    # SET does not take bind parameters, hence int() to keep the f-strings safe.
+    if ef_search is not None:
+        await session.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+    if probes is not None:
+        await session.execute(text(f"SET LOCAL ivfflat.probes = {int(probes)}"))
+    if force_index:
+        await session.execute(text("SET LOCAL enable_seqscan = off"))
+
+
+# ─── Build / rebuild ─────────────────────────────────────────────────────────────
+def _index_ddl(name: str, model: ModelInfo, method: str, m: int, ef_construction: int, lists: int) -> str:
+    if method == "hnsw":
+        params = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+    elif method == "ivfflat":
+        params = f"lists = {int(lists)}"
+    else:
+        raise ValueError(f"Unknown index method: {method!r} (expected 'hnsw' or 'ivfflat')")
+    return (
+        f"CREATE INDEX CONCURRENTLY {name} ON {TABLE} "
+        f"USING {method} ({model.vector_expr} {OPCLASS}) WITH ({params}) "
+        f"WHERE model_id = {int(model.id)}"
+    )
+
+
+def default_ivfflat_lists(row_count: int) -> int:
+    """pgvector guidance: rows/1000 up to 1M rows, sqrt(rows) beyond."""
+    if row_count <= 1_000_000:
+        return max(row_count // 1000, 10)
+    return int(math.sqrt(row_count))
+
+
+async def _autocommit_conn():
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+    conn = await engine.connect()
+    return await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+
+async def resolve_model(name: str | None = None, version: str | None = None) -> ModelInfo:
+    """The named model version (EMBEDDING_MODEL_VERSION if unset), or the active one."""
+    version = version or EMBEDDING_MODEL_VERSION
+    async with engine.connect() as conn:
+        model = await get_model(conn, name, version) if name else await active_model(conn)
+    if model is None:
+        raise ValueError(f"{name}@{version} is not registered" if name else "No active embedding model")
+    return model
+
+
+async def build_index(model: ModelInfo | None = None, method: str = "hnsw", m: int = 16,
+                      ef_construction: int = 64, lists: int | None = None,
+                      maintenance_work_mem: str = "1GB", rebuild: bool = False):
+    """
+    Create `model`'s ANN index (no-op if a valid one exists; an invalid one is
+    dropped and rebuilt), or with `rebuild` build a fresh one next to the old
+    index and swap it in, so queries keep an index the whole time.
+    """
+    model = model or await resolve_model()
+    index_name = model.index_name
+    conn = await _autocommit_conn()
+    try:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        # None: no such index; False: left INVALID by an interrupted or failed
+        # CREATE INDEX CONCURRENTLY, which the planner never uses
+        valid = (await conn.execute(
+            text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:i)"), {"i": index_name},
+        )).scalar()
+        if valid is False:
+            print(f"{index_name} is invalid (interrupted build); dropping it to rebuild.")
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY {index_name}"))
+        exists = valid is True
+        if exists and not rebuild:
+            print(f"{index_name} already exists; use `rebuild` to replace it.")
+            return
+
+        if method == "ivfflat" and lists is None:
+            row_count = (await conn.execute(
+                text(f"SELECT count(*) FROM {TABLE} WHERE model_id = :m"), {"m": model.id}
+            )).scalar_one()
+            lists = default_ivfflat_lists(row_count)
+
+        await conn.execute(text(f"SET maintenance_work_mem = '{maintenance_work_mem}'"))
+        await conn.execute(text("SET max_parallel_maintenance_workers = 4"))
+
+        target = f"{index_name}_new" if exists else index_name
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}_new"))
+        print(f"Building {method} index {target} for {model.label} ({OPCLASS}, dim {model.dimension}) ...")
+        await conn.execute(text(_index_ddl(target, model, method, m, ef_construction, lists or 100)))
+
+        if exists:
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY {index_name}"))
+            await conn.execute(text(f"ALTER INDEX {target} RENAME TO {index_name}"))
+        await conn.execute(text(f"ANALYZE {TABLE}"))
+        print(f"{index_name} ready.")
+    finally:
+        await conn.close()
+
+
+async def drop_index(model: ModelInfo):
+    conn = await _autocommit_conn()
+    try:
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {model.index_name}"))
+    finally:
+        await conn.close()
+
+
+# ─── Inspection ──────────────────────────────────────────────────────────────────
+async def index_status():
+    async with engine.connect() as conn:
+        rows = (await conn.execute(text("""
+            SELECT indexname, indexdef, pg_size_pretty(pg_relation_size(indexname::regclass)) AS size
+            FROM pg_indexes
+            WHERE tablename = :t
+              AND (indexdef ILIKE '%USING hnsw%' OR indexdef ILIKE '%USING ivfflat%')
+        """), {"t": TABLE})).fetchall()
+    if not rows:
+        print(f"No ANN index on {TABLE} — similarity queries will sequentially scan.")
+    for row in rows:
+        print(f"{row.indexname} ({row.size}): {row.indexdef}")
+
+
+async def explain_query(model: ModelInfo | None = None, ef_search: int = DEFAULT_EF_SEARCH,
+                        probes: int = DEFAULT_PROBES):
+    """Print the plan of the retriever's vector query for an existing embedding."""
+    model = model or await resolve_model()
+    expr, model_id = model.vector_expr, int(model.id)
+    async with engine.connect() as conn:
+        async with conn.begin():
+            await apply_search_settings(conn, ef_search, probes)
+            plan = (await conn.execute(text(f"""
+                EXPLAIN
+                SELECT doc_id FROM {TABLE}
+                WHERE model_id = {model_id}
+                ORDER BY {expr} <#> (SELECT {expr} FROM {TABLE} WHERE model_id = {model_id} LIMIT 1)
+                LIMIT 5
+            """))).fetchall()
+    for row in plan:
+        print(row[0])
+
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the pgvector ANN indexes on doc_embeddings.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("build", "rebuild"):
+        p = sub.add_parser(name)
+        p.add_argument("--model", default=None, help="model name (default: the active model)")
+        p.add_argument("--version", default=None)
+        p.add_argument("--method", choices=["hnsw", "ivfflat"], default="hnsw")
+        p.add_argument("--m", type=int, default=16, help="HNSW: max connections per layer")
+        p.add_argument("--ef-construction", type=int, default=64, help="HNSW: build-time candidate list")
+        p.add_argument("--lists", type=int, default=None, help="IVFFlat: number of lists (default: from row count)")
+        p.add_argument("--maintenance-work-mem", default="1GB")
+    sub.add_parser("status")
+    p = sub.add_parser("explain")
+    p.add_argument("--model", default=None, help="model name (default: the active model)")
+    p.add_argument("--version", default=None)
+    p.add_argument("--ef-search", type=int, default=DEFAULT_EF_SEARCH)
+    p.add_argument("--probes", type=int, default=DEFAULT_PROBES)
+    args = parser.parse_args()
+
+    async def for_model(action, **kwargs):
+        await action(await resolve_model(args.model, args.version), **kwargs)
+
+    if args.command in ("build", "rebuild"):
+        asyncio.run(for_model(
+            build_index,
+            method=args.method,
+            m=args.m,
+            ef_construction=args.ef_construction,
+            lists=args.lists,
+            maintenance_work_mem=args.maintenance_work_mem,
+            rebuild=args.command == "rebuild",
+        ))
+    elif args.command == "status":
+        asyncio.run(index_status())
+    else:
+        asyncio.run(for_model(explain_query, ef_search=args.ef_search, probes=args.probes))
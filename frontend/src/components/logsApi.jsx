@@ -39,3 +39,15 @@ export async function logMeal(userEmail, mealType, items) {
   if (!res.ok) throw new Error("Failed to log meal");
   return res.json();
 }
+
+// Send several logs in one request. Each entry carries its own type, e.g.
+// { type: "chat", user_email, message, sender } or { type: "mood", user_email, mood, intensity }.
+export async function logBatch(entries) {
+  const res = await fetch(`${API_URL}/log/batch`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ entries }),
+  });
+  if (!res.ok) throw new Error("Failed to log batch");
+  return res.json();
+}
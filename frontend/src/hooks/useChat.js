@@ -1,6 +1,30 @@
 // src/hooks/useChat.js
 import { useState, useRef, useEffect } from "react";
 
+// Parse a text/event-stream body into { event, data } objects as chunks arrive.
+async function* readEvents(res) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = "message";
+      let data = "";
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (data) yield { event, data: JSON.parse(data) };
+    }
+  }
+}
+
 export default function useChat() {
   const [messages, setMessages] = useState([
     { sender: "ai", text: "Hi! I'm your Ayurveda personal doctor. How can I help you today?" }
@@ -12,26 +36,32 @@ export default function useChat() {
     chatRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
 
+  // Replace the text of the last (in-progress) AI message
+  const updateLast = (text) =>
+    setMessages(msgs => [...msgs.slice(0, -1), { sender: "ai", text }]);
+
   const sendMessage = async (input) => {
     if (!input.trim()) return;
-    setMessages(msgs => [...msgs, { sender: "user", text: input }]);
+    setMessages(msgs => [...msgs, { sender: "user", text: input }, { sender: "ai", text: "Thinking…" }]);
     setLoading(true);
     try {
-      const res = await fetch('http://localhost:8000/recommend', {
+      const res = await fetch('http://localhost:8000/recommend/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ message: input })
       });
-      const data = await res.json();
-      setMessages(msgs => [
-        ...msgs,
-        { sender: "ai", text: data.result || "Sorry, I couldn't process that." }
-      ]);
+      let streamed = "";
+      let result = null;
+      for await (const { event, data } of readEvents(res)) {
+        if (event === "retrieval") updateLast("Consulting Ayurvedic sources…");
+        else if (event === "agent_turn") updateLast(`${data.agent} is working…`);
+        else if (event === "token") updateLast((streamed += data.text));
+        else if (event === "result") result = data.result;
+        else if (event === "error") throw new Error(data.detail);
+      }
+      updateLast(result || "Sorry, I couldn't process that.");
     } catch {
-      setMessages(msgs => [
-        ...msgs,
-        { sender: "ai", text: "Network error. Please try again." }
-      ]);
+      updateLast("Network error. Please try again.");
     }
     setLoading(false);
   };